@@ -3,7 +3,8 @@
 # 投诉模块 DAO：提交投诉、查询投诉、管理员处理
 # ======================================================
 
-from common.db import query_one, query_all, execute
+from common.db import query_one, query_all, query_iter, execute
+from common.search_dao import DEFAULT_PAGE_SIZE, normalize_page_size
 
 # ====== 状态常量（统一管理）======
 STATUS_PENDING = "待处理"
@@ -174,6 +175,69 @@ def admin_get_complaints(status=None):
 
     return query_all(sql + " ORDER BY c.created_at DESC ", as_dict=True)
 
+
+def admin_get_complaint_page(status=None, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    管理员投诉列表分页：按 complaint_id 倒序 keyset（自增主键，与提交时间顺序一致），只读一页
+    cursor 为上一页最后一个 complaint_id；返回 (本页投诉, 下一页游标 或 None)
+    字段与 admin_get_complaints 一致
+    """
+    page_size = normalize_page_size(page_size)
+    sql = """
+        SELECT c.*,
+               u1.username AS user_name,
+               u1.username AS complainant_name,
+               u2.username AS accused_name,
+               p.title AS posting_title
+        FROM complaint c
+        JOIN user u1 ON c.complainant_id = u1.user_id
+        JOIN user u2 ON c.accused_id = u2.user_id
+        JOIN `order` o ON c.order_id = o.order_id
+        JOIN posting p ON o.posting_id = p.posting_id
+        WHERE 1 = 1
+    """
+    params = []
+    if status:
+        sql += " AND c.status = %s"
+        params.append(status)
+    if cursor and str(cursor).isdigit():
+        sql += " AND c.complaint_id < %s"
+        params.append(int(cursor))
+    # 多取一条，用来判断是否还有下一页
+    sql += " ORDER BY c.complaint_id DESC LIMIT %s"
+    params.append(page_size + 1)
+
+    rows = query_all(sql, params, as_dict=True)
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, str(rows[-1]["complaint_id"])
+    return rows, None
+
+
+def admin_iter_complaints(status=None, batch_size=500):
+    """
+    管理员：流式获取投诉列表（生成器），用于导出 CSV
+    字段与 admin_get_complaints 一致
+    """
+    sql = """
+        SELECT c.*,
+               u1.username AS user_name,
+               u1.username AS complainant_name,
+               u2.username AS accused_name,
+               p.title AS posting_title
+        FROM complaint c
+        JOIN user u1 ON c.complainant_id = u1.user_id
+        JOIN user u2 ON c.accused_id = u2.user_id
+        JOIN `order` o ON c.order_id = o.order_id
+        JOIN posting p ON o.posting_id = p.posting_id
+    """
+    params = []
+    if status:
+        sql += " WHERE c.status = %s "
+        params.append(status)
+
+    return query_iter(sql + " ORDER BY c.created_at DESC ", params, batch_size=batch_size, as_dict=True)
+
 # ======================================================
 # 6️⃣ 管理员处理投诉（写入 result）
 # ======================================================
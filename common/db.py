@@ -4,7 +4,145 @@
 # 全项目统一使用此文件执行 SQL
 # ================================================
 
-from django.db import connection
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+
+from common.instrument import instrumented, instrumented_iter
+from common.pool import get_pool, get_pool_stats
+from common.query_cache import cached_query, get_query_cache, tables_of
+
+
+# 当前线程正在使用的事务连接（见 transaction()）
+_local = threading.local()
+
+# 读写分离：在该时间戳（time.time()）之前，读请求也走主库
+# 由 market.middleware.PrimaryStickyMiddleware 跨请求保存到短期 cookie
+_primary_until = ContextVar("db_primary_until", default=0.0)
+
+
+# ---------------------------------------
+# 读写分离：选择数据库别名
+# ---------------------------------------
+def _read_alias():
+    """
+    读操作使用的数据库：
+    - 配置了 settings.DB_READ_ALIAS 时走只读库
+    - 刚写过（DB_STICKY_SECONDS 内）则继续走主库，避免读到复制延迟前的旧数据
+    """
+    alias = getattr(settings, "DB_READ_ALIAS", None)
+    if not alias or time.time() < _primary_until.get():
+        return "default"
+    return alias
+
+
+def _write_alias():
+    """写操作总是走主库，并让后续读操作在一段时间内粘在主库上"""
+    pin_primary(getattr(settings, "DB_STICKY_SECONDS", 5))
+    return "default"
+
+
+def pin_primary(seconds):
+    """接下来 seconds 秒内的读操作走主库"""
+    until = time.time() + seconds
+    if until > _primary_until.get():
+        _primary_until.set(until)
+
+
+def primary_pinned_until():
+    return _primary_until.get()
+
+
+def set_primary_pinned_until(timestamp):
+    """由 middleware 在请求开始时恢复（来自 cookie）"""
+    _primary_until.set(timestamp or 0.0)
+
+
+# ---------------------------------------
+# 从连接池借游标
+# ---------------------------------------
+@contextmanager
+def _cursor(alias="default"):
+    """
+    借一个游标：
+    - 处于 transaction() 中时复用事务连接（主库）
+    - 否则从 alias 对应的连接池借一条连接，用完归还
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        with conn.cursor() as cursor:
+            yield cursor
+        return
+
+    with get_pool(alias).connection() as conn:
+        with conn.cursor() as cursor:
+            yield cursor
+
+
+# ---------------------------------------
+# 事务：块内所有 query/execute 使用同一条连接
+# ---------------------------------------
+@contextmanager
+def transaction(alias="default"):
+    """
+    with transaction():
+        execute(...)
+        execute(...)
+    正常结束提交，抛异常回滚；支持嵌套（内层直接并入外层事务）
+    """
+    if getattr(_local, "conn", None) is not None:
+        yield _local.conn
+        return
+
+    if alias == "default":
+        _write_alias()
+
+    with get_pool(alias).connection() as conn:
+        conn.set_autocommit(False)
+        _local.conn = conn
+        _local.written = set()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            _local.conn = None
+            # 提交后再失效一次：防止事务期间其他请求把旧数据重新缓存
+            _invalidate(_local.written)
+            _local.written = None
+            try:
+                conn.set_autocommit(True)
+            except Exception:
+                # 连接已损坏：交给连接池丢弃
+                pass
+
+
+# ---------------------------------------
+# 写操作后失效查询缓存
+# ---------------------------------------
+def _invalidate(tables):
+    """
+    tables 为表名集合；None 表示无法确定写了哪些表，清空全部缓存
+    事务中的写入会在提交后再失效一次
+    """
+    cache = get_query_cache()
+    if tables is None:
+        cache.clear()
+        return
+
+    written = getattr(_local, "written", None)
+    if written is not None:
+        written.update(tables)
+    if tables:
+        cache.invalidate_tags(tables)
 
 
 # ---------------------------------------
@@ -28,19 +166,83 @@ def dict_fetch_one(cursor):
     return dict(zip(columns, row))
 
 
+# ---------------------------------------
+# 辅助函数：将 cursor 返回结果转为紧凑行对象（Row）
+# ---------------------------------------
+class _RowMixin:
+    """
+    Row 的公共方法：在 namedtuple 基础上支持 row["列名"]、get()、keys()，
+    因此既能 row.title，也能像 dict 一样 row["title"]（Django 模板两种都可用）
+    """
+
+    __slots__ = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def keys(self):
+        return self._index.keys()
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def as_dict(self):
+        return {k: tuple.__getitem__(self, i) for k, i in self._index.items()}
+
+
+@lru_cache(maxsize=256)
+def row_class(columns):
+    """
+    按列名元组生成（并缓存）一个 Row 类：
+    基于 namedtuple（__slots__ = ()），每行只是一个 tuple，没有每行一个 dict 的开销
+    """
+    base = namedtuple("Row", columns, rename=True)  # 非法列名（如 COUNT(*)）自动改名
+    index = {name: i for i, name in enumerate(columns)}  # 同名列与 dict 一致：后者覆盖前者
+    return type("Row", (_RowMixin, base), {"__slots__": (), "_index": index})
+
+
+def row_fetch_all(cursor):
+    """返回多行数据（Row 列表）"""
+    cls = row_class(tuple(col[0] for col in cursor.description))
+    new = tuple.__new__
+    return [new(cls, row) for row in cursor.fetchall()]
+
+
+def row_fetch_one(cursor):
+    """返回单行数据（Row）"""
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    cls = row_class(tuple(col[0] for col in cursor.description))
+    return tuple.__new__(cls, row)
+
+
 # ---------------------------------------
 # 执行 SELECT（返回单条记录）
 # ---------------------------------------
-def query_one(sql, params=None, as_dict=False):
+@cached_query
+@instrumented("query")
+def query_one(sql, params=None, as_dict=False, as_row=False):
     """
     执行查询（返回一行）
     as_dict = True → 返回 dict
+    as_row = True → 返回 Row（紧凑、只读，可用 row.列名 / row["列名"]）
+    cache_ttl = 秒数 → 结果缓存（见 common/query_cache.py），cache_tables 指定依赖的表
     """
-    with connection.cursor() as cursor:
+    with _cursor(_read_alias()) as cursor:
         cursor.execute(sql, params or [])
 
         if as_dict:
             return dict_fetch_one(cursor)
+        elif as_row:
+            return row_fetch_one(cursor)
         else:
             return cursor.fetchone()
 
@@ -48,51 +250,219 @@ def query_one(sql, params=None, as_dict=False):
 # ---------------------------------------
 # 执行 SELECT（返回多条记录）
 # ---------------------------------------
-def query_all(sql, params=None, as_dict=False):
+@cached_query
+@instrumented("query")
+def query_all(sql, params=None, as_dict=False, as_row=False):
     """
     执行查询（返回多行）
     as_dict = True → 返回 dict 列表
+    as_row = True → 返回 Row 列表（只读；大结果集推荐，内存远小于 dict）
+    cache_ttl = 秒数 → 结果缓存（见 common/query_cache.py），cache_tables 指定依赖的表
     """
-    with connection.cursor() as cursor:
+    with _cursor(_read_alias()) as cursor:
         cursor.execute(sql, params or [])
 
         if as_dict:
             return dict_fetch_all(cursor)
+        elif as_row:
+            return row_fetch_all(cursor)
         else:
             return cursor.fetchall()
 
 
+# ---------------------------------------
+# 流式 SELECT（逐批读取，适合大表列表 / 导出）
+# ---------------------------------------
+@instrumented_iter("query")
+def query_iter(sql, params=None, batch_size=500, as_dict=False, as_row=False):
+    """
+    执行查询（生成器，逐行返回）
+    - MySQL 使用服务端游标（SSCursor），结果不在客户端整体缓存
+    - 每次从服务端取 batch_size 行
+    - 迭代结束（或生成器被关闭）前会一直占用一条连接
+    as_dict = True → 每行为 dict
+    as_row = True → 每行为 Row
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        # 事务中复用事务连接（普通游标）
+        with conn.cursor() as cursor:
+            yield from _iter_cursor(cursor, sql, params, batch_size, as_dict, as_row)
+        return
+
+    with get_pool(_read_alias()).connection() as conn:
+        cursor = _server_side_cursor(conn)
+        try:
+            yield from _iter_cursor(cursor, sql, params, batch_size, as_dict, as_row)
+        finally:
+            # SSCursor 关闭时会读完剩余结果，连接才能放回池中复用
+            cursor.close()
+
+
+def _server_side_cursor(conn):
+    """MySQL 返回无缓冲的服务端游标；其他后端（SQLite 等）本身就是逐行读取"""
+    if conn.vendor == "mysql":
+        from MySQLdb.cursors import SSCursor
+
+        conn.ensure_connection()
+        return conn.connection.cursor(SSCursor)
+    return conn.cursor()
+
+
+def _iter_cursor(cursor, sql, params, batch_size, as_dict, as_row):
+    cursor.execute(sql, params or [])
+    columns = tuple(col[0] for col in cursor.description)
+    cls = row_class(columns) if as_row else None
+
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            if as_dict:
+                yield dict(zip(columns, row))
+            elif as_row:
+                yield tuple.__new__(cls, row)
+            else:
+                yield row
+
+
 # ---------------------------------------
 # 执行写操作（INSERT / UPDATE / DELETE）
 # ---------------------------------------
+@instrumented("execute")
 def execute(sql, params=None):
     """
     执行 INSERT / UPDATE / DELETE
     返回 True 表示成功
     """
-    with connection.cursor() as cursor:
+    with _cursor(_write_alias()) as cursor:
+        cursor.execute(sql, params or [])
+    _invalidate(tables_of(sql))
+    return True
+
+
+@instrumented("execute_insert")
+def execute_insert(sql, params=None):
+    """
+    执行单条 INSERT，返回新行的自增主键（lastrowid）
+    """
+    with _cursor(_write_alias()) as cursor:
         cursor.execute(sql, params or [])
+        last_id = cursor.lastrowid
+    _invalidate(tables_of(sql))
+    return last_id
+
+
+# ---------------------------------------
+# 批量写操作（同一 SQL，多组参数）
+# ---------------------------------------
+@instrumented("execute_many")
+def execute_many(sql, params_list):
+    """
+    对多组参数执行同一条 INSERT / UPDATE / DELETE，整体在一个事务中
+    MySQLdb 会把 INSERT ... VALUES (%s, ...) 自动改写成一条多行 INSERT
+    返回 True 表示成功
+    """
+    params_list = list(params_list)
+    if not params_list:
+        return True
+
+    with transaction():
+        with _cursor() as cursor:
+            cursor.executemany(sql, params_list)
+    _invalidate(tables_of(sql))
     return True
 
 
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _quote_name(name):
+    """表名 / 列名只允许字母数字下划线，并加反引号（防注入、兼容 `order` 等保留字）"""
+    if not _IDENTIFIER.match(name):
+        raise Exception(f"非法的表名或列名：{name}")
+    return f"`{name}`"
+
+
+@instrumented("bulk_insert")
+def bulk_insert(table, columns, rows, chunk_size=500):
+    """
+    多行 INSERT：
+        INSERT INTO table (c1, c2) VALUES (%s, %s), (%s, %s), ...
+    每 chunk_size 行一条语句（一次往返），全部批次在同一个事务中
+    返回插入的行数
+    """
+    rows = [tuple(r) for r in rows]
+    if not rows:
+        return 0
+
+    width = len(columns)
+    if any(len(r) != width for r in rows):
+        raise Exception("bulk_insert：每行的值个数必须与列数一致")
+
+    head = "INSERT INTO {} ({}) VALUES ".format(
+        _quote_name(table),
+        ", ".join(_quote_name(c) for c in columns),
+    )
+    placeholder = "(" + ", ".join(["%s"] * width) + ")"
+
+    with transaction():
+        with _cursor() as cursor:
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                sql = head + ", ".join([placeholder] * len(chunk))
+                cursor.execute(sql, [v for r in chunk for v in r])
+        _invalidate({table.lower()})
+
+    return len(rows)
+
+
 # ---------------------------------------
 # 调用存储过程（你已有 create_order_proc/confirm/cancel）
 # ---------------------------------------
-def call_proc(proc_name, params=None, as_dict=False):
+@instrumented("call_proc")
+def call_proc(proc_name, params=None, as_dict=False, invalidates=None):
     """
     调用存储过程：
         CALL proc_name(param1, param2);
 
     返回结果（如果过程有 SELECT）
+    invalidates：过程（及其触发器）会写的表名，用于失效查询缓存；
+                 不传则清空全部查询缓存
     """
-    with connection.cursor() as cursor:
+    with _cursor(_write_alias()) as cursor:
         cursor.callproc(proc_name, params or [])
 
         # GaussDB/MySQL 中，存储过程执行后 cursor 会返回结果
         try:
             if as_dict:
-                return dict_fetch_all(cursor)
+                result = dict_fetch_all(cursor)
             else:
-                return cursor.fetchall()
+                result = cursor.fetchall()
         except:
-            return None
+            result = None
+
+        # 连接会被放回连接池复用：把剩余结果集读完，
+        # 否则下一个借到这条连接的查询会报 "Commands out of sync"
+        try:
+            while cursor.nextset():
+                pass
+        except Exception:
+            pass
+
+        _invalidate(set(invalidates) if invalidates is not None else None)
+        return result
+
+
+# ---------------------------------------
+# 连接池状态（调试 / 监控用）
+# ---------------------------------------
+def pool_stats():
+    """返回各数据库别名的连接池统计"""
+    return get_pool_stats()
+
+
+def cache_stats():
+    """返回查询缓存的命中 / 未命中 / 淘汰等统计"""
+    return get_query_cache().stats()
@@ -0,0 +1,201 @@
+# common/image_variants.py
+# ================================================
+# 封面图多尺寸版本
+# - 上传后原图照常保存，缩略图（thumb）/ 中图（medium）交给后台线程池生成，
+#   请求不等待图片解码 / 压缩
+# - 版本文件与原图同目录：xxx.jpg → xxx_thumb.webp / xxx_medium.webp，
+#   先写临时文件再 os.replace，生成到一半不会被访问到
+# - 模板用 {{ url|variant:"thumb" }} 引用；版本还没生成（或未安装 Pillow）时退回原图
+# Pillow 列在 requirements.txt 中；未安装时不生成版本、一律使用原图，
+# 非 DEBUG 环境启动时记一条警告（check_available，由 MarketConfig.ready 调用）
+# ================================================
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:     # 未安装 Pillow
+    Image = ImageOps = None
+
+
+logger = logging.getLogger("common.image_variants")
+
+DEFAULT_IMAGE_VARIANTS_CONFIG = {
+    "ENABLED": True,
+    "WORKERS": 2,                                   # 生成版本的线程数
+    "FORMAT": "WEBP",
+    "QUALITY": 80,
+    "SIZES": {"thumb": 320, "medium": 1024},        # 版本名 → 最长边（像素），只缩小不放大
+    "READY_CACHE_SIZE": 10000,                      # 记住多少个版本文件是否存在（LRU）
+    "MISS_RECHECK": 30,                             # 不存在的版本隔多少秒再查一次磁盘（可能由其他进程生成）
+}
+
+_EXTENSIONS = {"WEBP": ".webp", "JPEG": ".jpg", "PNG": ".png"}
+
+
+def _config():
+    return dict(DEFAULT_IMAGE_VARIANTS_CONFIG, **getattr(settings, "IMAGE_VARIANTS", {}))
+
+
+def available():
+    return Image is not None and _config()["ENABLED"]
+
+
+def check_available():
+    """启动时调用：生产环境（非 DEBUG）启用了版本生成却没装 Pillow 时记警告，列表页会一直用原图"""
+    if Image is None and _config()["ENABLED"] and not settings.DEBUG:
+        logger.warning(
+            "Pillow is not installed: image variants are disabled and list pages serve original images "
+            "(pip install -r requirements.txt)"
+        )
+
+
+def variant_name(name, variant):
+    """原图相对路径 → 版本相对路径（postings/ab.jpg → postings/ab_thumb.webp）"""
+    root, _ = os.path.splitext(name)
+    return f"{root}_{variant}{_EXTENSIONS[_config()['FORMAT']]}"
+
+
+# ---------------------------------------
+# 生成（后台线程）
+# ---------------------------------------
+_executor = None
+_executor_lock = threading.Lock()
+_stats = {"submitted": 0, "done": 0, "failed": 0}
+_stats_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_config()["WORKERS"], thread_name_prefix="image-variants"
+            )
+        return _executor
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def make_variants(name):
+    """同步生成 name（MEDIA_ROOT 下的相对路径）的全部版本"""
+    config = _config()
+    source = os.path.join(settings.MEDIA_ROOT, name)
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)     # 手机照片按 EXIF 方向摆正
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for variant, size in config["SIZES"].items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            target = variant_name(name, variant)
+            path = os.path.join(settings.MEDIA_ROOT, target)
+            tmp = f"{path}.tmp"
+            resized.save(tmp, format=config["FORMAT"], quality=config["QUALITY"])
+            os.replace(tmp, path)
+            _ready.put(target, True)
+
+
+def _run(name):
+    try:
+        make_variants(name)
+    except Exception:
+        _count("failed")
+        logger.exception("failed to build image variants for %s", name)
+    else:
+        _count("done")
+
+
+def submit(name):
+    """提交后台生成任务；Pillow 不可用或已关闭时什么都不做"""
+    if not available():
+        return None
+    _count("submitted")
+    return _get_executor().submit(_run, name)
+
+
+# ---------------------------------------
+# 引用
+# ---------------------------------------
+class _ReadyCache:
+    """
+    版本文件是否存在的 LRU 缓存，最多 READY_CACHE_SIZE 条
+    - 本进程生成版本时直接记为存在，渲染模板时不再查磁盘
+    - 查到不存在的记下查询时间，MISS_RECHECK 秒内不再查（其他进程生成的稍后才能看到）
+    """
+
+    def __init__(self):
+        self._items = OrderedDict()     # 版本相对路径 → (是否存在, 查询时间)
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """返回 True / False；没有记录或需要重新检查时返回 None"""
+        with self._lock:
+            item = self._items.get(name)
+            if item is None:
+                return None
+            exists, checked_at = item
+            if not exists and time.monotonic() - checked_at >= _config()["MISS_RECHECK"]:
+                return None
+            self._items.move_to_end(name)
+            return exists
+
+    def put(self, name, exists):
+        limit = _config()["READY_CACHE_SIZE"]
+        with self._lock:
+            self._items[name] = (exists, time.monotonic())
+            self._items.move_to_end(name)
+            while len(self._items) > limit:
+                self._items.popitem(last=False)
+
+    def discard(self, name):
+        with self._lock:
+            self._items.pop(name, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+_ready = _ReadyCache()
+
+
+def variant_url(url, variant):
+    """
+    原图 URL → 版本 URL；不是本站 MEDIA_URL 下的图片、或版本文件尚不存在时返回原图 URL
+    """
+    if not url or not url.startswith(settings.MEDIA_URL) or not available():
+        return url
+    name = variant_name(url[len(settings.MEDIA_URL):], variant)
+    exists = _ready.get(name)
+    if exists is None:
+        exists = os.path.exists(os.path.join(settings.MEDIA_ROOT, name))
+        _ready.put(name, exists)
+    return settings.MEDIA_URL + name if exists else url
+
+
+def delete_variants(name):
+    """原图被删除时一并删除其版本"""
+    for variant in _config()["SIZES"]:
+        target = variant_name(name, variant)
+        _ready.discard(target)
+        try:
+            os.remove(os.path.join(settings.MEDIA_ROOT, target))
+        except FileNotFoundError:
+            pass
+
+
+def image_variants_stats():
+    with _stats_lock:
+        data = dict(_stats)
+    data.update({"pillow": Image is not None, "enabled": _config()["ENABLED"], "ready_cache": len(_ready)})
+    return data
@@ -0,0 +1,272 @@
+# common/instrument.py
+# ================================================
+# SQL 埋点：统计每个请求执行了多少条 SQL、耗时、返回行数，
+# 记录慢查询及其调用的 DAO 函数
+# common/db.py 的 query_* / execute / call_proc 都经过这里
+# ================================================
+
+import functools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+
+
+logger = logging.getLogger("common.db")
+
+# 默认配置，可在 settings.SQL_INSTRUMENT 中覆盖
+DEFAULT_INSTRUMENT_CONFIG = {
+    "ENABLED": True,
+    "SLOW_QUERY_MS": 200,     # 超过该耗时的 SQL 记一条 warning
+}
+
+# 调试接口保留最近多少个请求的统计
+RECENT_REQUESTS = 50
+
+_COMMON_DIR = os.path.dirname(os.path.abspath(__file__))
+_SKIP_FILES = {
+    os.path.join(_COMMON_DIR, "db.py"),
+    os.path.join(_COMMON_DIR, "instrument.py"),
+    os.path.join(_COMMON_DIR, "pool.py"),
+    os.path.join(_COMMON_DIR, "query_cache.py"),    # query_one / query_all 外层的 cached_query
+}
+
+# 当前请求的统计（middleware 中开启）
+_current = ContextVar("sql_request_stats", default=None)
+
+# capture_queries() 收集 SQL 的列表
+_capture = ContextVar("sql_capture", default=None)
+
+_recent = deque(maxlen=RECENT_REQUESTS)
+_recent_lock = threading.Lock()
+
+
+def _config():
+    return dict(DEFAULT_INSTRUMENT_CONFIG, **getattr(settings, "SQL_INSTRUMENT", {}))
+
+
+# ---------------------------------------
+# SQL 指纹：去掉字面量、合并空白，同一模板的 SQL 归为一类
+# ---------------------------------------
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_IN_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_RE_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """
+    SELECT * FROM t WHERE id IN (%s, %s) AND name = 'x'
+    → SELECT * FROM t WHERE id IN (?+) AND name = ?
+    """
+    fp = _RE_STRING.sub("?", sql)
+    fp = _RE_NUMBER.sub("?", fp)
+    fp = _RE_IN_LIST.sub("(?+)", fp)
+    fp = _RE_SPACE.sub(" ", fp).strip()
+    return fp.replace("%s", "?")
+
+
+def _caller():
+    """找到调用 common.db 的第一个外部函数（一般是某个 DAO 函数）"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename not in _SKIP_FILES and "contextlib" not in filename:
+            module = frame.f_globals.get("__name__", "?")
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+# ---------------------------------------
+# 单个请求的 SQL 统计
+# ---------------------------------------
+class RequestStats:
+    def __init__(self, label=""):
+        self.label = label
+        self.count = 0
+        self.total_ms = 0.0
+        self.rows = 0
+        self.by_fingerprint = {}   # fingerprint → {count, total_ms, rows, callers}
+
+    def add(self, fp, elapsed_ms, rows, caller):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.rows += rows
+
+        entry = self.by_fingerprint.get(fp)
+        if entry is None:
+            entry = self.by_fingerprint[fp] = {"count": 0, "total_ms": 0.0, "rows": 0, "callers": set()}
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["rows"] += rows
+        entry["callers"].add(caller)
+
+    def summary(self, top=10):
+        queries = sorted(self.by_fingerprint.items(), key=lambda kv: kv[1]["total_ms"], reverse=True)
+        return {
+            "label": self.label,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "rows": self.rows,
+            "queries": [
+                {
+                    "sql": fp,
+                    "count": e["count"],
+                    "total_ms": round(e["total_ms"], 2),
+                    "rows": e["rows"],
+                    "callers": sorted(e["callers"]),
+                }
+                for fp, e in queries[:top]
+            ],
+        }
+
+    def header_value(self):
+        return f"count={self.count}; time={self.total_ms:.1f}ms; rows={self.rows}"
+
+
+def start_request(label=""):
+    """开始统计一个请求（返回 token，用于 finish_request）"""
+    return _current.set(RequestStats(label))
+
+
+def finish_request(token):
+    """结束统计，返回该请求的 RequestStats，并放入最近请求列表"""
+    stats = _current.get()
+    _current.reset(token)
+    if stats is not None:
+        with _recent_lock:
+            _recent.append(stats.summary())
+    return stats
+
+
+def current_stats():
+    return _current.get()
+
+
+def recent_requests():
+    """最近若干个请求的 SQL 统计（新 → 旧）"""
+    with _recent_lock:
+        return list(reversed(_recent))
+
+
+# ---------------------------------------
+# 收集 SQL 及参数（EXPLAIN 检查等离线工具使用）
+# ---------------------------------------
+@contextmanager
+def capture_queries():
+    """
+    with capture_queries() as queries:
+        get_my_complaints(1)
+    queries → [{"kind": "query", "sql": ..., "params": [...], "caller": "common.complaint_dao.get_my_complaints"}]
+    """
+    queries = []
+    token = _capture.set(queries)
+    try:
+        yield queries
+    finally:
+        _capture.reset(token)
+
+
+def _captured(kind, sql, args, kwargs, caller=None):
+    queries = _capture.get()
+    if queries is not None:
+        params = args[0] if args else kwargs.get("params")
+        queries.append({"kind": kind, "sql": sql, "params": params, "caller": caller or _caller()})
+
+
+# ---------------------------------------
+# 记录一条 SQL
+# ---------------------------------------
+def record(kind, sql, elapsed, rows, caller=None):
+    config = _config()
+    if not config["ENABLED"]:
+        return
+
+    elapsed_ms = elapsed * 1000
+    stats = _current.get()
+    slow = elapsed_ms >= config["SLOW_QUERY_MS"]
+    if stats is None and not slow:
+        return
+
+    fp = fingerprint(sql)
+    caller = caller or _caller()
+
+    if stats is not None:
+        stats.add(fp, elapsed_ms, rows, caller)
+
+    if slow:
+        logger.warning("slow %s %.1fms rows=%d caller=%s sql=%s", kind, elapsed_ms, rows, caller, fp)
+
+
+def _count_rows(kind, result):
+    if kind == "execute_insert":
+        # 返回值是自增主键，不是行数
+        return 1
+    if result is None or result is True:
+        return 0
+    if isinstance(result, int):
+        return result
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        # query_one 返回单行 tuple；raw 模式的 query_all 返回 tuple 的 tuple
+        return len(result) if result and isinstance(result[0], (list, tuple, dict)) else 1
+    return 1
+
+
+def _statement(kind, sql):
+    if kind == "call_proc":
+        return f"CALL {sql}"
+    if kind == "bulk_insert":
+        return f"INSERT INTO {sql} VALUES (bulk)"
+    return sql
+
+
+def instrumented(kind):
+    """
+    装饰 common.db 的查询函数：第一个参数为 SQL（call_proc 为过程名）
+    记录耗时、返回行数和 SQL 指纹
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(sql, *args, **kwargs):
+            _captured(kind, sql, args, kwargs)
+            start = time.perf_counter()
+            result = fn(sql, *args, **kwargs)
+            record(kind, _statement(kind, sql), time.perf_counter() - start, _count_rows(kind, result))
+            return result
+        return wrapper
+    return decorator
+
+
+def instrumented_iter(kind):
+    """装饰生成器（query_iter）：迭代结束时记录总耗时和总行数"""
+    def decorator(fn):
+        def stream(caller, sql, args, kwargs):
+            start = time.perf_counter()
+            rows = 0
+            try:
+                for row in fn(sql, *args, **kwargs):
+                    rows += 1
+                    yield row
+            finally:
+                record(kind, sql, time.perf_counter() - start, rows, caller=caller)
+
+        @functools.wraps(fn)
+        def wrapper(sql, *args, **kwargs):
+            # 调用方在创建生成器时确定（迭代往往发生在模板渲染中）
+            caller = _caller()
+            _captured(kind, sql, args, kwargs, caller)
+            return stream(caller, sql, args, kwargs)
+        return wrapper
+    return decorator
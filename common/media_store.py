@@ -0,0 +1,147 @@
+# common/media_store.py
+# ================================================
+# 内容寻址的媒体文件存储
+# - 上传文件边读边算 sha256，按摘要存放：postings/ab/cd/abcd…(64 位).jpg
+#   同一张图片无论上传几次、被几个帖子引用，磁盘上只有一份
+# - 文件名由内容决定、永不改写，可以让浏览器 / nginx 永久缓存（见 CACHE_CONTROL）
+# - 引用计数不单独存：image.path 与 posting.image_url 中引用该 URL 的行数即引用数
+#   （posting_dao.count_media_refs），归零时删除文件及其缩略图版本
+# - 刚写入 / 刚被复用的文件在 GRACE_SECONDS 内不删：上传与插入引用记录之间有时间差
+# ================================================
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+
+from common import image_variants
+
+
+DEFAULT_MEDIA_STORE_CONFIG = {
+    "GRACE_SECONDS": 3600,
+    "MAX_IMAGE_SIZE": 10 * 1024 * 1024,     # 单张图片上限（字节），上传时边读边检查
+}
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_NAME_RE = re.compile(r"^[a-z]+/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$")
+
+# 同一格式统一扩展名，避免同一内容因扩展名不同存成两份
+_EXT_ALIASES = {".jpeg": ".jpg"}
+
+
+def _config():
+    return dict(DEFAULT_MEDIA_STORE_CONFIG, **getattr(settings, "MEDIA_STORE", {}))
+
+
+def max_image_size():
+    return _config()["MAX_IMAGE_SIZE"]
+
+
+def _path(name):
+    return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def is_stored(name):
+    """name（MEDIA_ROOT 下相对路径）或 /media/ URL 是否是内容寻址文件（含其版本）"""
+    if name and name.startswith(settings.MEDIA_URL):
+        name = name[len(settings.MEDIA_URL):]
+    return bool(name) and _NAME_RE.match(name) is not None
+
+
+class Writer:
+    """
+    边写边算摘要：write() 逐块写入 MEDIA_ROOT/<prefix>/.tmp 下的临时文件，
+    finish() 按摘要改名到最终位置（同一文件系统内 rename，不再复制）
+    上传处理器（market/uploads.py）在读取请求体的同时直接调用，不经过内存 / 额外的临时目录
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.size = 0
+        self._digest = hashlib.sha256()
+        tmp_dir = os.path.join(settings.MEDIA_ROOT, prefix, ".tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=tmp_dir)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk):
+        self._digest.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def finish(self, ext):
+        """返回 (相对路径, 是否新写入)；内容已存在时丢弃临时文件"""
+        self._file.close()
+        ext = ext.lower()
+        ext = _EXT_ALIASES.get(ext, ext)
+        hexdigest = self._digest.hexdigest()
+        name = f"{self.prefix}/{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}{ext}"
+        target = _path(name)
+        if os.path.exists(target):
+            os.utime(target)            # 刷新 mtime，进入 GRACE_SECONDS 保护期
+            self.abort()
+            return name, False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(self._tmp, target)
+        self._tmp = None
+        return name, True
+
+    def abort(self):
+        self._file.close()
+        if self._tmp is not None and os.path.exists(self._tmp):
+            os.remove(self._tmp)
+        self._tmp = None
+
+
+def save(upload, prefix, ext):
+    """
+    保存上传文件（Django UploadedFile 或任意带 chunks() 的对象）
+    返回 (相对路径, 是否新写入)；内容已存在时不再写盘
+    """
+    writer = Writer(prefix)
+    try:
+        for chunk in upload.chunks():
+            writer.write(chunk)
+        return writer.finish(ext)
+    finally:
+        writer.abort()
+
+
+def url(name):
+    return settings.MEDIA_URL + name
+
+
+def remove(name):
+    """
+    删除内容寻址文件及其缩略图版本；调用方确认引用数为 0
+    保护期内的文件保留（返回 False），由 gc_media 之后再回收
+    """
+    if name.startswith(settings.MEDIA_URL):
+        name = name[len(settings.MEDIA_URL):]
+    if not is_stored(name):
+        return False
+    path = _path(name)
+    try:
+        if time.time() - os.path.getmtime(path) < _config()["GRACE_SECONDS"]:
+            return False
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    image_variants.delete_variants(name)
+    return True
+
+
+def iter_stored(prefix):
+    """遍历 prefix 下的内容寻址原图（不含版本），供 gc_media 使用"""
+    root = os.path.join(settings.MEDIA_ROOT, prefix)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != ".tmp"]
+        for filename in filenames:
+            name = os.path.relpath(os.path.join(dirpath, filename), settings.MEDIA_ROOT).replace(os.sep, "/")
+            match = _NAME_RE.match(name)
+            if match and not match.group(1):
+                yield name
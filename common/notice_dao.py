@@ -3,7 +3,7 @@
 # 消息 / 公告 Notice 模块 DAO
 # ======================================================
 
-from common.db import query_one, query_all, execute
+from common.db import query_one, query_all, execute, bulk_insert
 
 
 # ======================================================
@@ -75,24 +75,37 @@ def create_notice_for_admins(content, notice_type="系统", related_order_id=Non
     if not content:
         raise Exception("消息内容不能为空")
 
+    if notice_type not in ("系统", "交接提醒"):
+        raise Exception("notice_type 只能是 '系统' 或 '交接提醒'")
+
     admin_rows = query_all("SELECT user_id FROM user WHERE user_role = 3", as_dict=False)
     admin_ids = [r[0] for r in admin_rows] if admin_rows else []
 
-    for admin_id in admin_ids:
-        create_user_notice(admin_id, content, notice_type=notice_type, related_order_id=related_order_id)
+    # 一条多行 INSERT 发给所有管理员（而不是每个管理员一次往返）
+    bulk_insert(
+        "notice",
+        ["type", "content", "receiver_id", "related_order_id", "status"],
+        [(notice_type, content, admin_id, related_order_id, "未读") for admin_id in admin_ids],
+    )
 
 
 # ======================================================
 # 获取所有公告（type = '公告'）
 # ======================================================
-def get_announcements():
+def get_announcements(limit=None):
+    """limit 推到 SQL（首页只取最新几条），走 idx_type_created (type, created_at)"""
     sql = """
         SELECT notice_id, title, created_at
         FROM notice
         WHERE type = '公告'
         ORDER BY created_at DESC
     """
-    return query_all(sql, as_dict=True)
+    params = []
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(int(limit))
+    # 每次写 notice 表都会失效；TTL 兜底其他进程的写入
+    return query_all(sql, params, as_dict=True, cache_ttl=60)
 
 
 # ======================================================
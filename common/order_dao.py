@@ -4,6 +4,7 @@
 # ======================================================
 
 from common.db import query_one, query_all, execute, call_proc
+from common.posting_dao import invalidate_posting_detail
 
 
 # ======================================================
@@ -16,7 +17,9 @@ def create_order_by_proc(posting_id, buyer_id, quantity):
     内部已检查库存是否足够，不足会抛出异常。
     """
     try:
-        call_proc("create_order_proc", [posting_id, buyer_id, quantity])
+        call_proc("create_order_proc", [posting_id, buyer_id, quantity], invalidates=["order", "posting_stats"])
+        # 订单数由触发器 trg_order_count 维护
+        invalidate_posting_detail(posting_id)
         return True
     except Exception as e:
         # 存储过程库存不足会触发 SIGNAL
@@ -37,7 +40,7 @@ def get_buyer_orders(user_id):
         WHERE o.buyer_id = %s
         ORDER BY o.created_at DESC
     """
-    return query_all(sql, [user_id], as_dict=True)
+    return query_all(sql, [user_id], as_row=True)
 
 
 # ======================================================
@@ -53,7 +56,7 @@ def get_seller_orders(user_id):
         WHERE o.seller_id = %s
         ORDER BY o.created_at DESC
     """
-    return query_all(sql, [user_id], as_dict=True)
+    return query_all(sql, [user_id], as_row=True)
 
 
 # ======================================================
@@ -80,7 +83,11 @@ def get_order_detail(order_id):
 # ======================================================
 def confirm_order_by_proc(order_id):
     try:
-        call_proc("confirm_order_proc", [order_id])
+        # 触发器 trg_order_confirm 会扣减 posting 库存（可能变为已约满），帖子详情缓存随之失效
+        order = query_one("SELECT posting_id FROM `order` WHERE order_id = %s", [order_id], as_dict=True)
+        call_proc("confirm_order_proc", [order_id], invalidates=["order", "notice", "posting"])
+        if order:
+            invalidate_posting_detail(order["posting_id"])
         return True
     except Exception as e:
         print("确认订单失败:", e)
@@ -92,7 +99,7 @@ def confirm_order_by_proc(order_id):
 # ======================================================
 def complete_order_by_proc(order_id, user_id):
     try:
-        call_proc("complete_order_proc", [order_id, user_id])
+        call_proc("complete_order_proc", [order_id, user_id], invalidates=["order", "notice"])
         return True
     except Exception as e:
         print("完成订单失败:", e)
@@ -104,7 +111,7 @@ def complete_order_by_proc(order_id, user_id):
 # ======================================================
 def cancel_order_by_proc(order_id, reason, user_id):
     try:
-        call_proc("cancel_order_proc", [order_id, reason, user_id])
+        call_proc("cancel_order_proc", [order_id, reason, user_id], invalidates=["order", "notice"])
         return True
     except Exception as e:
         print("取消订单失败:", e)
@@ -0,0 +1,275 @@
+# common/pool.py
+# ================================================
+# 数据库连接池
+# common/db.py 的所有查询都从这里借连接，
+# 避免每次请求都重新走一遍 TCP + TLS + 认证握手
+# ================================================
+
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+# 默认配置，可在 settings.DB_POOL 中覆盖
+DEFAULT_POOL_CONFIG = {
+    "MIN_SIZE": 1,          # 常驻的最少空闲连接数
+    "MAX_SIZE": 10,         # 最多同时打开的连接数
+    "IDLE_TIMEOUT": 300,    # 空闲超过多少秒的连接会被回收（保留 MIN_SIZE 个）
+    "MAX_LIFETIME": 3600,   # 连接最长存活秒数，超过后归还时直接关闭
+    "PING_AFTER": 5,        # 空闲超过多少秒的连接在复用前先 ping 一下
+    "TIMEOUT": 10,          # 连接池满时最多等待多少秒
+}
+
+
+class _PooledConnection:
+    """连接池里的一条连接：Django DatabaseWrapper + 时间戳"""
+
+    __slots__ = ("wrapper", "created_at", "last_used")
+
+    def __init__(self, wrapper):
+        now = time.monotonic()
+        self.wrapper = wrapper
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    基于 Django 数据库后端的连接池：
+    - 每条连接是一个独立的 DatabaseWrapper（与 django.db.connection 互不影响）
+    - 借出前对空闲较久的连接做存活检测（MySQL 为 ping）
+    - 归还时回收超时空闲 / 超过最长存活时间 / 已损坏的连接
+    """
+
+    def __init__(self, alias="default", **config):
+        self.alias = alias
+        self.config = dict(DEFAULT_POOL_CONFIG, **config)
+
+        self._idle = []             # 空闲连接（栈：后进先出，优先复用热连接）
+        self._size = 0              # 已打开的连接总数（空闲 + 借出）
+        self._cond = threading.Condition()
+
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "closed_idle": 0,
+            "closed_expired": 0,
+            "closed_broken": 0,
+            "ping_failed": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+
+    # ---------------------------------------
+    # 对外接口
+    # ---------------------------------------
+    @contextmanager
+    def connection(self):
+        """
+        借一条连接，用完自动归还：
+            with pool.connection() as conn:
+                with conn.cursor() as cursor: ...
+        """
+        item = self._acquire()
+        broken = False
+        try:
+            yield item.wrapper
+        except Exception:
+            # 出错后连接可能已断开，归还前确认一下
+            broken = not self._is_usable(item.wrapper)
+            raise
+        finally:
+            self._release(item, broken=broken)
+
+    def warm_up(self):
+        """预先建立 MIN_SIZE 条连接"""
+        with self._cond:
+            missing = self.config["MIN_SIZE"] - self._size
+            self._size += max(missing, 0)
+
+        for _ in range(max(missing, 0)):
+            try:
+                item = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(item)
+                self._cond.notify()
+
+    def close_all(self):
+        """关闭所有空闲连接（借出中的连接归还时再关闭）"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for item in idle:
+            self._close(item)
+
+    def stats(self):
+        """连接池状态快照"""
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                "alias": self.alias,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.config["MIN_SIZE"],
+                "max_size": self.config["MAX_SIZE"],
+            })
+        return data
+
+    # ---------------------------------------
+    # 内部实现
+    # ---------------------------------------
+    def _acquire(self):
+        deadline = time.monotonic() + self.config["TIMEOUT"]
+
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.config["MAX_SIZE"]:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise Exception(
+                            f"数据库连接池已满（{self.config['MAX_SIZE']}），等待连接超时"
+                        )
+                    self._stats["waits"] += 1
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    item = self._idle.pop()
+                else:
+                    # 先占位再建连接，建连接时不持有锁
+                    self._size += 1
+                    item = None
+
+            if item is None:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            idle_for = time.monotonic() - item.last_used
+            if idle_for >= self.config["PING_AFTER"] and not self._is_usable(item.wrapper):
+                with self._cond:
+                    self._stats["ping_failed"] += 1
+                self._discard(item)
+                continue
+
+            with self._cond:
+                self._stats["reused"] += 1
+            return item
+
+    def _release(self, item, broken=False):
+        now = time.monotonic()
+        wrapper = item.wrapper
+
+        if not broken and not wrapper.get_autocommit():
+            # 事务没有正常结束：回滚后再放回池中
+            try:
+                wrapper.rollback()
+                wrapper.set_autocommit(True)
+            except Exception:
+                broken = True
+
+        if broken:
+            with self._cond:
+                self._stats["closed_broken"] += 1
+            self._discard(item)
+            return
+
+        if now - item.created_at >= self.config["MAX_LIFETIME"]:
+            with self._cond:
+                self._stats["closed_expired"] += 1
+            self._discard(item)
+            return
+
+        item.last_used = now
+        with self._cond:
+            self._idle.append(item)
+            expired = self._evict_idle(now)
+            self._cond.notify()
+
+        for old in expired:
+            self._close(old)
+
+    def _evict_idle(self, now):
+        """回收空闲过久的连接（调用方持有锁），返回需要关闭的连接"""
+        timeout = self.config["IDLE_TIMEOUT"]
+        keep = self.config["MIN_SIZE"]
+        expired = []
+
+        # _idle 按归还时间排序，最旧的在栈底
+        while len(self._idle) > keep and now - self._idle[0].last_used >= timeout:
+            expired.append(self._idle.pop(0))
+
+        self._size -= len(expired)
+        self._stats["closed_idle"] += len(expired)
+        return expired
+
+    def _open(self):
+        wrapper = connections.create_connection(self.alias)
+        # 连接可能在不同线程之间借用，关闭 Django 的线程归属检查
+        wrapper.inc_thread_sharing()
+        wrapper.ensure_connection()
+
+        with self._cond:
+            self._stats["created"] += 1
+        return _PooledConnection(wrapper)
+
+    def _discard(self, item):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        self._close(item)
+
+    @staticmethod
+    def _close(item):
+        try:
+            item.wrapper.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_usable(wrapper):
+        try:
+            return wrapper.connection is not None and wrapper.is_usable()
+        except Exception:
+            return False
+
+
+# ---------------------------------------
+# 每个数据库别名一个连接池
+# ---------------------------------------
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias="default"):
+    pool = _pools.get(alias)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            config = getattr(settings, "DB_POOL", {})
+            pool = ConnectionPool(alias, **config)
+            pool.warm_up()
+            _pools[alias] = pool
+    return pool
+
+
+def get_pool_stats():
+    """所有连接池的状态（alias → stats）"""
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
@@ -3,20 +3,72 @@
 # 出物帖 Posting + 图片 Image + 收藏 Favorite 的 DAO 层
 # ======================================================
 
-from common.db import query_one, query_all, execute
+from django.conf import settings
+
+from common.db import query_one, query_all, query_iter, execute, execute_insert
+from common import media_store, search_index, view_counter, visibility
+from common.query_cache import cache_enabled, get_query_cache
+from common.search_dao import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor, normalize_page_size
+
+
+# ======================================================
+# 写帖子后同步进程内的检索索引 / 可见集合 / 详情缓存
+# ======================================================
+def _refresh_indexes(posting_id):
+    search_index.refresh_posting(posting_id)
+    visibility.refresh_posting(posting_id)
+    invalidate_posting_detail(posting_id)
 
 
 # ======================================================
 # 1. 获取帖子列表（上架状态）
+# 按发布时间倒序，走 idx_status_created (status, created_at)；
+# limit / cursor 推到 SQL，首页“最新 N 条”和帖子大厅分页都只读需要的行
 # ======================================================
-def get_posting_list():
-    sql = """
-        SELECT posting_id, title, price, quantity, brand, image_url, `condition`, tag_id, status, scope, owner_id, created_at
-        FROM posting
-        WHERE status = '上架'
-        ORDER BY created_at DESC
+_POSTING_LIST_SQL = """
+    SELECT posting_id, title, price, quantity, brand, image_url, `condition`, tag_id, status, scope, owner_id, created_at
+    FROM posting
+    WHERE status = '上架'
+"""
+
+
+def get_posting_list(limit=None, cursor=None):
+    """
+    limit 为 None 时返回全部上架帖子
+    cursor 为上一页最后一条的游标（search_dao.encode_cursor），只返回其后的帖子
+    """
+    sql = _POSTING_LIST_SQL
+    params = []
+    after = decode_cursor(cursor)
+    if after:
+        sql += " AND (created_at < %s OR (created_at = %s AND posting_id < %s))"
+        params.extend([after[0], after[0], after[1]])
+    sql += " ORDER BY created_at DESC, posting_id DESC"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(int(limit))
+    # 写 posting 表时自动失效；TTL 兜底其他进程的写入
+    return query_all(sql, params, as_dict=True, cache_ttl=30)
+
+
+def get_posting_page(cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """帖子大厅分页：返回 (本页帖子, 下一页游标 或 None)"""
+    page_size = normalize_page_size(page_size)
+    # 多取一条，用来判断是否还有下一页
+    rows = get_posting_list(limit=page_size + 1, cursor=cursor)
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def iter_posting_list(batch_size=500):
     """
-    return query_all(sql, as_dict=True)
+    流式获取上架帖子（生成器），用于帖子大厅等整表列表，
+    内存占用不随帖子数量增长
+    """
+    sql = _POSTING_LIST_SQL + " ORDER BY created_at DESC, posting_id DESC"
+    return query_iter(sql, batch_size=batch_size, as_dict=True)
 
 def get_my_postings(owner_id):
     sql = """
@@ -37,19 +89,51 @@ def get_my_postings(owner_id):
 # ======================================================
 # 2. 获取帖子详情（含发布者、标签基本信息）
 # ======================================================
+# 详情页访问量最大：按帖子缓存（存放在查询缓存中，所有查看者共享）
+# 只按本帖的 tag 失效：改帖 / 下架 / 改范围 / 确认交接扣库存时调用 invalidate_posting_detail，
+# 其他帖子的写入不影响；其他进程的写入靠 TTL 过期
+DEFAULT_DETAIL_CACHE_CONFIG = {
+    "ENABLED": True,
+    "TTL": 30,     # 秒
+}
+
+
+def _detail_cache_config():
+    return dict(DEFAULT_DETAIL_CACHE_CONFIG, **getattr(settings, "POSTING_DETAIL_CACHE", {}))
+
+
+def _detail_tag(posting_id):
+    return f"posting_detail:{int(posting_id)}"
+
+
 def get_posting_detail(posting_id):
+    """返回的 dict 可能与其他请求共享，调用方不要修改"""
     sql = """
-        SELECT p.*, u.username, u.room_id, t.tag_name
+        SELECT p.*, u.username, u.room_id, t.tag_name,
+               COALESCE(s.favorite_count, 0) AS favorite_count,
+               COALESCE(s.order_count, 0) AS order_count,
+               COALESCE(s.view_count, 0) AS view_count
         FROM posting p
         LEFT JOIN user u ON p.owner_id = u.user_id
         LEFT JOIN tag t ON p.tag_id = t.tag_id
-        WHERE posting_id = %s
+        LEFT JOIN posting_stats s ON p.posting_id = s.posting_id
+        WHERE p.posting_id = %s
     """
-    return query_one(sql, [posting_id], as_dict=True)
+    config = _detail_cache_config()
+    if not config["ENABLED"]:
+        return query_one(sql, [posting_id], as_dict=True)
+    return query_one(
+        sql, [posting_id], as_dict=True, cache_ttl=config["TTL"], cache_tables=[_detail_tag(posting_id)]
+    )
+
+
+def invalidate_posting_detail(*posting_ids):
+    if cache_enabled():
+        get_query_cache().invalidate_tags({_detail_tag(posting_id) for posting_id in posting_ids})
 
 
 # ======================================================
-# 3. 发布帖子（INSERT INTO posting）
+# 3. 发布帖子（INSERT INTO posting），返回新帖子的 posting_id
 # ======================================================
 def create_posting(title, content, price, quantity, brand, image_url, condition, tag_id, scope, owner_id):
     sql = """
@@ -57,7 +141,9 @@ def create_posting(title, content, price, quantity, brand, image_url, condition,
         (title, content, price, quantity, brand, image_url, `condition`, tag_id, status, scope, owner_id)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, '上架', %s, %s)
     """
-    execute(sql, [title, content, price, quantity, brand, image_url, condition, tag_id, scope, owner_id])
+    posting_id = execute_insert(sql, [title, content, price, quantity, brand, image_url, condition, tag_id, scope, owner_id])
+    _refresh_indexes(posting_id)
+    return posting_id
 
 
 
@@ -79,6 +165,7 @@ def update_posting(posting_id, title, content, price, quantity, brand, condition
         WHERE posting_id = %s AND owner_id = %s
     """
     execute(sql, [title, content, price, quantity, brand, None, condition, tag_id, scope, posting_id, owner_id])
+    _refresh_indexes(posting_id)
 
 
 
@@ -92,6 +179,7 @@ def soft_delete_posting(posting_id, owner_id):
         WHERE posting_id = %s AND owner_id = %s
     """
     execute(sql, [posting_id, owner_id])
+    _refresh_indexes(posting_id)
 
 
 # ======================================================
@@ -104,6 +192,8 @@ def change_scope(posting_id, owner_id, new_scope):
         WHERE posting_id = %s AND owner_id = %s
     """
     execute(sql, [new_scope, posting_id, owner_id])
+    visibility.refresh_posting(posting_id)
+    invalidate_posting_detail(posting_id)
 
 
 # ======================================================
@@ -121,11 +211,47 @@ def add_posting_image(posting_id, uploader_id, path, category):
 # 8. 图片管理 —— 删除图片记录
 # ======================================================
 def delete_posting_image(image_id, uploader_id):
+    row = query_one(
+        "SELECT path FROM image WHERE image_id = %s AND uploader_id = %s",
+        [image_id, uploader_id], as_dict=True,
+    )
+    if row is None:
+        return
     sql = """
         DELETE FROM image
         WHERE image_id = %s AND uploader_id = %s
     """
     execute(sql, [image_id, uploader_id])
+    release_media(row["path"])
+
+
+# ======================================================
+# 图片文件引用计数（common/media_store.py）
+# 引用数 = image.path + posting.image_url 中引用该 URL 的行数
+# ======================================================
+def count_media_refs(url):
+    sql = """
+        SELECT (SELECT COUNT(*) FROM image WHERE path = %s)
+             + (SELECT COUNT(*) FROM posting WHERE image_url = %s) AS refs
+    """
+    return query_one(sql, [url, url], as_dict=True)["refs"]
+
+
+def get_media_refs(url_prefix):
+    """所有以 url_prefix 开头的被引用 URL（gc_media 整体对账用）"""
+    sql = """
+        SELECT path AS url FROM image WHERE path LIKE %s
+        UNION
+        SELECT image_url FROM posting WHERE image_url LIKE %s
+    """
+    pattern = url_prefix + "%"
+    return {row["url"] for row in query_iter(sql, [pattern, pattern], as_dict=True)}
+
+
+def release_media(url):
+    """不再被引用的内容寻址文件删除（连同缩略图版本）"""
+    if media_store.is_stored(url) and count_media_refs(url) == 0:
+        media_store.remove(url)
 
 
 # ======================================================
@@ -150,6 +276,8 @@ def add_favorite(user_id, posting_id):
         ON DUPLICATE KEY UPDATE created_at = CURRENT_TIMESTAMP
     """
     execute(sql, [user_id, posting_id])
+    # 收藏数由触发器维护，详情中的计数随之变化
+    invalidate_posting_detail(posting_id)
 
 
 # ======================================================
@@ -161,6 +289,7 @@ def remove_favorite(user_id, posting_id):
         WHERE user_id = %s AND posting_id = %s
     """
     execute(sql, [user_id, posting_id])
+    invalidate_posting_detail(posting_id)
 
 
 # ======================================================
@@ -168,7 +297,7 @@ def remove_favorite(user_id, posting_id):
 # ======================================================
 def get_user_favorites(user_id):
     sql = """
-        SELECT p.posting_id, p.title, p.price, p.brand, p.scope, f.created_at
+        SELECT p.posting_id, p.title, p.price, p.brand, p.scope, p.image_url, f.created_at
         FROM posting p
         JOIN favorite f ON p.posting_id = f.posting_id
         WHERE f.user_id = %s
@@ -177,6 +306,97 @@ def get_user_favorites(user_id):
     return query_all(sql, [user_id], as_dict=True)
 
 
+# ======================================================
+# 列表页批量查询：每页固定几次查询，不随帖子数增长（避免逐条 is_favorite / get_posting_images / 计数）
+# ======================================================
+def _placeholders(ids):
+    return ", ".join(["%s"] * len(ids))
+
+
+def get_favorite_ids(user_id, posting_ids):
+    """posting_ids 中被该用户收藏的 posting_id 集合（走 uniq_favorite (user_id, posting_id)）"""
+    posting_ids = list(posting_ids)
+    if not user_id or not posting_ids:
+        return set()
+    sql = f"""
+        SELECT posting_id
+        FROM favorite
+        WHERE user_id = %s AND posting_id IN ({_placeholders(posting_ids)})
+    """
+    return {row[0] for row in query_all(sql, [user_id, *posting_ids])}
+
+
+def get_images_by_postings(posting_ids):
+    """posting_id → 图片列表（按上传顺序）；没有图片的帖子对应空列表"""
+    posting_ids = list(posting_ids)
+    images = {posting_id: [] for posting_id in posting_ids}
+    if not posting_ids:
+        return images
+    sql = f"""
+        SELECT image_id, posting_id, path, category
+        FROM image
+        WHERE posting_id IN ({_placeholders(posting_ids)})
+        ORDER BY posting_id, image_id
+    """
+    for row in query_all(sql, posting_ids, as_dict=True):
+        images[row["posting_id"]].append(row)
+    return images
+
+
+def get_posting_counters(posting_ids):
+    """posting_id → {favorite_count, order_count, view_count}；posting_stats 中没有的帖子计数为 0"""
+    posting_ids = list(posting_ids)
+    counters = {
+        posting_id: {"favorite_count": 0, "order_count": 0, "view_count": 0} for posting_id in posting_ids
+    }
+    if not posting_ids:
+        return counters
+    sql = f"""
+        SELECT posting_id, favorite_count, order_count, view_count
+        FROM posting_stats
+        WHERE posting_id IN ({_placeholders(posting_ids)})
+    """
+    for row in query_all(sql, posting_ids, as_dict=True):
+        counters[row.pop("posting_id")] = row
+    return counters
+
+
+def annotate_postings(postings, user_id):
+    """
+    列表页的帖子补上 favorited / images / 三个计数字段
+    返回新的 dict 列表（原结果可能来自共享缓存，不就地修改）
+    """
+    postings = [p.as_dict() if hasattr(p, "as_dict") else dict(p) for p in postings]
+    ids = [p["posting_id"] for p in postings]
+    favorite_ids = get_favorite_ids(user_id, ids)
+    images = get_images_by_postings(ids)
+    counters = get_posting_counters(ids)
+    for p in postings:
+        p["favorited"] = p["posting_id"] in favorite_ids
+        p["images"] = images[p["posting_id"]]
+        p.update(counters[p["posting_id"]])
+        p["view_count"] += view_counter.pending_views(p["posting_id"])
+    return postings
+
+
+def rebuild_posting_stats():
+    """
+    按 favorite / order 重算收藏数、订单数（未装触发器时导入的历史数据、或计数出现偏差时使用）
+    浏览数没有明细表，保持不变
+    """
+    sql = """
+        INSERT INTO posting_stats(posting_id, favorite_count, order_count)
+        SELECT p.posting_id,
+               (SELECT COUNT(*) FROM favorite f WHERE f.posting_id = p.posting_id),
+               (SELECT COUNT(*) FROM `order` o WHERE o.posting_id = p.posting_id)
+        FROM posting p
+        ON DUPLICATE KEY UPDATE favorite_count = VALUES(favorite_count), order_count = VALUES(order_count)
+    """
+    execute(sql)
+    if cache_enabled():
+        get_query_cache().clear()
+
+
 # ======================================================
 # 13. 判断某帖子是否被某用户收藏（用于详情页）
 # ======================================================
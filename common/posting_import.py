@@ -0,0 +1,313 @@
+# common/posting_import.py
+# ================================================
+# 批量导入帖子（CSV / JSONL），供管理命令 import_postings 与管理员上传接口共用
+# - 逐行校验，出错的行记录行号和原因，不影响其他行
+# - 标签名 / 发帖人一次查询解析（可选自动创建缺少的标签）
+# - 每 chunk_size 行一个事务：一条多行 INSERT 写 posting，一条多行 INSERT 写 image，
+#   一条 UPDATE 累加 tag.ref_count；某个批次失败只回滚该批次
+# - 每个批次提交后用一条 IN 查询刷新检索索引 / 可见性索引（与单条发帖的 _refresh_indexes 一致）；
+#   不依赖 updated_at 追赶：批次的 updated_at 可能早于其他请求已推进的同步点
+#
+# 字段：title, content, price, quantity, brand, condition, tag, scope, owner_id, image_url, images
+#   tag 为标签名；images 为图片 URL 列表（CSV 中用 | 分隔），第一张同时作为封面（未给 image_url 时）
+# ================================================
+
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from common import search_index, visibility
+from common.db import bulk_insert, execute, execute_insert, query_all, transaction
+from common.tag_suggest import refresh_tag_suggestions
+
+
+CONDITIONS = ("全新", "几乎全新", "轻微使用痕迹", "空")
+SCOPES = ("寝室", "楼层", "楼栋", "全楼")
+FORMATS = ("csv", "jsonl")
+
+DEFAULT_CHUNK_SIZE = 200
+MAX_PRICE = Decimal("99999999.99")      # DECIMAL(10,2)
+
+_POSTING_COLUMNS = [
+    "title", "content", "price", "quantity", "brand", "image_url", "condition", "tag_id", "status", "scope", "owner_id",
+]
+
+
+class RowError(Exception):
+    pass
+
+
+class FileError(Exception):
+    """整个文件无法读取（不是 UTF-8 / CSV 格式错误），不导入任何行"""
+    pass
+
+
+class _NotConsecutive(Exception):
+    pass
+
+
+# ======================================================
+# 读取
+# ======================================================
+def read_rows(lines, fmt):
+    """
+    lines：文本行的可迭代对象（打开的文件 / 解码后的上传内容）
+    逐行返回 (行号, dict 或 RowError)
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            row = {k.strip(): v for k, v in row.items() if k}
+            if row.get("images"):
+                row["images"] = [p for p in row["images"].split("|") if p.strip()]
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, RowError(f"JSON 格式错误：{e}")
+                continue
+            yield line_no, row if isinstance(row, dict) else RowError("每行必须是一个 JSON 对象")
+    else:
+        raise ValueError(f"不支持的格式：{fmt}（可选 {', '.join(FORMATS)}）")
+
+
+def _text(row, name, max_length, required=False):
+    value = row.get(name)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"缺少 {name}")
+    if len(value) > max_length:
+        raise RowError(f"{name} 超过 {max_length} 个字符")
+    return value or None
+
+
+def _clean(row, default_owner_id):
+    """校验一行，返回规范化后的 dict；不合法抛 RowError"""
+    title = _text(row, "title", 100, required=True)
+
+    try:
+        price = Decimal(str(row.get("price", "")).strip())
+    except InvalidOperation:
+        raise RowError("price 不是数字")
+    if not price.is_finite() or price < 0 or price > MAX_PRICE:
+        raise RowError("price 超出范围")
+
+    try:
+        quantity = int(row.get("quantity") or 1)
+    except (TypeError, ValueError):
+        raise RowError("quantity 不是整数")
+    if quantity < 1:
+        raise RowError("quantity 至少为 1")
+
+    condition = _text(row, "condition", 10)
+    if condition is not None and condition not in CONDITIONS:
+        raise RowError(f"condition 只能是 {'/'.join(CONDITIONS)}")
+
+    scope = _text(row, "scope", 10) or "全楼"
+    if scope not in SCOPES:
+        raise RowError(f"scope 只能是 {'/'.join(SCOPES)}")
+
+    owner_id = row.get("owner_id") or default_owner_id
+    try:
+        owner_id = int(owner_id)
+    except (TypeError, ValueError):
+        raise RowError("缺少 owner_id")
+
+    images = row.get("images") or []
+    if not isinstance(images, list) or not all(isinstance(p, str) for p in images):
+        raise RowError("images 必须是图片 URL 列表")
+    images = [p.strip() for p in images]
+    if any(len(p) > 255 for p in images):
+        raise RowError("图片 URL 超过 255 个字符")
+
+    return {
+        "title": title,
+        "content": _text(row, "content", 65535),
+        "price": price,
+        "quantity": quantity,
+        "brand": _text(row, "brand", 50),
+        "image_url": _text(row, "image_url", 255) or (images[0] if images else None),
+        "condition": condition,
+        "tag": _text(row, "tag", 50),
+        "scope": scope,
+        "owner_id": owner_id,
+        "images": images,
+    }
+
+
+# ======================================================
+# 一次查询解析标签 / 发帖人
+# ======================================================
+def _in(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def tag_key(name):
+    """tag.tag_name 的排序规则不区分大小写：Book 与 book 是同一个标签"""
+    return name.casefold()
+
+
+def _resolve_tags(names, create_tags):
+    """
+    标签名 → tag_id（按 tag_key 对应，文件中的写法与库中大小写不同也能找到）
+    create_tags 时先批量创建缺少的标签（大小写不同的写法只建一个）
+    """
+    names = sorted(names)
+    if not names:
+        return {}
+    sql = f"SELECT tag_id, tag_name FROM tag WHERE tag_name IN ({_in(names)})"
+    found = {tag_key(r["tag_name"]): r["tag_id"] for r in query_all(sql, names, as_dict=True)}
+    missing = list({tag_key(n): n for n in names if tag_key(n) not in found}.values())
+    if missing and create_tags:
+        # IGNORE：排序规则认为相同、但 tag_key 不同的写法（如全角 / 重音）撞上唯一键时跳过，
+        # 这些行随后按“标签不存在”报错，而不是整个导入失败
+        execute(f"INSERT IGNORE INTO tag (tag_name) VALUES {', '.join(['(%s)'] * len(missing))}", missing)
+        found = {tag_key(r["tag_name"]): r["tag_id"] for r in query_all(sql, names, as_dict=True)}
+    return {n: found[tag_key(n)] for n in names if tag_key(n) in found}
+
+
+def _resolve_owners(owner_ids):
+    """可以发帖的用户（存在且未封禁）"""
+    owner_ids = sorted(owner_ids)
+    if not owner_ids:
+        return set()
+    sql = f"SELECT user_id FROM user WHERE user_id IN ({_in(owner_ids)}) AND status = '正常'"
+    return {r["user_id"] for r in query_all(sql, owner_ids, as_dict=True)}
+
+
+# ======================================================
+# 写入一个批次（调用方已开启事务）
+# ======================================================
+def _insert_chunk(chunk):
+    """chunk：[(行号, 已校验的行)]，返回按顺序对应的 posting_id"""
+    values = [
+        (r["title"], r["content"], r["price"], r["quantity"], r["brand"], r["image_url"], r["condition"],
+         r["tag_id"], "上架", r["scope"], r["owner_id"])
+        for _, r in chunk
+    ]
+    placeholder = "(" + ", ".join(["%s"] * len(_POSTING_COLUMNS)) + ")"
+    sql = "INSERT INTO posting ({}) VALUES {}".format(
+        ", ".join(f"`{c}`" for c in _POSTING_COLUMNS), ", ".join([placeholder] * len(values))
+    )
+    first_id = execute_insert(sql, [v for row in values for v in row])
+
+    # 多行 INSERT 返回第一行的自增 id；innodb_autoinc_lock_mode = 2（MySQL 8 默认）且有并发插入时
+    # 同一语句的 id 可能不连续，这里在事务内逐行核对，不连续则整批回滚、改为逐行插入
+    ids = list(range(first_id, first_id + len(values)))
+    found = query_all(
+        "SELECT posting_id, owner_id, title FROM posting WHERE posting_id BETWEEN %s AND %s ORDER BY posting_id",
+        [ids[0], ids[-1]],
+    )
+    expected = [(posting_id, r["owner_id"], r["title"]) for posting_id, (_, r) in zip(ids, chunk)]
+    if [tuple(row) for row in found] != expected:
+        raise _NotConsecutive()
+
+    images = [
+        (posting_id, r["owner_id"], path, "物品照片")
+        for posting_id, (_, r) in zip(ids, chunk) for path in r["images"]
+    ]
+    if images:
+        bulk_insert("image", ["posting_id", "uploader_id", "path", "category"], images)
+
+    tag_counts = {}
+    for _, r in chunk:
+        if r["tag_id"] is not None:
+            tag_counts[r["tag_id"]] = tag_counts.get(r["tag_id"], 0) + 1
+    if tag_counts:
+        cases = " ".join(["WHEN %s THEN %s"] * len(tag_counts))
+        sql = f"UPDATE tag SET ref_count = ref_count + CASE tag_id {cases} END WHERE tag_id IN ({_in(tag_counts)})"
+        execute(sql, [v for item in tag_counts.items() for v in item] + list(tag_counts))
+    return ids
+
+
+def _insert_chunk_rows(chunk):
+    """退化路径：逐行插入，每条 INSERT 只有一行，lastrowid 即该行 id"""
+    ids = []
+    for item in chunk:
+        ids.extend(_insert_chunk([item]))
+    return ids
+
+
+# ======================================================
+# 导入入口
+# ======================================================
+def import_postings(rows, default_owner_id=None, create_tags=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    rows：read_rows() 的结果（(行号, dict 或 RowError)）
+    文件无法读取时抛 FileError（此时没有写入任何数据）
+    返回报告 dict：total / imported / failed / errors（[{"line", "error"}]）/ seconds / rows_per_second
+    """
+    start = time.perf_counter()
+    errors = []
+    valid = []
+    total = 0
+
+    # 先读完、校验完整个文件再写库：文件读到一半出错时一行都不导入
+    try:
+        for line_no, row in rows:
+            total += 1
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                valid.append((line_no, _clean(row, default_owner_id)))
+            except RowError as e:
+                errors.append({"line": line_no, "error": str(e)})
+    except UnicodeDecodeError as e:
+        # 按缓冲块解码，无法准确定位到行
+        raise FileError(f"文件不是 UTF-8 编码：{e.reason}") from e
+    except csv.Error as e:
+        raise FileError(f"CSV 格式错误（第 {total + 1} 行附近）：{e}") from e
+
+    tags = _resolve_tags({r["tag"] for _, r in valid if r["tag"]}, create_tags)
+    owners = _resolve_owners({r["owner_id"] for _, r in valid})
+
+    ready = []
+    for line_no, r in valid:
+        if r["tag"] and r["tag"] not in tags:
+            errors.append({"line": line_no, "error": f"标签不存在：{r['tag']}"})
+        elif r["owner_id"] not in owners:
+            errors.append({"line": line_no, "error": f"发帖人不存在或已封禁：{r['owner_id']}"})
+        else:
+            r["tag_id"] = tags.get(r["tag"])
+            ready.append((line_no, r))
+
+    imported = 0
+    posting_ids = []
+    for i in range(0, len(ready), chunk_size):
+        chunk = ready[i:i + chunk_size]
+        try:
+            try:
+                with transaction():
+                    ids = _insert_chunk(chunk)
+            except _NotConsecutive:
+                with transaction():
+                    ids = _insert_chunk_rows(chunk)
+        except Exception as e:
+            # 该批次整体回滚
+            errors.extend({"line": line_no, "error": f"写入失败（整批回滚）：{e}"} for line_no, _ in chunk)
+            continue
+        imported += len(chunk)
+        posting_ids.extend(ids)
+        search_index.refresh_postings(ids)
+        visibility.refresh_postings(ids)
+
+    if tags:
+        # 新建的标签 / 变化的 ref_count 立即反映到标签补全
+        refresh_tag_suggestions()
+
+    seconds = time.perf_counter() - start
+    errors.sort(key=lambda e: e["line"])
+    return {
+        "total": total,
+        "imported": imported,
+        "failed": len(errors),
+        "errors": errors,
+        "posting_ids": posting_ids,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(imported / seconds, 1) if seconds > 0 else None,
+    }
@@ -0,0 +1,274 @@
+# common/query_cache.py
+# ================================================
+# 查询结果缓存（进程内）
+# - key：SQL + 参数；tag：SQL 读到的表名
+# - 写操作（execute / call_proc / bulk_insert）按表名失效对应缓存
+# - TTL 过期 + LRU 淘汰 + 总内存上限
+# - 同一个 key 并发未命中时只查一次库（single-flight）
+# 注意：每个 worker 进程各有一份缓存，其他进程的写入只能靠 TTL 过期，
+#       所以只给“很少变化”的参考数据 / 列表使用，TTL 不宜过长
+# ================================================
+
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+DEFAULT_CACHE_CONFIG = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 2000,
+    "MAX_BYTES": 32 * 1024 * 1024,   # 缓存结果估算总大小上限
+}
+
+
+# ---------------------------------------
+# 从 SQL 中提取表名（FROM / JOIN / INTO / UPDATE 后面的标识符）
+# ---------------------------------------
+_RE_TABLE = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+`?([A-Za-z_][A-Za-z0-9_]*)`?", re.IGNORECASE)
+
+
+def tables_of(sql):
+    """SELECT ... FROM posting p JOIN `order` o ... → {"posting", "order"}"""
+    return {name.lower() for name in _RE_TABLE.findall(sql)}
+
+
+# ---------------------------------------
+# 估算缓存值占用的内存（只需数量级准确）
+# ---------------------------------------
+def _estimate_size(value, _sample=20):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)) and value:
+        sample = value[:_sample]
+        per_item = sum(_estimate_size(v, _sample) for v in sample) / len(sample)
+        size += int(per_item * len(value))
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "tags", "size")
+
+    def __init__(self, value, expires_at, tags, size):
+        self.value = value
+        self.expires_at = expires_at
+        self.tags = tags
+        self.size = size
+
+
+class QueryCache:
+    def __init__(self, max_entries=2000, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()   # key → _Entry，按最近使用排序（最新在末尾）
+        self._by_tag = {}               # tag → set(key)
+        self._generation = {}           # tag → 失效次数，用于丢弃“查询期间被写过”的结果
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._inflight = {}             # key → [Lock, 等待 / 计算中的线程数]，用于 single-flight
+        self._inflight_lock = threading.Lock()
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "stale_skips": 0,
+            "coalesced": 0,
+        }
+
+    # ---------------------------------------
+    # 读写
+    # ---------------------------------------
+    def get(self, key):
+        """命中返回 (True, value)，未命中返回 (False, None)"""
+        return self._get(key, count=True)
+
+    def _get(self, key, count):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            if count:
+                self._stats["hits"] += 1
+            return True, entry.value
+
+    def get_or_compute(self, key, compute, ttl, tags):
+        """
+        命中直接返回；未命中时调用 compute() 并缓存结果
+        single-flight：同一个 key 同时只有一个线程执行 compute()，
+        其他线程等它算完后直接读缓存（突发的相同查询只打一次数据库）
+        """
+        hit, value = self.get(key)
+        if hit:
+            return value
+
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = self._inflight[key] = [threading.Lock(), 0]
+            flight[1] += 1
+
+        try:
+            with flight[0]:
+                hit, value = self._get(key, count=False)
+                if hit:
+                    with self._lock:
+                        self._stats["coalesced"] += 1
+                    return value
+                generation = self.generation(tags)
+                value = compute()
+                self.set(key, value, ttl, tags, generation)
+                return value
+        finally:
+            with self._inflight_lock:
+                flight[1] -= 1
+                if not flight[1]:
+                    del self._inflight[key]
+
+    def generation(self, tags):
+        """查询前记下相关表的版本号，set 时用来判断期间是否有写入"""
+        with self._lock:
+            return tuple(self._generation.get(t, 0) for t in sorted(tags))
+
+    def set(self, key, value, ttl, tags, generation=None):
+        tags = frozenset(tags)
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation is not None and generation != tuple(self._generation.get(t, 0) for t in sorted(tags)):
+                # 查询执行期间相关表被写过，结果可能是旧的，不缓存
+                self._stats["stale_skips"] += 1
+                return
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = _Entry(value, time.monotonic() + ttl, tags, size)
+            self._bytes += size
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            self._stats["sets"] += 1
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate_tags(self, tags):
+        """按表名失效：写 posting 表 → 所有读过 posting 的缓存失效"""
+        with self._lock:
+            for tag in tags:
+                self._generation[tag] = self._generation.get(tag, 0) + 1
+                for key in self._by_tag.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            for tag in self._by_tag:
+                self._generation[tag] = self._generation.get(tag, 0) + 1
+            self._entries.clear()
+            self._by_tag.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            })
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+        return data
+
+    def _remove(self, key):
+        """调用方持有锁"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+
+# ---------------------------------------
+# 全局缓存实例（common.db 使用）
+# ---------------------------------------
+def _config():
+    return dict(DEFAULT_CACHE_CONFIG, **getattr(settings, "QUERY_CACHE", {}))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = _config()
+                _cache = QueryCache(config["MAX_ENTRIES"], config["MAX_BYTES"])
+    return _cache
+
+
+def cache_enabled():
+    return _config()["ENABLED"]
+
+
+def _freeze(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params)
+
+
+def cached_query(fn):
+    """
+    给 query_one / query_all 增加可选缓存参数：
+        query_all(sql, params, as_dict=True, cache_ttl=300)
+        query_all(sql, params, as_dict=True, cache_ttl=300, cache_tables=["tag"])
+    cache_ttl 为 None（默认）时不走缓存；cache_tables 默认从 SQL 中提取
+    返回的结果被多个请求共享，调用方不要修改其中的行
+    """
+    def wrapper(sql, params=None, *args, cache_ttl=None, cache_tables=None, **kwargs):
+        if cache_ttl is None or not cache_enabled():
+            return fn(sql, params, *args, **kwargs)
+
+        key = (fn.__name__, sql, _freeze(params), args, tuple(sorted(kwargs.items())))
+        tags = set(cache_tables) if cache_tables else tables_of(sql)
+        value = get_query_cache().get_or_compute(
+            key, lambda: fn(sql, params, *args, **kwargs), cache_ttl, tags
+        )
+        return list(value) if isinstance(value, list) else value
+
+    wrapper.__name__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    wrapper.__wrapped__ = fn
+    return wrapper
@@ -3,11 +3,31 @@
 # 搜索模块 DAO：关键字搜索、标签搜索、范围过滤、标签联想
 # ======================================================
 
+import base64
+import heapq
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+
 from common.db import query_one, query_all
+from common.query_cache import cache_enabled, get_query_cache
+from common.search_index import candidate_ids, max_candidates, score_ids
+from common.tag_suggest import get_tag_suggest_index
+from common.visibility import LEVELS, get_visibility_index
+
+
+# 分页：每页条数默认值 / 上限
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# 关键字候选最多以 posting_id IN (...) 的形式交给 SQL；更多时不加该条件，由 LIKE 过滤
+MAX_IN_IDS = 1000
 
 
 # ======================================================
-# 内部工具：根据用户 ID 获取所在寝室/楼层/楼栋（必要时可复用）
+# 内部工具：根据用户 ID 获取所在寝室/楼层/楼栋（查看者位置）
 # ======================================================
 def _get_user_location(user_id):
     sql = """
@@ -16,81 +36,250 @@ def _get_user_location(user_id):
         JOIN room r ON u.room_id = r.room_id
         WHERE u.user_id = %s
     """
-    return query_one(sql, [user_id], as_dict=True)
+    # 换寝室（写 user 表）时自动失效
+    return query_one(sql, [user_id], as_dict=True, cache_ttl=60)
 
 
 # ======================================================
-# 生成“帖子可见性” SQL 过滤条件（基于 p.scope + 发帖人位置 vs 查看者位置）
+# 生成“帖子可见性” SQL 过滤条件（基于 p.scope + 发帖人位置 r vs 查看者位置）
 # ======================================================
-def _scope_filter_sql():
-    return """
+def _scope_filter_sql(viewer):
+    sql = """
         (
             p.scope = '全楼'
-            OR (p.scope = '楼栋' AND poster.building = viewer.building)
-            OR (p.scope = '楼层' AND poster.building = viewer.building AND poster.floor = viewer.floor)
-            OR (p.scope = '寝室' AND poster.room_id = viewer.room_id)
+            OR (p.scope = '楼栋' AND r.building = %s)
+            OR (p.scope = '楼层' AND r.building = %s AND r.floor = %s)
+            OR (p.scope = '寝室' AND r.room_id = %s)
         )
     """
+    b, f = viewer["building"], viewer["floor"]
+    return sql, [b, b, f, viewer["room_id"]]
 
 
 # ======================================================
 # 生成“用户选择的地理范围过滤”SQL（只看同楼栋/同楼层/同寝室的发帖人）
 # 注意：这是额外过滤，不等于 p.scope
 # ======================================================
-def _range_filter_sql(scope: str) -> str:
-    if not scope or scope in ("全部", "全楼"):
-        return ""
-
+def _range_filter_sql(scope, viewer):
     if scope == "楼栋":
-        return " AND poster.building = viewer.building"
+        return " AND r.building = %s", [viewer["building"]]
 
     if scope == "楼层":
-        return " AND poster.building = viewer.building AND poster.floor = viewer.floor"
+        return " AND r.building = %s AND r.floor = %s", [viewer["building"], viewer["floor"]]
 
     if scope == "寝室":
-        return " AND poster.room_id = viewer.room_id"
+        return " AND r.room_id = %s", [viewer["room_id"]]
+
+    # 全部 / 全楼 / 未知值：不额外过滤（避免把数据过滤光）
+    return "", []
+
+
+def _in_sql(ids):
+    return f"p.posting_id IN ({', '.join(['%s'] * len(ids))})"
+
+
+# ======================================================
+# 可见性 + 范围过滤 + 关键字候选 → WHERE 片段
+# 可见性索引（common/visibility.py）按位置分组的集合求交得出可见 posting_id：
+#   有关键字候选时在候选中求，选了范围时在该位置的发帖中求；结果不多于 MAX_IN_IDS 个时
+#   SQL 中只剩主键过滤。既无候选也无范围（可见集合接近全表）或结果太多时，可见性 / 范围条件留在 SQL 中
+# 返回 (sql, params)；结果必然为空时返回 (None, None)
+# ======================================================
+def _visibility_filter(viewer, scope, candidates=None):
+    index = get_visibility_index()
+    if index is not None:
+        ids = index.visible_ids(viewer["room_id"], scope, candidates)
+        if ids is not None and len(ids) <= MAX_IN_IDS:
+            if not ids:
+                return None, None
+            ids = sorted(ids)
+            return _in_sql(ids), ids
+
+    sql, params = _scope_filter_sql(viewer)
+    if candidates is not None:
+        sql += " AND " + _in_sql(candidates)
+        params += candidates
+    range_sql, range_params = _range_filter_sql(scope, viewer)
+    return sql + range_sql, params + range_params
+
+
+# ======================================================
+# 游标分页（keyset）：按排序列 + posting_id 排序，
+# 下一页条件为“排在上一页最后一条之后”，深翻页与首页代价相同
+# 排序方式 → (排序列, 方向)；posting_id 作为同值时的次序，方向与排序列一致，
+# 配合 (status, 排序列) 复合索引（InnoDB 二级索引末尾自带主键）可以直接按索引顺序扫描
+# ======================================================
+_KEYSET_ORDERS = {
+    "latest": ("created_at", "DESC"),
+    "price_asc": ("price", "ASC"),
+    "price_desc": ("price", "DESC"),
+}
+
+
+def _cursor_value(column, value):
+    if column == "created_at":
+        return datetime.fromisoformat(value)
+    return Decimal(value)
+
+
+def encode_cursor(row, sort="latest"):
+    """把一页最后一条记录编码为下一页游标（URL 安全字符串）"""
+    column = _KEYSET_ORDERS[sort][0]
+    value = row[column]
+    value = value.isoformat(sep=" ") if column == "created_at" else str(value)
+    payload = [sort, value, row["posting_id"]]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, sort="latest"):
+    """解析游标；格式不对或与排序方式不符返回 None（当作第一页）"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor_sort, value, posting_id = json.loads(raw)
+        if cursor_sort != sort:
+            return None
+        return _cursor_value(_KEYSET_ORDERS[sort][0], value), int(posting_id)
+    except (ValueError, TypeError, KeyError, ArithmeticError):
+        return None
+
+
+def normalize_page_size(page_size):
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return min(max(page_size, 1), MAX_PAGE_SIZE)
+
+
+def _paginate(sql, params, cursor, page_size, sort="latest"):
+    """
+    追加 keyset 条件 + ORDER BY + LIMIT，执行查询
+    返回 (本页结果, 下一页游标 或 None)
+    """
+    page_size = normalize_page_size(page_size)
+    params = list(params)
+    column, direction = _KEYSET_ORDERS[sort]
+    op = "<" if direction == "DESC" else ">"
+
+    after = decode_cursor(cursor, sort)
+    if after:
+        sql += f" AND (p.{column} {op} %s OR (p.{column} = %s AND p.posting_id {op} %s))"
+        params.extend([after[0], after[0], after[1]])
+
+    # 多取一条，用来判断是否还有下一页
+    sql += f" ORDER BY p.{column} {direction}, p.posting_id {direction} LIMIT %s"
+    params.append(page_size + 1)
+
+    rows = query_all(sql, params, as_row=True)
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1], sort)
+    return rows, None
+
+
+def _parse_price(value):
+    """价格筛选参数：非法 / 负数 / 空 → None（不筛选）"""
+    if value in (None, ""):
+        return None
+    try:
+        price = Decimal(str(value))
+    except ArithmeticError:
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+# ======================================================
+# 搜索结果缓存：结果只取决于查询条件 + 查看者所在寝室/楼层/楼栋，
+# 与具体 user_id 无关，同寝室的人共享缓存
+# 写 posting / tag / user / room 表时失效；TTL 兜底其他进程的写入
+# ======================================================
+DEFAULT_SEARCH_CACHE_CONFIG = {
+    "ENABLED": True,
+    "TTL": 10,     # 秒
+}
+
+_SEARCH_TABLES = {"posting", "tag", "user", "room"}
+
+
+def _search_cache_config():
+    return dict(DEFAULT_SEARCH_CACHE_CONFIG, **getattr(settings, "SEARCH_CACHE", {}))
+
+
+def _search_key(viewer, scope, cursor, page_size):
+    scope = scope if scope in LEVELS else "全部"
+    location = (viewer["room_id"], viewer["floor"], viewer["building"])
+    return scope, location, cursor or "", normalize_page_size(page_size)
 
-    # 未知值：不额外过滤（避免把数据过滤光）
-    return ""
+
+def _cached_search(key, compute):
+    config = _search_cache_config()
+    if not config["ENABLED"] or not cache_enabled():
+        return compute()
+    rows, next_cursor = get_query_cache().get_or_compute(key, compute, config["TTL"], _SEARCH_TABLES)
+    return list(rows), next_cursor
 
 
 # ======================================================
-# 1️⃣ 综合搜索（关键字 + 标签 + 帖子可见性 + 用户选择范围过滤）
+# 1️⃣ 综合搜索（关键字 + 标签 + 价格区间 + 帖子可见性 + 用户选择范围过滤）
+#    sort：latest / relevance / price_asc / price_desc（见 SORTS）
+#    返回 (本页结果, 下一页游标)
+#    facets=True 时返回 (本页结果, 下一页游标, 分面统计)，见 _search_facets
 # ======================================================
-def search_postings(keyword, tag_id, scope, user_id):
+def search_postings(keyword, tag_id, scope, user_id, cursor=None, page_size=DEFAULT_PAGE_SIZE, facets=False,
+                    sort="latest", min_price=None, max_price=None):
     if not user_id:
-        return []
+        return ([], None, _empty_facets()) if facets else ([], None)
+
+    viewer = _get_user_location(user_id)
+    if not viewer:
+        return ([], None, _empty_facets()) if facets else ([], None)
+
+    keyword = (keyword or "").strip()
+    sort = sort if sort in SORTS else "latest"
+    prices = (_parse_price(min_price), _parse_price(max_price))
+    query = (keyword.lower(), str(tag_id or ""), *(str(p) for p in prices))
+
+    key = ("search_postings", *query, sort, *_search_key(viewer, scope, cursor, page_size))
+    rows, next_cursor = _cached_search(
+        key, lambda: _search_postings(keyword, tag_id, scope, viewer, cursor, page_size, sort, prices)
+    )
+    if not facets:
+        return rows, next_cursor
+
+    # 分面与排序 / 游标 / 每页条数无关：翻页、换排序时复用
+    key = ("search_facets", *query, *_search_key(viewer, scope, None, None)[:2])
+    return rows, next_cursor, _cached_search(key, lambda: _search_facets(keyword, tag_id, scope, viewer, prices))
+
+
+def _search_where(keyword, tag_id, scope, viewer, prices=(None, None)):
+    """
+    搜索的 FROM + WHERE 部分（结果页与分面统计共用）
+    返回 (sql, params)；结果必然为空时返回 (None, None)
+    """
+    # keyword 搜索：title/content/brand/tag_name
+    # 倒排索引给出全部候选（LIKE 结果的超集），不多于 MAX_IN_IDS 时作为主键过滤条件，
+    # 再与可见集合求交，最后对候选做 LIKE 精确匹配；
+    # 候选太多（宽泛的关键字）或没有候选（索引可能尚未追上其他进程的写入）时直接交给 LIKE
+    candidates = candidate_ids(keyword) if keyword else None
+    if candidates is not None:
+        candidates = sorted(candidates) if 0 < len(candidates) <= MAX_IN_IDS else None
+
+    visibility_sql, params = _visibility_filter(viewer, scope, candidates)
+    if visibility_sql is None:
+        return None, None
 
     sql = f"""
-        SELECT 
-            p.posting_id, p.title, p.content, p.price, p.quantity,
-            p.brand, p.`condition`, p.tag_id, t.tag_name, p.status, p.scope,
-            p.created_at,
-            poster.username AS owner_name,
-            poster.room_id AS owner_room,
-            poster.floor AS owner_floor,
-            poster.building AS owner_building
         FROM posting p
         LEFT JOIN tag t ON p.tag_id = t.tag_id
-        JOIN (
-            SELECT u.user_id, u.username, r.room_id, r.floor, r.building
-            FROM user u
-            JOIN room r ON u.room_id = r.room_id
-        ) AS poster ON p.owner_id = poster.user_id
-        JOIN (
-            SELECT r.room_id, r.floor, r.building
-            FROM room r
-            JOIN user u ON u.room_id = r.room_id
-            WHERE u.user_id = %s
-        ) AS viewer
+        JOIN user u ON p.owner_id = u.user_id
+        JOIN room r ON u.room_id = r.room_id
         WHERE p.status = '上架'
-          AND { _scope_filter_sql() }
+          AND {visibility_sql}
     """
 
-    params = [user_id]
-
-    # keyword 搜索：title/content/brand/tag_name
-    keyword = (keyword or "").strip()
     if keyword:
         like = f"%{keyword}%"
         sql += " AND (p.title LIKE %s OR p.content LIKE %s OR p.brand LIKE %s OR t.tag_name LIKE %s)"
@@ -101,67 +290,242 @@ def search_postings(keyword, tag_id, scope, user_id):
         sql += " AND p.tag_id = %s"
         params.append(tag_id)
 
-    # 用户选择的“地理范围过滤”（不是p.scope）
-    sql += _range_filter_sql(scope)
+    # 价格区间（闭区间）
+    min_price, max_price = prices
+    if min_price is not None:
+        sql += " AND p.price >= %s"
+        params.append(min_price)
+    if max_price is not None:
+        sql += " AND p.price <= %s"
+        params.append(max_price)
 
-    sql += " ORDER BY p.created_at DESC"
+    return sql, params
 
-    return query_all(sql, params, as_dict=True)
+
+_SEARCH_COLUMNS = """
+        SELECT 
+            p.posting_id, p.title, p.content, p.price, p.quantity,
+            p.brand, p.`condition`, p.tag_id, t.tag_name, p.status, p.scope,
+            p.created_at,
+            u.username AS owner_name,
+            r.room_id AS owner_room,
+            r.floor AS owner_floor,
+            r.building AS owner_building
+"""
+
+
+def _search_postings(keyword, tag_id, scope, viewer, cursor, page_size, sort="latest", prices=(None, None)):
+    where_sql, params = _search_where(keyword, tag_id, scope, viewer, prices)
+    if where_sql is None:
+        return [], None
+
+    if sort == "relevance":
+        ranked = _search_ranked(keyword, where_sql, params, viewer, cursor, page_size) if keyword else None
+        if ranked is not None:
+            return ranked
+        sort = "latest"
+
+    return _paginate(_SEARCH_COLUMNS + where_sql, params, cursor, page_size, sort)
+
+
+# ======================================================
+# 相关度排序：BM25（common/search_index.py）× 发布时间衰减 × 距离加权
+# （其余排序方式走 keyset 分页，见 _KEYSET_ORDERS）
+# 1) 按搜索条件只取 posting_id + 发帖人位置（主键列，开销小）
+# 2) 在 Python 中打分，用堆取前 offset + page_size 个（不对全部结果排序）
+# 3) 再按主键取本页帖子的完整字段
+# 游标为已翻过的条数（得分会随时间变化，不能用 keyset）；最多翻到前 MAX_CANDIDATES 条
+# ======================================================
+# 排序方式 → 页面上显示的名称
+SORTS = {
+    "latest": "最新发布",
+    "relevance": "相关度",
+    "price_asc": "价格从低到高",
+    "price_desc": "价格从高到低",
+}
+
+# 发帖人与查看者同楼栋 / 同楼层 / 同寝室时的得分倍数
+LOCATION_BOOST = {"building": 1.1, "floor": 1.2, "room": 1.3}
+
+
+def _location_boost(row, viewer):
+    if row["room_id"] == viewer["room_id"]:
+        return LOCATION_BOOST["room"]
+    if row["building"] == viewer["building"]:
+        if row["floor"] == viewer["floor"]:
+            return LOCATION_BOOST["floor"]
+        return LOCATION_BOOST["building"]
+    return 1.0
+
+
+def _search_ranked(keyword, where_sql, params, viewer, cursor, page_size):
+    """返回 (本页结果, 下一页游标)；索引不可用时返回 None（调用方按时间排序）"""
+    page_size = normalize_page_size(page_size)
+    offset = int(cursor) if cursor and cursor.isdigit() else 0
+    end = min(offset + page_size, max_candidates())
+    if offset >= end:
+        return [], None
+
+    matches = query_all("SELECT p.posting_id, r.room_id, r.floor, r.building " + where_sql, params, as_row=True)
+    if not matches:
+        return [], None
+
+    scores = score_ids(keyword, [m["posting_id"] for m in matches])
+    if scores is None:
+        return None
+    for m in matches:
+        # LIKE 命中但索引还没收录的帖子得 0 分，排在最后而不是丢掉
+        scores[m["posting_id"]] = scores.get(m["posting_id"], 0.0) * _location_boost(m, viewer)
+
+    top = heapq.nlargest(end + 1, scores, key=scores.__getitem__)
+    page_ids = top[offset:end]
+    if not page_ids:
+        return [], None
+
+    sql = _SEARCH_COLUMNS + f"""
+        FROM posting p
+        LEFT JOIN tag t ON p.tag_id = t.tag_id
+        JOIN user u ON p.owner_id = u.user_id
+        JOIN room r ON u.room_id = r.room_id
+        WHERE {_in_sql(page_ids)}
+    """
+    by_id = {row["posting_id"]: row for row in query_all(sql, page_ids, as_row=True)}
+    rows = [by_id[pid] for pid in page_ids if pid in by_id]
+
+    next_cursor = str(end) if len(top) > end and end < max_candidates() else None
+    return rows, next_cursor
+
+
+# ======================================================
+# 分面统计：整个可见结果集（不分页）按 标签 / 成色 / 价格区间 计数
+# 一条 GROUP BY 查询取回三者的组合计数，在 Python 中折叠成三组
+# ======================================================
+# 价格区间 [下限, 上限)，上限 None 表示不封顶
+PRICE_BUCKETS = [(0, 10), (10, 50), (50, 100), (100, 500), (500, None)]
+
+
+def _price_bucket_sql():
+    cases = " ".join(
+        f"WHEN p.price < {high} THEN {i}" for i, (_, high) in enumerate(PRICE_BUCKETS) if high is not None
+    )
+    return f"CASE {cases} ELSE {len(PRICE_BUCKETS) - 1} END"
+
+
+def _price_label(low, high):
+    return f"{low}+" if high is None else f"{low}-{high}"
+
+
+def _empty_facets():
+    return {"total": 0, "tags": [], "conditions": [], "prices": []}
+
+
+def _search_facets(keyword, tag_id, scope, viewer, prices=(None, None)):
+    """
+    返回 {
+        "total": 结果总数,
+        "tags": [{"tag_id", "tag_name", "count"}, ...]      按数量倒序
+        "conditions": [{"condition", "count"}, ...]         按数量倒序
+        "prices": [{"label", "min", "max", "count"}, ...]   按区间顺序，只含非空区间
+    }
+    """
+    where_sql, params = _search_where(keyword, tag_id, scope, viewer, prices)
+    if where_sql is None:
+        return _empty_facets()
+
+    sql = f"""
+        SELECT p.tag_id, t.tag_name, p.`condition`,
+               {_price_bucket_sql()} AS price_bucket,
+               COUNT(*) AS n
+    """ + where_sql + " GROUP BY p.tag_id, t.tag_name, p.`condition`, price_bucket"
+
+    tags, conditions, prices = {}, {}, {}
+    total = 0
+    for row in query_all(sql, params, as_row=True):
+        n = int(row["n"])
+        total += n
+        tag_key = (row["tag_id"], row["tag_name"])
+        tags[tag_key] = tags.get(tag_key, 0) + n
+        conditions[row["condition"]] = conditions.get(row["condition"], 0) + n
+        prices[int(row["price_bucket"])] = prices.get(int(row["price_bucket"]), 0) + n
+
+    return {
+        "total": total,
+        "tags": [
+            {"tag_id": tag_id, "tag_name": tag_name or "未分类", "count": n}
+            for (tag_id, tag_name), n in sorted(tags.items(), key=lambda kv: -kv[1])
+        ],
+        "conditions": [
+            {"condition": condition or "未填写", "count": n}
+            for condition, n in sorted(conditions.items(), key=lambda kv: -kv[1])
+        ],
+        "prices": [
+            {"label": _price_label(low, high), "min": low, "max": high, "count": prices[i]}
+            for i, (low, high) in enumerate(PRICE_BUCKETS) if i in prices
+        ],
+    }
 
 
 # ======================================================
 # 2️⃣ 按标签搜索（自动包含帖子可见性 + 支持用户选择范围过滤）
+#    返回 (本页结果, 下一页游标)
 # ======================================================
-def search_by_tag(tag_id, user_id, scope="全部"):
+def search_by_tag(tag_id, user_id, scope="全部", cursor=None, page_size=DEFAULT_PAGE_SIZE):
     if not user_id:
-        return []
+        return [], None
+
+    viewer = _get_user_location(user_id)
+    if not viewer:
+        return [], None
+
+    key = ("search_by_tag", str(tag_id), *_search_key(viewer, scope, cursor, page_size))
+    return _cached_search(key, lambda: _search_by_tag(tag_id, scope, viewer, cursor, page_size))
+
+
+def _search_by_tag(tag_id, scope, viewer, cursor, page_size):
+    visibility_sql, params = _visibility_filter(viewer, scope)
+    if visibility_sql is None:
+        return [], None
 
     sql = f"""
         SELECT 
             p.posting_id, p.title, p.content, p.price, p.quantity,
             p.tag_id, t.tag_name, p.scope, p.status, p.created_at,
-            poster.username AS owner_name,
-            poster.room_id AS owner_room,
-            poster.floor AS owner_floor,
-            poster.building AS owner_building
+            u.username AS owner_name,
+            r.room_id AS owner_room,
+            r.floor AS owner_floor,
+            r.building AS owner_building
         FROM posting p
         LEFT JOIN tag t ON p.tag_id = t.tag_id
-        JOIN (
-            SELECT u.user_id, u.username, r.room_id, r.floor, r.building
-            FROM user u
-            JOIN room r ON u.room_id = r.room_id
-        ) AS poster ON p.owner_id = poster.user_id
-        JOIN (
-            SELECT r.room_id, r.floor, r.building
-            FROM room r
-            JOIN user u ON u.room_id = r.room_id
-            WHERE u.user_id = %s
-        ) AS viewer
+        JOIN user u ON p.owner_id = u.user_id
+        JOIN room r ON u.room_id = r.room_id
         WHERE p.status = '上架'
           AND p.tag_id = %s
-          AND { _scope_filter_sql() }
+          AND {visibility_sql}
     """
 
-    params = [user_id, tag_id]
-
-    sql += _range_filter_sql(scope)
-    sql += " ORDER BY p.created_at DESC"
-
-    return query_all(sql, params, as_dict=True)
+    return _paginate(sql, [tag_id] + params, cursor, page_size)
 
 
 # ======================================================
 # 3️⃣ 标签模糊搜索（输入框自动提示）
+#    优先走进程内后缀 trie（common/tag_suggest.py），不可用时查库
 # ======================================================
-def search_tags_fuzzy(query):
+def search_tags_fuzzy(query, limit=10):
+    index = get_tag_suggest_index()
+    if index is not None:
+        return index.suggest(query, limit)
+    return search_tags_fuzzy_sql(query, limit)
+
+
+def search_tags_fuzzy_sql(query, limit=10):
     sql = """
         SELECT tag_id, tag_name
         FROM tag
         WHERE tag_name LIKE %s
         ORDER BY ref_count DESC
-        LIMIT 10
+        LIMIT %s
     """
-    return query_all(sql, [f"%{query}%"], as_dict=True)
+    return query_all(sql, [f"%{query}%", limit], as_dict=True)
 
 
 # ======================================================
@@ -169,4 +533,5 @@ def search_tags_fuzzy(query):
 # ======================================================
 def get_all_tags():
     sql = "SELECT tag_id, tag_name, ref_count FROM tag ORDER BY ref_count DESC"
-    return query_all(sql, as_dict=True)
+    # 标签很少变化：缓存 5 分钟，写 tag 表时自动失效
+    return query_all(sql, as_dict=True, cache_ttl=300)
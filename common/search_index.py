@@ -0,0 +1,426 @@
+# common/search_index.py
+# ================================================
+# 帖子全文检索：进程内倒排索引
+# - 索引字段：title / content / brand / tag_name
+# - 分词：中文按单字 + 相邻二字（bigram），英文数字按单词（查询时子串匹配，与 LIKE '%kw%' 一致）
+#   分词前按库的排序规则（utf8mb4_0900_ai_ci）折叠：不区分大小写、重音、全角半角（café ≡ cafe）
+# - 倒排表：token → 有序 posting_id 数组 + 对应的字段加权词频（array，紧凑）
+# - 排序：BM25（按字段加权的词频）× 发布时间衰减
+# - 增量更新：本进程的发帖 / 修改 / 下架直接更新索引；
+#   其他 worker 进程的写入通过 posting.updated_at 定期追赶（SYNC_INTERVAL 秒），
+#   每次回看同步点之前 SYNC_OVERLAP 秒（晚提交的事务 updated_at 可能早于同步点）
+# 索引给出的候选是 LIKE '%kw%' 结果的超集，只用来缩小 SQL 扫描范围；
+# 可见性 / 状态 / LIKE 精确匹配仍在 SQL 中做；索引没有候选时调用方退回 LIKE 扫描，
+# 不会因为索引暂时落后而把“有结果”变成“无结果”
+# ================================================
+
+import heapq
+import math
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+
+from common.db import query_all, query_iter
+
+
+DEFAULT_SEARCH_INDEX_CONFIG = {
+    "ENABLED": True,
+    "SYNC_INTERVAL": 5,         # 距上次追赶超过该秒数，搜索前先同步其他进程的写入
+    "SYNC_OVERLAP": 300,        # 追赶时回看同步点之前多少秒（覆盖晚提交的长事务）
+    "MAX_CANDIDATES": 1000,     # 相关度排序最多排出前 N 条（只影响 relevance 排序的翻页深度）
+    "RECENCY_HALF_LIFE": 14,    # 发布时间加分的半衰期（天）
+    "RECENCY_WEIGHT": 1.0,      # 发布时间加分的权重（刚发布的帖子得分 ×(1 + RECENCY_WEIGHT)）
+}
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 各字段命中一次的权重
+FIELD_WEIGHTS = {
+    "title": 3,
+    "tag_name": 2,
+    "brand": 2,
+    "content": 1,
+}
+
+_MAX_WEIGHT = 0xFFFF   # array('H') 上限
+
+
+def _config():
+    return dict(DEFAULT_SEARCH_INDEX_CONFIG, **getattr(settings, "SEARCH_INDEX", {}))
+
+
+# ---------------------------------------
+# 分词
+# ---------------------------------------
+_RE_CJK = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")
+_RE_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _is_word(token):
+    return token[0] < "\u0080"
+
+
+def fold(text):
+    """
+    与 utf8mb4_0900_ai_ci 一致的折叠：大小写（casefold，ß → ss）、全角半角（NFKD）、
+    去掉重音等组合符号（é → e）
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """
+    "iPhone13 手机壳" → ["iphone13", "手", "机", "壳", "手机", "机壳"]
+    中文单字用于单字查询，二字用于多字查询
+    """
+    if not text:
+        return []
+    text = fold(text)
+    tokens = _RE_WORD.findall(text)
+    for run in _RE_CJK.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def query_terms(text):
+    """
+    查询分词：中文片段长度 ≥ 2 时只用二字（单字太宽泛），长度为 1 时用单字
+    英文数字单词原样返回（检索时按子串匹配）
+    """
+    if not text:
+        return []
+    text = fold(text)
+    terms = _RE_WORD.findall(text)
+    for run in _RE_CJK.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    # 去重并保持顺序
+    return list(dict.fromkeys(terms))
+
+
+# ---------------------------------------
+# 倒排索引
+# ---------------------------------------
+class SearchIndex:
+    def __init__(self, half_life_days=14, recency_weight=1.0):
+        self.half_life = half_life_days * 86400
+        self.recency_weight = recency_weight
+
+        self._ids = {}        # token → array('I')，posting_id 升序
+        self._weights = {}    # token → array('H')，与 _ids 一一对应的加权词频
+        self._docs = {}       # posting_id → (tokens, created_ts, 文档长度)
+        self._total_len = 0   # 所有文档长度之和（BM25 的平均长度）
+        self._words = []      # 英文数字 token，用于子串查找
+        self._words_dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ---------------------------------------
+    # 写入
+    # ---------------------------------------
+    def add(self, posting_id, fields, created_ts):
+        """fields: {"title": ..., "content": ..., "brand": ..., "tag_name": ...}"""
+        counts = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(field)):
+                counts[token] = counts.get(token, 0) + weight
+
+        with self._lock:
+            self._remove(posting_id)
+            for token, weight in counts.items():
+                ids = self._ids.get(token)
+                if ids is None:
+                    token = sys.intern(token)
+                    ids = self._ids[token] = array("I")
+                    self._weights[token] = array("H")
+                    if _is_word(token):
+                        self._words_dirty = True
+                i = bisect_left(ids, posting_id)
+                ids.insert(i, posting_id)
+                self._weights[token].insert(i, min(weight, _MAX_WEIGHT))
+            length = sum(counts.values())
+            self._docs[posting_id] = (tuple(counts), created_ts, length)
+            self._total_len += length
+
+    def remove(self, posting_id):
+        with self._lock:
+            self._remove(posting_id)
+
+    def _remove(self, posting_id):
+        """调用方持有锁"""
+        doc = self._docs.pop(posting_id, None)
+        if doc is None:
+            return
+        self._total_len -= doc[2]
+        for token in doc[0]:
+            ids = self._ids[token]
+            i = bisect_left(ids, posting_id)
+            if i < len(ids) and ids[i] == posting_id:
+                del ids[i]
+                del self._weights[token][i]
+            if not ids:
+                del self._ids[token]
+                del self._weights[token]
+                if _is_word(token):
+                    self._words_dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._weights.clear()
+            self._docs.clear()
+            self._total_len = 0
+            self._words = []
+            self._words_dirty = False
+
+    # ---------------------------------------
+    # 检索
+    # ---------------------------------------
+    def _expand(self, term):
+        """
+        英文数字展开成包含该子串的 token（"phone" → "phone", "iphone13", ...）；中文原样
+        中文二字 / 单字本身就覆盖了任意位置的子串，英文按整词切分，需要展开才能与 LIKE '%kw%' 一致
+        """
+        if not _is_word(term):
+            return [term] if term in self._ids else []
+        if self._words_dirty:
+            self._words = sorted(t for t in self._ids if _is_word(t))
+            self._words_dirty = False
+        return [word for word in self._words if term in word]
+
+    def match(self, text):
+        """
+        返回命中全部查询词的 posting_id 集合（不打分、不截断）
+        查询中没有可检索的词时返回 None
+        """
+        terms = query_terms(text)
+        if not terms:
+            return None
+        with self._lock:
+            result = None
+            for term in terms:
+                ids = set()
+                for token in self._expand(term):
+                    ids.update(self._ids[token])
+                result = ids if result is None else result & ids
+                if not result:
+                    return set()
+        return result
+
+    def score(self, text, ids=None, now=None):
+        """
+        返回 {posting_id: 得分}，得分 = BM25 × (1 + 发布时间加分)
+        每个查询词都必须命中（AND）；ids 不为 None 时只给这些帖子打分
+        查询中没有可检索的词时返回 None
+        """
+        terms = query_terms(text)
+        if not terms:
+            return None
+        if ids is not None and not isinstance(ids, (set, frozenset)):
+            ids = set(ids)
+
+        with self._lock:
+            docs = self._docs
+            total = len(docs) or 1
+            avg_len = self._total_len / total or 1
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token in self._expand(term):
+                    posting_ids = self._ids[token]
+                    df = len(posting_ids)
+                    idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                    for posting_id, tf in zip(posting_ids, self._weights[token]):
+                        if ids is not None and posting_id not in ids:
+                            continue
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * docs[posting_id][2] / avg_len)
+                        term_scores[posting_id] = (
+                            term_scores.get(posting_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                        )
+                if not term_scores:
+                    return {}
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {pid: s + term_scores[pid] for pid, s in scores.items() if pid in term_scores}
+                    if not scores:
+                        return {}
+
+            now = now or time.time()
+            for posting_id in scores:
+                age = max(now - docs[posting_id][1], 0)
+                scores[posting_id] *= 1 + self.recency_weight * 0.5 ** (age / self.half_life)
+        return scores
+
+    def search(self, text, limit=None, now=None):
+        """
+        返回按得分从高到低排序的 posting_id 列表（limit 个时用堆取前 k，不做全量排序）
+        查询中没有可检索的词时返回 None
+        """
+        scores = self.score(text, now=now)
+        if scores is None:
+            return None
+        if limit is None:
+            return sorted(scores, key=scores.__getitem__, reverse=True)
+        return heapq.nlargest(limit, scores, key=scores.__getitem__)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "tokens": len(self._ids),
+                "postings": sum(len(ids) for ids in self._ids.values()),
+            }
+
+
+# ---------------------------------------
+# 全局索引实例：首次搜索时从数据库构建
+# ---------------------------------------
+_DOC_SQL = """
+    SELECT p.posting_id, p.title, p.content, p.brand, t.tag_name,
+           p.status, p.created_at, p.updated_at
+    FROM posting p
+    LEFT JOIN tag t ON p.tag_id = t.tag_id
+"""
+
+_index = None
+_index_lock = threading.Lock()
+_synced_until = None     # 已同步到的最大 updated_at
+_synced_at = 0.0         # 上次追赶的时间（time.monotonic()）
+
+
+def _timestamp(value):
+    return value.timestamp() if hasattr(value, "timestamp") else time.time()
+
+
+def _apply(index, row):
+    """按一行帖子数据更新索引：下架的从索引移除，其余（重新）加入"""
+    if row["status"] == "下架":
+        index.remove(row["posting_id"])
+    else:
+        index.add(row["posting_id"], row, _timestamp(row["created_at"]))
+
+
+def _advance(updated_at):
+    global _synced_until
+    if updated_at is not None and (_synced_until is None or updated_at > _synced_until):
+        _synced_until = updated_at
+
+
+def _build():
+    """调用方持有 _index_lock"""
+    global _index, _synced_at
+    config = _config()
+    index = SearchIndex(config["RECENCY_HALF_LIFE"], config["RECENCY_WEIGHT"])
+    for row in query_iter(_DOC_SQL + " WHERE p.status <> '下架'", as_row=True):
+        _apply(index, row)
+        _advance(row["updated_at"])
+    _index = index
+    _synced_at = time.monotonic()
+
+
+def _catch_up():
+    """
+    同步其他进程的写入：读取 updated_at 不早于 同步点 - SYNC_OVERLAP 的帖子（幂等，重复应用无害）
+    updated_at 是语句执行时的时间，事务提交得晚时会落在已推进的同步点之前，只看 >= 同步点会漏掉
+    """
+    global _synced_at
+    if _synced_until is None:
+        rows = query_all(_DOC_SQL, as_row=True)
+    else:
+        since = _synced_until - timedelta(seconds=_config()["SYNC_OVERLAP"])
+        rows = query_all(_DOC_SQL + " WHERE p.updated_at >= %s", [since], as_row=True)
+    for row in rows:
+        _apply(_index, row)
+        _advance(row["updated_at"])
+    _synced_at = time.monotonic()
+
+
+def get_search_index():
+    """返回已同步的索引；未启用时返回 None"""
+    config = _config()
+    if not config["ENABLED"]:
+        return None
+    with _index_lock:
+        if _index is None:
+            _build()
+        elif time.monotonic() - _synced_at >= config["SYNC_INTERVAL"]:
+            _catch_up()
+        return _index
+
+
+def candidate_ids(keyword):
+    """
+    关键字 → 全部候选 posting_id（集合，不截断；是 LIKE '%keyword%' 结果的超集）
+    返回 None 表示索引不可用或关键字中没有可检索的词，调用方应退回 LIKE 扫描；
+    返回空集合时调用方也应退回 LIKE（索引可能还没追上其他进程的写入）
+    """
+    index = get_search_index()
+    if index is None:
+        return None
+    return index.match(keyword)
+
+
+def max_candidates():
+    """相关度排序最多排出多少条"""
+    return _config()["MAX_CANDIDATES"]
+
+
+def score_ids(keyword, ids):
+    """
+    给一组帖子按关键字打分（相关度排序用）：{posting_id: 得分}
+    返回 None 表示索引不可用或关键字中没有可检索的词
+    """
+    index = get_search_index()
+    if index is None:
+        return None
+    return index.score(keyword, ids)
+
+
+# ---------------------------------------
+# 增量更新（posting_dao 在发帖 / 修改 / 下架后调用）
+# 索引尚未构建时什么都不做：构建时会读到最新数据
+# ---------------------------------------
+def refresh_posting(posting_id):
+    """重新读取该帖子并更新索引（已下架的会被移除）"""
+    refresh_postings([posting_id])
+
+
+def refresh_postings(posting_ids):
+    """批量版 refresh_posting（批量导入每个批次提交后调用），一条 IN 查询"""
+    if _index is None or not posting_ids:
+        return
+    posting_ids = list(posting_ids)
+    sql = _DOC_SQL + f" WHERE p.posting_id IN ({', '.join(['%s'] * len(posting_ids))})"
+    rows = query_all(sql, posting_ids, as_row=True)
+    with _index_lock:
+        found = set()
+        for row in rows:
+            _apply(_index, row)
+            found.add(row["posting_id"])
+        for posting_id in posting_ids:
+            if posting_id not in found:
+                _index.remove(posting_id)
+
+
+def search_index_stats():
+    if _index is None:
+        return {"built": False}
+    data = _index.stats()
+    data.update({"built": True, "synced_until": str(_synced_until)})
+    return data
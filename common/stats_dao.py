@@ -8,35 +8,36 @@ from common.db import query_one, query_all
 
 # ======================================================
 # 1️⃣ 系统总览统计（管理员）
+#    一次往返：每张表一次条件聚合，合并成一行
 # ======================================================
 def get_system_overview_stats():
-    stats = {}
-
-    # 用户总数
-    stats["user_count"] = query_one("SELECT COUNT(*) FROM user")[0]
-
-    # 上架帖子总数
-    stats["posting_count"] = query_one("SELECT COUNT(*) FROM posting WHERE status='上架'")[0]
-
-    # 完成订单
-    stats["order_completed"] = query_one(
-        "SELECT COUNT(*) FROM `order` WHERE status='完成'"
-    )[0]
-
-    # 取消订单
-    stats["order_canceled"] = query_one(
-        "SELECT COUNT(*) FROM `order` WHERE status='取消'"
-    )[0]
-
-    # 投诉数量
-    stats["complaint_count"] = query_one(
-        "SELECT COUNT(*) FROM complaint"
-    )[0]
-
-    # 已处理投诉数量
-    stats["complaint_resolved"] = query_one(
-        "SELECT COUNT(*) FROM complaint WHERE status='已处理'"
-    )[0]
+    row = query_one("""
+        SELECT
+            u.user_count,
+            p.posting_count,
+            o.order_completed,
+            o.order_canceled,
+            c.complaint_count,
+            c.complaint_resolved
+        FROM
+            (SELECT COUNT(*) AS user_count FROM user) u,
+            (SELECT COUNT(*) AS posting_count FROM posting WHERE status='上架') p,
+            (
+                SELECT
+                    COALESCE(SUM(status='完成'), 0) AS order_completed,   -- 完成订单
+                    COALESCE(SUM(status='取消'), 0) AS order_canceled     -- 取消订单
+                FROM `order`
+            ) o,
+            (
+                SELECT
+                    COUNT(*) AS complaint_count,                           -- 投诉数量
+                    COALESCE(SUM(status='已处理'), 0) AS complaint_resolved -- 已处理投诉数量
+                FROM complaint
+            ) c
+    """, as_dict=True)
+
+    # SUM() 在 MySQL 中返回 Decimal，统一转成 int
+    stats = {k: int(v) for k, v in row.items()}
 
     # 投诉处理率
     if stats["complaint_count"] == 0:
@@ -51,44 +52,37 @@ def get_system_overview_stats():
 
 # ======================================================
 # 2️⃣ 用户个人统计（出物量、订单、投诉）
+#    一次往返：posting / order / complaint 各一次条件聚合
 # ======================================================
 def get_user_stats(user_id):
-    stats = {}
-
-    # 用户发布的帖子数量
-    stats["posting_count"] = query_one(
-        "SELECT COUNT(*) FROM posting WHERE owner_id=%s", [user_id]
-    )[0]
-
-    # 卖家完成订单数量
-    stats["seller_orders_completed"] = query_one(
-        "SELECT COUNT(*) FROM `order` WHERE seller_id=%s AND status='完成'",
-        [user_id],
-    )[0]
-
-    # 买家完成订单数量
-    stats["buyer_orders_completed"] = query_one(
-        "SELECT COUNT(*) FROM `order` WHERE buyer_id=%s AND status='完成'",
-        [user_id],
-    )[0]
-
-    # 用户订单总数（买家+卖家）
-    stats["total_orders"] = query_one(
-        "SELECT COUNT(*) FROM `order` WHERE buyer_id=%s OR seller_id=%s",
-        [user_id, user_id],
-    )[0]
-
-    # 用户被投诉次数
-    stats["complaint_received"] = query_one(
-        "SELECT COUNT(*) FROM complaint WHERE accused_id=%s",
-        [user_id],
-    )[0]
-
-    # 用户投诉被处理次数（成立）
-    stats["complaint_resolved"] = query_one(
-        "SELECT COUNT(*) FROM complaint WHERE accused_id=%s AND status='已处理'",
-        [user_id],
-    )[0]
+    row = query_one("""
+        SELECT
+            p.posting_count,
+            o.seller_orders_completed,
+            o.buyer_orders_completed,
+            o.total_orders,
+            c.complaint_received,
+            c.complaint_resolved
+        FROM
+            (SELECT COUNT(*) AS posting_count FROM posting WHERE owner_id=%s) p,
+            (
+                SELECT
+                    COALESCE(SUM(seller_id=%s AND status='完成'), 0) AS seller_orders_completed,
+                    COALESCE(SUM(buyer_id=%s AND status='完成'), 0) AS buyer_orders_completed,
+                    COUNT(*) AS total_orders                               -- 买家 + 卖家
+                FROM `order`
+                WHERE buyer_id=%s OR seller_id=%s
+            ) o,
+            (
+                SELECT
+                    COUNT(*) AS complaint_received,                        -- 被投诉次数
+                    COALESCE(SUM(status='已处理'), 0) AS complaint_resolved -- 投诉成立次数
+                FROM complaint
+                WHERE accused_id=%s
+            ) c
+    """, [user_id, user_id, user_id, user_id, user_id, user_id], as_dict=True)
+
+    stats = {k: int(v) for k, v in row.items()}
 
     # 投诉成立率
     if stats["seller_orders_completed"] == 0:
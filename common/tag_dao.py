@@ -6,4 +6,5 @@ def get_all_tags():
         FROM tag
         ORDER BY tag_name
     """
-    return query_all(sql, as_dict=True)
+    # 标签很少变化：缓存 5 分钟，写 tag 表时自动失效
+    return query_all(sql, as_dict=True, cache_ttl=300)
@@ -0,0 +1,216 @@
+# common/tag_suggest.py
+# ================================================
+# 标签联想：进程内后缀 trie
+# - 把每个标签名（小写）的所有后缀插入 trie，
+#   于是“标签名包含 q”等价于“从根沿 q 走到某个节点”，前缀查询同理
+# - 每个节点缓存按 ref_count 排好序的前 K 个标签，查询只需走 len(q) 步
+# - 首次使用时构建；之后每 REFRESH_INTERVAL 秒按 tag.updated_at 增量刷新，
+#   再比对 tag_id 集合（个数 + 总和），不一致（有标签被删除）时整体重建
+# ================================================
+
+import heapq
+import threading
+import time
+
+from django.conf import settings
+
+from common.db import query_all, query_one
+
+
+DEFAULT_TAG_SUGGEST_CONFIG = {
+    "ENABLED": True,
+    "TOP_K": 10,               # 每个节点缓存的标签数
+    "REFRESH_INTERVAL": 30,    # 检查标签变化的间隔（秒）
+}
+
+
+def _config():
+    return dict(DEFAULT_TAG_SUGGEST_CONFIG, **getattr(settings, "TAG_SUGGEST", {}))
+
+
+class _Node:
+    __slots__ = ("children", "ids", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()      # 经过该节点的标签（标签名包含从根到此的子串）
+        self.top = ()         # 按 ref_count 倒序的前 K 个 tag_id
+
+
+class TagSuggestIndex:
+    def __init__(self, top_k=10):
+        self.top_k = top_k
+        self._root = _Node()
+        self._tags = {}       # tag_id → (tag_name, ref_count)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._tags)
+
+    def _rank(self, tag_id):
+        name, ref_count = self._tags[tag_id]
+        return -ref_count, name
+
+    def _top(self, ids, k):
+        return heapq.nsmallest(k, ids, key=self._rank)
+
+    # ---------------------------------------
+    # 写入
+    # ---------------------------------------
+    def _paths(self, name, create):
+        """遍历标签名所有后缀经过的节点（去重）"""
+        nodes = {id(self._root): self._root}
+        for start in range(len(name)):
+            node = self._root
+            for ch in name[start:]:
+                child = node.children.get(ch)
+                if child is None:
+                    if not create:
+                        break
+                    child = node.children[ch] = _Node()
+                node = child
+                nodes[id(node)] = node
+        return nodes.values()
+
+    def set_tag(self, tag_id, tag_name, ref_count):
+        """新增或修改一个标签，并重算受影响节点的前 K 个"""
+        with self._lock:
+            affected = []
+            old = self._tags.get(tag_id)
+            if old is not None and old[0] != tag_name:
+                affected.extend(self._detach(tag_id, old[0]))
+            self._tags[tag_id] = (tag_name, ref_count)
+            for node in self._paths(tag_name.lower(), create=True):
+                node.ids.add(tag_id)
+                affected.append(node)
+            for node in affected:
+                node.top = tuple(self._top(node.ids, self.top_k))
+
+    def remove_tag(self, tag_id):
+        with self._lock:
+            old = self._tags.get(tag_id)
+            if old is None:
+                return
+            affected = self._detach(tag_id, old[0])
+            del self._tags[tag_id]
+            for node in affected:
+                node.top = tuple(self._top(node.ids, self.top_k))
+
+    def _detach(self, tag_id, tag_name):
+        nodes = list(self._paths(tag_name.lower(), create=False))
+        for node in nodes:
+            node.ids.discard(tag_id)
+        return nodes
+
+    def load(self, rows):
+        """一次性构建：先插入全部标签，最后统一计算各节点的前 K 个"""
+        with self._lock:
+            for row in rows:
+                self._tags[row["tag_id"]] = (row["tag_name"], row["ref_count"])
+                for node in self._paths(row["tag_name"].lower(), create=True):
+                    node.ids.add(row["tag_id"])
+            stack = [self._root]
+            while stack:
+                node = stack.pop()
+                node.top = tuple(self._top(node.ids, self.top_k))
+                stack.extend(node.children.values())
+
+    # ---------------------------------------
+    # 查询
+    # ---------------------------------------
+    def suggest(self, query, limit=10):
+        """标签名包含 query（不区分大小写）的标签，按 ref_count 倒序，最多 limit 个"""
+        with self._lock:
+            node = self._root
+            for ch in (query or "").lower():
+                node = node.children.get(ch)
+                if node is None:
+                    return []
+            ids = node.top[:limit] if limit <= self.top_k else self._top(node.ids, limit)
+            return [{"tag_id": tag_id, "tag_name": self._tags[tag_id][0]} for tag_id in ids]
+
+    def signature(self):
+        """(标签数, tag_id 总和)：与 tag 表比对，发现被删除的标签"""
+        with self._lock:
+            return len(self._tags), sum(self._tags)
+
+    def stats(self):
+        with self._lock:
+            nodes = 0
+            stack = [self._root]
+            while stack:
+                node = stack.pop()
+                nodes += 1
+                stack.extend(node.children.values())
+            return {"tags": len(self._tags), "nodes": nodes, "top_k": self.top_k}
+
+
+# ---------------------------------------
+# 全局实例
+# ---------------------------------------
+_TAG_SQL = "SELECT tag_id, tag_name, ref_count, updated_at FROM tag"
+
+_index = None
+_index_lock = threading.Lock()
+_synced_until = None
+_checked_at = 0.0
+
+
+def _build():
+    """调用方持有 _index_lock"""
+    global _index, _synced_until, _checked_at
+    rows = query_all(_TAG_SQL, as_row=True)
+    index = TagSuggestIndex(_config()["TOP_K"])
+    index.load(rows)
+    _index = index
+    _synced_until = max((r["updated_at"] for r in rows), default=None)
+    _checked_at = time.monotonic()
+
+
+def _refresh():
+    """调用方持有 _index_lock：增量应用 updated_at 变化的标签；有标签被删除则重建"""
+    global _synced_until, _checked_at
+    if _synced_until is None:
+        rows = query_all(_TAG_SQL, as_row=True)
+    else:
+        rows = query_all(_TAG_SQL + " WHERE updated_at >= %s", [_synced_until], as_row=True)
+    for row in rows:
+        _index.set_tag(row["tag_id"], row["tag_name"], row["ref_count"])
+        if _synced_until is None or row["updated_at"] > _synced_until:
+            _synced_until = row["updated_at"]
+
+    # 新增的标签已经加入索引，此时索引中的 tag_id 应与表中完全一致；
+    # 只比个数的话“删一个 + 加一个”会漏掉，所以连同 tag_id 总和一起比
+    row = query_one("SELECT COUNT(*) AS n, COALESCE(SUM(tag_id), 0) AS id_sum FROM tag", as_row=True)
+    if (row["n"], row["id_sum"]) != _index.signature():
+        _build()
+        return
+    _checked_at = time.monotonic()
+
+
+def get_tag_suggest_index():
+    """返回标签联想索引；未启用时返回 None"""
+    config = _config()
+    if not config["ENABLED"]:
+        return None
+    with _index_lock:
+        if _index is None:
+            _build()
+        elif time.monotonic() - _checked_at >= config["REFRESH_INTERVAL"]:
+            _refresh()
+        return _index
+
+
+def refresh_tag_suggestions():
+    """写 tag 表后立即刷新（不必等 REFRESH_INTERVAL）"""
+    with _index_lock:
+        if _index is not None:
+            _refresh()
+
+
+def tag_suggest_stats():
+    if _index is None:
+        return {"built": False}
+    data = _index.stats()
+    data.update({"built": True, "synced_until": str(_synced_until)})
+    return data
@@ -3,7 +3,9 @@
 # 用户模块 DAO：注册、登录、资料修改、寝室绑定、管理员管理
 # ======================================================
 
-from common.db import query_one, query_all, execute
+from common.db import query_one, query_all, query_iter, execute
+from common.search_dao import DEFAULT_PAGE_SIZE, normalize_page_size
+from common.visibility import refresh_owner
 
 
 # ======================================================
@@ -74,6 +76,8 @@ def update_user_profile(email, wechat, room_id, user_id):
         WHERE user_id = %s
     """
     execute(sql, [email, wechat, room_id, user_id])
+    # 换寝室后发帖人位置变化，重新放置其帖子
+    refresh_owner(user_id)
 
 
 # ======================================================
@@ -97,7 +101,8 @@ def get_room_list():
         FROM room
         ORDER BY building, floor
     """
-    return query_all(sql, as_dict=True)
+    # 寝室基本不变：缓存 5 分钟，写 room 表时自动失效
+    return query_all(sql, as_dict=True, cache_ttl=300)
 
 
 # ======================================================
@@ -110,6 +115,8 @@ def bind_room(user_id, room_id):
         WHERE user_id = %s
     """
     execute(sql, [room_id, user_id])
+    # 换寝室后发帖人位置变化，重新放置其帖子
+    refresh_owner(user_id)
 
 
 # ======================================================
@@ -127,6 +134,49 @@ def admin_get_all_users():
     return query_all(sql, as_dict=True)
 
 
+def admin_get_user_page(cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    管理员用户列表分页：按 user_id 升序 keyset（主键），只读一页
+    cursor 为上一页最后一个 user_id；返回 (本页用户, 下一页游标 或 None)
+    """
+    page_size = normalize_page_size(page_size)
+    sql = """
+        SELECT u.user_id, u.username, u.email, u.student_id,
+               u.status, u.user_role, u.room_id,
+               r.floor, r.building
+        FROM user u
+        LEFT JOIN room r ON u.room_id = r.room_id
+    """
+    params = []
+    if cursor and str(cursor).isdigit():
+        sql += " WHERE u.user_id > %s"
+        params.append(int(cursor))
+    # 多取一条，用来判断是否还有下一页
+    sql += " ORDER BY u.user_id LIMIT %s"
+    params.append(page_size + 1)
+
+    rows = query_all(sql, params, as_dict=True)
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, str(rows[-1]["user_id"])
+    return rows, None
+
+
+def admin_iter_all_users(batch_size=500):
+    """
+    管理员：流式获取所有用户（生成器），用于导出 CSV
+    """
+    sql = """
+        SELECT u.user_id, u.username, u.email, u.student_id,
+               u.status, u.user_role, u.room_id,
+               r.floor, r.building
+        FROM user u
+        LEFT JOIN room r ON u.room_id = r.room_id
+        ORDER BY u.user_id
+    """
+    return query_iter(sql, batch_size=batch_size, as_dict=True)
+
+
 # ======================================================
 # 🔟 管理员：封禁用户
 # ======================================================
@@ -0,0 +1,140 @@
+# common/view_counter.py
+# ================================================
+# 帖子浏览数：进程内累计，定期批量写入 posting_stats
+# - record_view() 只在内存字典里 +1，热门帖子被频繁访问也不会每次都写库
+# - 后台线程每 FLUSH_INTERVAL 秒把累计值合并成一条多行
+#   INSERT ... ON DUPLICATE KEY UPDATE view_count = view_count + 增量；进程退出时再写一次
+# - 写库失败时增量放回，下次一并写入
+# - 正在写的增量仍计入 pending_views()，写完再失效这些帖子的详情缓存，
+#   详情页显示的浏览数（缓存的库中值 + 未写库部分）不会倒退
+# 每个 worker 进程各自累计；进程被强杀时最多丢失最近 FLUSH_INTERVAL 秒的浏览数
+# ================================================
+
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+
+from common.db import execute_many
+
+
+logger = logging.getLogger("common.view_counter")
+
+DEFAULT_VIEW_COUNTER_CONFIG = {
+    "ENABLED": True,
+    "FLUSH_INTERVAL": 10,      # 秒
+    "BATCH_SIZE": 500,         # 每条 INSERT 最多写多少个帖子
+}
+
+_FLUSH_SQL = """
+    INSERT INTO posting_stats(posting_id, view_count)
+    VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE view_count = view_count + VALUES(view_count)
+"""
+
+
+def _config():
+    return dict(DEFAULT_VIEW_COUNTER_CONFIG, **getattr(settings, "VIEW_COUNTER", {}))
+
+
+_pending = Counter()
+_inflight = Counter()               # 已从 _pending 取出、正在写库的增量
+_lock = threading.Lock()
+_flush_lock = threading.Lock()      # 同一时间只有一个 flush
+_stop = threading.Event()
+_thread = None
+_stats = {"recorded": 0, "flushes": 0, "rows_written": 0, "failures": 0}
+
+
+def record_view(posting_id):
+    if not _config()["ENABLED"]:
+        return
+    with _lock:
+        _pending[int(posting_id)] += 1
+        _stats["recorded"] += 1
+    if _thread is None:
+        _start()
+
+
+def pending_views(posting_id):
+    """本进程尚未写入数据库的浏览数（展示时加到 view_count 上）"""
+    posting_id = int(posting_id)
+    with _lock:
+        return _pending.get(posting_id, 0) + _inflight.get(posting_id, 0)
+
+
+def flush():
+    """把累计的浏览数写入数据库；返回写入的帖子数"""
+    from common.posting_dao import invalidate_posting_detail     # posting_dao 导入了本模块
+
+    with _flush_lock:
+        with _lock:
+            batch = dict(_pending)
+            _pending.clear()
+            _inflight.update(batch)
+        if not batch:
+            return 0
+
+        items = sorted(batch.items())       # 固定加锁顺序，避免多进程同时写入时死锁
+        size = _config()["BATCH_SIZE"]
+        written = 0
+        try:
+            for i in range(0, len(items), size):
+                chunk = items[i:i + size]
+                execute_many(_FLUSH_SQL, chunk)
+                written += len(chunk)
+                # 先失效详情缓存再扣掉增量：之后的页面读到的是已包含这部分的库中值
+                try:
+                    invalidate_posting_detail(*(posting_id for posting_id, _ in chunk))
+                finally:
+                    with _lock:
+                        _inflight.subtract(dict(chunk))
+                        _drop_zero(_inflight)
+        except Exception:
+            # 没写成功的部分放回，下次再写
+            with _lock:
+                rest = dict(items[written:])
+                _inflight.subtract(rest)
+                _drop_zero(_inflight)
+                _pending.update(rest)
+                _stats["failures"] += 1
+            logger.exception("failed to flush %d posting view counts", len(items) - written)
+        with _lock:
+            _stats["flushes"] += 1
+            _stats["rows_written"] += written
+        return written
+
+
+def _drop_zero(counter):
+    for key in [k for k, v in counter.items() if v <= 0]:
+        del counter[key]
+
+
+def _run():
+    interval = _config()["FLUSH_INTERVAL"]
+    while not _stop.wait(interval):
+        flush()
+
+
+def _start():
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_run, name="view-counter-flush", daemon=True)
+    _thread.start()
+    atexit.register(_shutdown)
+
+
+def _shutdown():
+    _stop.set()
+    flush()
+
+
+def view_counter_stats():
+    with _lock:
+        data = dict(_stats)
+        data.update({"pending_postings": len(_pending), "pending_views": sum(_pending.values())})
+    return data
@@ -0,0 +1,270 @@
+# common/visibility.py
+# ================================================
+# 帖子可见性：进程内常驻的按位置分组的 posting_id 集合
+# - 寝室 → 楼层 → 楼栋 层级常驻内存
+# - 可见集合：
+#     全楼                       → 所有人可见（一个集合）
+#     楼栋 / 楼层 / 寝室（按位置）  → 该位置发帖、scope 为该层级的帖子，同一位置的人可见
+#   查看者可见 = 全楼 ∪ 本楼栋 ∪ 本楼层 ∪ 本寝室，用集合求交 / 求并计算
+# - 发帖人集合：每个楼栋 / 楼层 / 寝室中的人发的帖子（“只看同楼栋 / 同楼层 / 同寝室”的范围过滤）
+# - visible_ids 只在结果集有界时计算：给了候选（关键字搜索）时代价与候选数成正比，
+#   选了范围时与该位置的发帖数成正比；两者都没有（可见集合接近全表）时返回 None，
+#   由调用方在 SQL 中过滤（JOIN user / room），不展开成 IN 列表
+# 本进程的发帖 / 改范围 / 下架 / 换寝室直接更新；其他进程的写入按 updated_at 追赶
+# （回看同步点之前 SYNC_OVERLAP 秒，覆盖晚提交的事务）
+# ================================================
+
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+from common.db import query_all, query_iter, query_one
+
+
+DEFAULT_VISIBILITY_CONFIG = {
+    "ENABLED": True,
+    "SYNC_INTERVAL": 5,     # 距上次追赶超过该秒数，先同步其他进程的写入
+    "SYNC_OVERLAP": 300,    # 追赶时回看同步点之前多少秒（晚提交的事务 updated_at 可能早于同步点）
+}
+
+# scope / 范围过滤 → 位置层级（0 楼栋，1 楼层，2 寝室）
+LEVELS = {"楼栋": 0, "楼层": 1, "寝室": 2}
+
+EVERYONE = "全楼"
+
+_EMPTY = frozenset()
+
+
+def _config():
+    return dict(DEFAULT_VISIBILITY_CONFIG, **getattr(settings, "VISIBILITY", {}))
+
+
+class VisibilityIndex:
+    def __init__(self, rooms):
+        self.rooms = rooms          # room_id → (building, floor)
+
+        self._docs = {}                             # posting_id → (scope, 发帖人位置 keys)，用于移除
+        self._everyone = set()                      # scope = 全楼
+        self._scoped = [{} for _ in LEVELS]         # 层级 → 位置 key → 该位置发帖、scope 为该层级的帖子
+        self._posters = [{} for _ in LEVELS]        # 层级 → 位置 key → 发帖人在该位置的帖子
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def location(self, room_id):
+        """room_id → (楼栋 key, 楼层 key, 寝室 key)；未知寝室返回 None"""
+        place = self.rooms.get(room_id)
+        if place is None:
+            return None
+        building, floor = place
+        return (building,), (building, floor), (building, floor, room_id)
+
+    # ---------------------------------------
+    # 写入
+    # ---------------------------------------
+    def add(self, posting_id, scope, room_id):
+        keys = self.location(room_id)
+        with self._lock:
+            self._remove(posting_id)
+            if keys is None:
+                return
+            self._docs[posting_id] = (scope, keys)
+            if scope == EVERYONE:
+                self._everyone.add(posting_id)
+            elif scope in LEVELS:
+                level = LEVELS[scope]
+                self._scoped[level].setdefault(keys[level], set()).add(posting_id)
+            for level, key in enumerate(keys):
+                self._posters[level].setdefault(key, set()).add(posting_id)
+
+    def remove(self, posting_id):
+        with self._lock:
+            self._remove(posting_id)
+
+    def _remove(self, posting_id):
+        """调用方持有锁"""
+        doc = self._docs.pop(posting_id, None)
+        if doc is None:
+            return
+        scope, keys = doc
+        if scope == EVERYONE:
+            self._everyone.discard(posting_id)
+        elif scope in LEVELS:
+            level = LEVELS[scope]
+            _discard(self._scoped[level], keys[level], posting_id)
+        for level, key in enumerate(keys):
+            _discard(self._posters[level], key, posting_id)
+
+    # ---------------------------------------
+    # 查询
+    # ---------------------------------------
+    def visible_ids(self, room_id, range_scope=None, within=None):
+        """
+        查看者可见的 posting_id 集合
+        range_scope 为 楼栋 / 楼层 / 寝室 时，只保留发帖人与查看者在同一位置的
+        within 不为 None 时只在其中找（关键字候选）
+        既没有 within 也没有范围时返回 None（结果接近全表，交给 SQL）
+        """
+        viewer = self.location(room_id)
+        if viewer is None:
+            return set()
+        level = LEVELS.get(range_scope)
+        with self._lock:
+            base = within
+            if level is not None:
+                posters = self._posters[level].get(viewer[level], _EMPTY)
+                base = posters if base is None else posters.intersection(base)
+            if base is None:
+                return None
+            if not isinstance(base, (set, frozenset)):
+                base = set(base)
+            sets = [self._everyone] + [self._scoped[i].get(viewer[i], _EMPTY) for i in range(len(LEVELS))]
+            # 集合求交按较小的一方遍历：代价与 len(base) 成正比
+            return set().union(*(base & s for s in sets))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "postings": len(self._docs),
+                "everyone": len(self._everyone),
+                "scoped_sets": sum(len(groups) for groups in self._scoped),
+                "poster_sets": sum(len(groups) for groups in self._posters),
+                "rooms": len(self.rooms),
+            }
+
+
+def _discard(groups, key, posting_id):
+    ids = groups.get(key)
+    if ids is not None:
+        ids.discard(posting_id)
+        if not ids:
+            del groups[key]
+
+
+# ---------------------------------------
+# 全局实例：首次使用时从数据库构建
+# ---------------------------------------
+_DOC_SQL = """
+    SELECT p.posting_id, p.scope, p.status, u.room_id,
+           p.updated_at AS posting_updated_at, u.updated_at AS user_updated_at
+    FROM posting p
+    JOIN user u ON p.owner_id = u.user_id
+"""
+
+_index = None
+_index_lock = threading.Lock()
+_synced_until = {"posting": None, "user": None}    # 已同步到的最大 updated_at（分表记录）
+_synced_at = 0.0
+
+
+def _load_rooms():
+    rows = query_all("SELECT room_id, building, floor FROM room", as_row=True)
+    return {r["room_id"]: (r["building"], r["floor"]) for r in rows}
+
+
+def _apply(index, row):
+    if row["status"] == "下架":
+        index.remove(row["posting_id"])
+    else:
+        if row["room_id"] not in index.rooms:
+            # 新加的寝室：重新加载层级
+            index.rooms = _load_rooms()
+        index.add(row["posting_id"], row["scope"], row["room_id"])
+
+
+def _advance(table, updated_at):
+    current = _synced_until[table]
+    if updated_at is not None and (current is None or updated_at > current):
+        _synced_until[table] = updated_at
+
+
+def _build():
+    """调用方持有 _index_lock"""
+    global _index, _synced_at
+    index = VisibilityIndex(_load_rooms())
+    for row in query_iter(_DOC_SQL + " WHERE p.status <> '下架'", as_row=True):
+        _apply(index, row)
+        _advance("posting", row["posting_updated_at"])
+    row = query_one("SELECT MAX(updated_at) AS updated_at FROM user", as_row=True)
+    _advance("user", row["updated_at"] if row else None)
+    _index = index
+    _synced_at = time.monotonic()
+
+
+def _catch_up():
+    """
+    同步其他进程的写入：改过的帖子，以及换过寝室（user.updated_at 变化）的发帖人的帖子
+    回看同步点之前 SYNC_OVERLAP 秒（重复应用无害）：晚提交的事务 updated_at 可能早于同步点
+    """
+    global _synced_at
+    overlap = timedelta(seconds=_config()["SYNC_OVERLAP"])
+    for table in ("posting", "user"):
+        since = _synced_until[table]
+        if since is None:
+            rows = query_all(_DOC_SQL, as_row=True)
+        else:
+            rows = query_all(_DOC_SQL + f" WHERE {table[0]}.updated_at >= %s", [since - overlap], as_row=True)
+        for row in rows:
+            _apply(_index, row)
+            _advance(table, row[f"{table}_updated_at"])
+    _synced_at = time.monotonic()
+
+
+def get_visibility_index():
+    """返回已同步的可见性索引；未启用时返回 None"""
+    config = _config()
+    if not config["ENABLED"]:
+        return None
+    with _index_lock:
+        if _index is None:
+            _build()
+        elif time.monotonic() - _synced_at >= config["SYNC_INTERVAL"]:
+            _catch_up()
+        return _index
+
+
+# ---------------------------------------
+# 增量更新（posting_dao / user_dao 写入后调用）
+# 尚未构建时什么都不做：构建时会读到最新数据
+# ---------------------------------------
+def refresh_posting(posting_id):
+    """重新读取该帖子的 scope / 状态 / 发帖人寝室并更新"""
+    refresh_postings([posting_id])
+
+
+def refresh_postings(posting_ids):
+    """批量版 refresh_posting（批量导入每个批次提交后调用），一条 IN 查询"""
+    if _index is None or not posting_ids:
+        return
+    posting_ids = list(posting_ids)
+    sql = _DOC_SQL + f" WHERE p.posting_id IN ({', '.join(['%s'] * len(posting_ids))})"
+    rows = query_all(sql, posting_ids, as_row=True)
+    with _index_lock:
+        found = set()
+        for row in rows:
+            _apply(_index, row)
+            found.add(row["posting_id"])
+        for posting_id in posting_ids:
+            if posting_id not in found:
+                _index.remove(posting_id)
+
+
+def refresh_owner(user_id):
+    """发帖人换寝室后，重新放置其所有帖子"""
+    if _index is None:
+        return
+    rows = query_all(_DOC_SQL + " WHERE p.owner_id = %s", [user_id], as_row=True)
+    with _index_lock:
+        for row in rows:
+            _apply(_index, row)
+
+
+def visibility_stats():
+    if _index is None:
+        return {"built": False}
+    data = _index.stats()
+    data.update({"built": True, "synced_until": {k: str(v) for k, v in _synced_until.items()}})
+    return data
@@ -1,6 +1,7 @@
 import os
 from django.core.management.base import BaseCommand
-from django.db import connection
+
+from common.db import execute, transaction
 
 
 class Command(BaseCommand):
@@ -41,10 +42,12 @@ class Command(BaseCommand):
                 if stmt.strip()
             ]
 
-            with connection.cursor() as cursor:
+            # 每个文件在一个事务中执行：样例数据只在最后提交一次，
+            # 中途出错整体回滚（MySQL 的 DDL 仍会隐式提交）
+            with transaction():
                 for stmt in statements:
                     try:
-                        cursor.execute(stmt)
+                        execute(stmt)
                     except Exception as e:
                         self.stdout.write(
                             self.style.ERROR(
@@ -9,6 +9,7 @@ from .views import (
     update_profile_view,
     change_password_view,
     admin_user_list_view,
+    admin_export_users_view,
     admin_ban_user_view,
     admin_unban_user_view,
 )
@@ -26,6 +27,7 @@ urlpatterns = [
 
     # 管理员
     path("admin/users/", admin_user_list_view, name="admin_user_list"),
+    path("admin/users/export/", admin_export_users_view, name="admin_export_users"),
     path("admin/users/<int:user_id>/ban/", admin_ban_user_view),
     path("admin/users/<int:user_id>/unban/", admin_unban_user_view),
 ]
\ No newline at end of file
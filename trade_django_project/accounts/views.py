@@ -6,6 +6,7 @@ from django.contrib import messages
 from django.conf import settings
 
 
+from market.csv_export import csv_response
 from common.user_dao import (
     check_user_exists,
     insert_user,
@@ -16,6 +17,8 @@ from common.user_dao import (
     get_room_list,
     bind_room,
     admin_get_all_users,
+    admin_get_user_page,
+    admin_iter_all_users,
     ban_user_by_id,
     unban_user_by_id,
 )
@@ -218,8 +221,29 @@ def admin_user_list_view(request):
         messages.error(request, "无权限")
         return redirect("market:index")
 
-    users = admin_get_all_users()
-    return render(request, "accounts/admin_user_list.html", {"users": users})
+    # 游标分页，每页一条 LIMIT 查询；导出全部用户走下面的流式 CSV
+    users, next_cursor = admin_get_user_page(request.GET.get("cursor"), request.GET.get("page_size"))
+
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query["cursor"] = next_cursor
+        next_url = f"{request.path}?{query.urlencode()}"
+
+    return render(request, "accounts/admin_user_list.html", {"users": users, "next_url": next_url})
+
+
+# ======================================================
+# 7️⃣-2 管理员导出用户列表（CSV，流式输出）
+# ======================================================
+def admin_export_users_view(request):
+    if request.session.get("user_role") != 3:
+        messages.error(request, "无权限")
+        return redirect("market:index")
+
+    header = ["user_id", "username", "email", "student_id", "status", "user_role", "room_id", "floor", "building"]
+    rows = ([u[k] for k in header] for u in admin_iter_all_users())
+    return csv_response("users.csv", header, rows)
 
 
 # ======================================================
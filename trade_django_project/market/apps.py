@@ -3,3 +3,8 @@ from django.apps import AppConfig
 class MarketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'market'
+
+    def ready(self):
+        from common import image_variants
+
+        image_variants.check_available()
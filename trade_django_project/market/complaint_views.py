@@ -12,6 +12,8 @@ from common.complaint_dao import (
     get_complaints_by_order,
     admin_get_pending_complaints,
     admin_get_complaints,
+    admin_get_complaint_page,
+    admin_iter_complaints,
     admin_mark_processing,
     admin_handle_complaint,
     get_complaint_detail,
@@ -19,6 +21,7 @@ from common.complaint_dao import (
 
 
 from common.order_dao import get_order_detail
+from market.csv_export import csv_response
 
 # ======================================================
 # 1️⃣ 用户提交投诉
@@ -85,19 +88,44 @@ def admin_complaint_list_view(request):
         return redirect("market:index")
 
     status = request.GET.get("status", "待处理")  # 默认只看待处理
-    if status == "全部":
-        complaints = admin_get_complaints(status=None)
-    else:
-        # 兼容：你也可以继续用 admin_get_pending_complaints() 做默认待处理
-        complaints = admin_get_complaints(status=status)
+    # 游标分页，每页一条 LIMIT 查询；导出全部投诉走下面的流式 CSV
+    complaints, next_cursor = admin_get_complaint_page(
+        status=None if status == "全部" else status,
+        cursor=request.GET.get("cursor"),
+        page_size=request.GET.get("page_size"),
+    )
+
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query["cursor"] = next_cursor
+        next_url = f"{request.path}?{query.urlencode()}"
 
     return render(request, "market/admin_complaint_list.html", {
         "complaints": complaints,
         "status": status,
+        "next_url": next_url,
     })
 
 
 
+# ======================================================
+# 5️⃣-2 管理员导出投诉列表（CSV，流式输出）
+# ======================================================
+def admin_export_complaints_view(request):
+    if request.session.get("user_role") != 3:
+        messages.error(request, "无权限")
+        return redirect("market:index")
+
+    status = request.GET.get("status", "全部")
+    header = [
+        "complaint_id", "order_id", "posting_title", "complainant_name",
+        "accused_name", "status", "content", "result", "created_at",
+    ]
+    complaints = admin_iter_complaints(status=None if status == "全部" else status)
+    return csv_response("complaints.csv", header, ([c.get(k) for k in header] for c in complaints))
+
+
 # ======================================================
 # 6️⃣ 管理员处理投诉（写入处理结果）
 # ======================================================
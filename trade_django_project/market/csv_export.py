@@ -0,0 +1,34 @@
+# market/csv_export.py
+# ======================================================
+# 流式 CSV 导出：逐行生成、逐行发送，整个文件不在内存中拼接
+# 行数据通常来自 query_iter（服务端游标），导出大表时内存占用不随行数增长
+# ======================================================
+
+import csv
+
+from django.http import StreamingHttpResponse
+
+
+class _Echo:
+    """csv.writer 的伪文件对象：write 直接返回写入内容"""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, header, rows):
+    """
+    header：列名列表；rows：每行为与 header 对应的值列表（可迭代对象）
+    返回以附件形式下载的 StreamingHttpResponse
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield "\ufeff"  # BOM，Excel 打开中文不乱码
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,32 @@
+# market/debug_views.py
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from common.db import cache_stats, pool_stats
+from common.image_variants import image_variants_stats
+from common.instrument import recent_requests
+from common.search_index import search_index_stats
+from common.tag_suggest import tag_suggest_stats
+from common.view_counter import view_counter_stats
+from common.visibility import visibility_stats
+
+
+# ======================================================
+# SQL 调试接口：最近请求的 SQL 统计 + 连接池 / 查询缓存 / 搜索索引 / 可见集合 / 标签联想 / 图片版本 / 浏览计数状态
+# 仅 DEBUG 模式或管理员可访问
+# ======================================================
+def debug_sql_view(request):
+    if not settings.DEBUG and request.session.get("user_role") != 3:
+        return JsonResponse({"status": "fail", "msg": "无权限"}, status=403)
+
+    return JsonResponse({
+        "requests": recent_requests(),
+        "pool": pool_stats(),
+        "query_cache": cache_stats(),
+        "search_index": search_index_stats(),
+        "visibility": visibility_stats(),
+        "tag_suggest": tag_suggest_stats(),
+        "image_variants": image_variants_stats(),
+        "view_counter": view_counter_stats(),
+    }, json_dumps_params={"ensure_ascii": False, "indent": 2})
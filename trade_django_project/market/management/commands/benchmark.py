@@ -0,0 +1,348 @@
+import heapq
+import random
+import sqlite3
+import time
+import tracemalloc
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common import stats_dao
+from common.db import dict_fetch_all, row_fetch_all
+from common.search_index import SearchIndex
+from common.tag_suggest import TagSuggestIndex
+
+
+# ======================================================
+# 模拟游标：返回固定的行数据，不依赖数据库
+# ======================================================
+class _FakeCursor:
+    def __init__(self, columns, rows):
+        self.description = [(c, None, None, None, None, None, None) for c in columns]
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+_POSTING_COLUMNS = (
+    "posting_id", "title", "content", "price", "quantity", "brand", "condition",
+    "tag_id", "tag_name", "status", "scope", "created_at",
+    "owner_name", "owner_room", "owner_floor", "owner_building",
+)
+
+
+def _fake_posting_rows(n):
+    return [
+        (
+            i, f"二手物品{i}", "成色很好，自提", 10.0 + i % 100, 1 + i % 5, "MI", "几乎全新",
+            1 + i % 4, "生活用品", "上架", "全楼", 1700000000 + i,
+            f"user{i % 500}", 1 + i % 40, 3 + i % 5, "1号楼",
+        )
+        for i in range(n)
+    ]
+
+
+def _measure(fn):
+    """返回 (结果, 耗时秒, 峰值内存字节)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+# ======================================================
+# rows：dict 行 vs Row 行（内存 / 吞吐）
+# ======================================================
+def bench_rows(n=100000):
+    rows = _fake_posting_rows(n)
+    lines = [f"rows: {n} 行 × {len(_POSTING_COLUMNS)} 列"]
+
+    for name, fetch in (("dict", dict_fetch_all), ("Row", row_fetch_all)):
+        result, elapsed, peak = _measure(lambda: fetch(_FakeCursor(_POSTING_COLUMNS, rows)))
+
+        start = time.perf_counter()
+        total = 0
+        for r in result:
+            total += r["quantity"]
+        read = time.perf_counter() - start
+
+        lines.append(
+            f"  {name:<5} 构建 {elapsed * 1000:8.1f} ms  "
+            f"峰值内存 {peak / 1024 / 1024:7.1f} MB  "
+            f"按列名读取 {read * 1000:7.1f} ms"
+        )
+        del result
+
+    return lines
+
+
+# ======================================================
+# 内存 SQLite 模拟数据库：统计往返次数，并按 rtt 模拟网络延迟
+# （SQLite 兼容本项目 SQL 中的反引号、条件聚合 SUM(a=b) 等写法）
+# ======================================================
+class _SqliteDB:
+    def __init__(self, rtt_ms=0.0):
+        self.conn = sqlite3.connect(":memory:")
+        self.rtt = rtt_ms / 1000
+        self.round_trips = 0
+
+    def _execute(self, sql, params):
+        self.round_trips += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+        return self.conn.execute(sql.replace("%s", "?"), list(params or []))
+
+    def query_one(self, sql, params=None, as_dict=False, **kwargs):
+        cursor = self._execute(sql, params)
+        row = cursor.fetchone()
+        if row is None or not as_dict:
+            return row
+        return dict(zip([c[0] for c in cursor.description], row))
+
+
+def _synthetic_trade_db(n, rtt_ms):
+    """n 个帖子，约 n 个订单、n/10 条投诉、n/20 个用户"""
+    db = _SqliteDB(rtt_ms)
+    rnd = random.Random(42)
+    users = max(n // 20, 10)
+
+    c = db.conn
+    c.execute("CREATE TABLE user (user_id INTEGER PRIMARY KEY, room_id INT)")
+    c.execute("CREATE TABLE posting (posting_id INTEGER PRIMARY KEY, owner_id INT, status TEXT)")
+    c.execute("CREATE TABLE `order` (order_id INTEGER PRIMARY KEY, buyer_id INT, seller_id INT, status TEXT)")
+    c.execute("CREATE TABLE complaint (complaint_id INTEGER PRIMARY KEY, accused_id INT, status TEXT)")
+    c.execute("CREATE INDEX idx_owner ON posting(owner_id)")
+    c.execute("CREATE INDEX idx_buyer ON `order`(buyer_id)")
+    c.execute("CREATE INDEX idx_seller ON `order`(seller_id)")
+    c.execute("CREATE INDEX idx_accused ON complaint(accused_id)")
+
+    c.executemany("INSERT INTO user VALUES (?, ?)", [(i, i % 40) for i in range(1, users + 1)])
+    c.executemany("INSERT INTO posting VALUES (?, ?, ?)", [
+        (i, rnd.randint(1, users), rnd.choice(["上架", "上架", "下架", "已约满"])) for i in range(1, n + 1)
+    ])
+    c.executemany("INSERT INTO `order` VALUES (?, ?, ?, ?)", [
+        (i, rnd.randint(1, users), rnd.randint(1, users), rnd.choice(["待交接", "已交接", "完成", "取消"]))
+        for i in range(1, n + 1)
+    ])
+    c.executemany("INSERT INTO complaint VALUES (?, ?, ?)", [
+        (i, rnd.randint(1, users), rnd.choice(["待处理", "处理中", "已处理", "驳回"])) for i in range(1, n // 10 + 1)
+    ])
+    c.commit()
+    return db
+
+
+# 重构前的写法：每个指标一次 COUNT(*)（用于对比）
+_LEGACY_OVERVIEW_SQL = [
+    ("SELECT COUNT(*) FROM user", []),
+    ("SELECT COUNT(*) FROM posting WHERE status='上架'", []),
+    ("SELECT COUNT(*) FROM `order` WHERE status='完成'", []),
+    ("SELECT COUNT(*) FROM `order` WHERE status='取消'", []),
+    ("SELECT COUNT(*) FROM complaint", []),
+    ("SELECT COUNT(*) FROM complaint WHERE status='已处理'", []),
+]
+
+_LEGACY_USER_SQL = [
+    ("SELECT COUNT(*) FROM posting WHERE owner_id=%s", 1),
+    ("SELECT COUNT(*) FROM `order` WHERE seller_id=%s AND status='完成'", 1),
+    ("SELECT COUNT(*) FROM `order` WHERE buyer_id=%s AND status='完成'", 1),
+    ("SELECT COUNT(*) FROM `order` WHERE buyer_id=%s OR seller_id=%s", 2),
+    ("SELECT COUNT(*) FROM complaint WHERE accused_id=%s", 1),
+    ("SELECT COUNT(*) FROM complaint WHERE accused_id=%s AND status='已处理'", 1),
+]
+
+
+def bench_stats(n=100000, rtt=20.0, repeat=5):
+    db = _synthetic_trade_db(n, rtt)
+    lines = [f"stats: 帖子/订单 {n} 行，模拟往返延迟 {rtt} ms，每项执行 {repeat} 次"]
+
+    def run(label, fn):
+        db.round_trips = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        elapsed = (time.perf_counter() - start) / repeat
+        lines.append(f"  {label:<28} 往返 {db.round_trips // repeat:2d} 次/调用  耗时 {elapsed * 1000:8.1f} ms/调用")
+
+    user_id = 7
+    with mock.patch.object(stats_dao, "query_one", db.query_one):
+        run("overview 旧（6 次 COUNT）", lambda: [db.query_one(sql, p) for sql, p in _LEGACY_OVERVIEW_SQL])
+        run("overview 新（单次聚合）", stats_dao.get_system_overview_stats)
+        run("user 旧（6 次 COUNT）", lambda: [db.query_one(sql, [user_id] * k) for sql, k in _LEGACY_USER_SQL])
+        run("user 新（单次聚合）", lambda: stats_dao.get_user_stats(user_id))
+
+        # 校验新旧结果一致
+        legacy = [db.query_one(sql, p)[0] for sql, p in _LEGACY_OVERVIEW_SQL]
+        overview = stats_dao.get_system_overview_stats()
+        assert legacy == [overview[k] for k in (
+            "user_count", "posting_count", "order_completed", "order_canceled",
+            "complaint_count", "complaint_resolved",
+        )]
+        legacy = [db.query_one(sql, [user_id] * k)[0] for sql, k in _LEGACY_USER_SQL]
+        user = stats_dao.get_user_stats(user_id)
+        assert legacy == [user[k] for k in (
+            "posting_count", "seller_orders_completed", "buyer_orders_completed",
+            "total_orders", "complaint_received", "complaint_resolved",
+        )]
+
+    lines.append("  新旧结果一致")
+    return lines
+
+
+# ======================================================
+# tags：标签联想，后缀 trie vs SQL LIKE '%q%'
+# ======================================================
+_TAG_CHARS = "书本笔记电脑手机耳机台灯衣服鞋包球拍吉他键盘鼠标显示器充电宝水杯雨伞自行车滑板相机零食教材"
+
+_TAG_SUGGEST_SQL = "SELECT tag_id, tag_name FROM tag WHERE tag_name LIKE %s ORDER BY ref_count DESC LIMIT 10"
+
+
+def bench_tags(n=5000, queries=500):
+    rnd = random.Random(42)
+    db = _SqliteDB()
+    db.conn.execute("CREATE TABLE tag (tag_id INTEGER PRIMARY KEY, tag_name TEXT UNIQUE, ref_count INT)")
+
+    names = set()
+    while len(names) < n:
+        name = "".join(rnd.choice(_TAG_CHARS) for _ in range(rnd.randint(2, 6)))
+        if rnd.random() < 0.2:
+            name += rnd.choice(["pro", "max", "mini", "2024", "ipad"])
+        names.add(name)
+    rows = [(i, name, rnd.randint(0, 1000)) for i, name in enumerate(sorted(names), 1)]
+    db.conn.executemany("INSERT INTO tag VALUES (?, ?, ?)", rows)
+
+    # 模拟用户输入：取标签名中的 1~3 个连续字符
+    samples = []
+    for _ in range(queries):
+        name = rnd.choice(rows)[1]
+        start = rnd.randrange(len(name))
+        samples.append(name[start:start + rnd.randint(1, 3)])
+
+    lines = [f"tags: {n} 个标签，{queries} 次查询"]
+
+    start = time.perf_counter()
+    index = TagSuggestIndex(top_k=10)
+    index.load([{"tag_id": i, "tag_name": name, "ref_count": ref} for i, name, ref in rows])
+    lines.append(f"  trie 构建 {(time.perf_counter() - start) * 1000:8.1f} ms  {index.stats()['nodes']} 个节点")
+
+    ref_counts = {i: ref for i, _, ref in rows}
+
+    def run(label, fn):
+        results = []
+        start = time.perf_counter()
+        for q in samples:
+            results.append(fn(q))
+        elapsed = (time.perf_counter() - start) / queries
+        lines.append(f"  {label:<12} {elapsed * 1e6:10.1f} µs/次")
+        # 同分标签顺序可能不同，只比较 ref_count 序列
+        return [[ref_counts[t["tag_id"] if isinstance(t, dict) else t[0]] for t in r] for r in results]
+
+    sql_results = run("SQL LIKE", lambda q: db._execute(_TAG_SUGGEST_SQL, [f"%{q}%"]).fetchall())
+    trie_results = run("后缀 trie", lambda q: index.suggest(q, 10))
+    assert sql_results == trie_results
+
+    lines.append("  两种方式结果一致")
+    return lines
+
+
+# ======================================================
+# rank：相关度排序，堆取前 k vs 全量排序
+# ======================================================
+_RANK_WORDS = [
+    "二手", "全新", "手机", "耳机", "台灯", "键盘", "鼠标", "显示器", "教材", "高数", "英语", "自行车",
+    "充电宝", "水杯", "雨伞", "吉他", "球拍", "衣柜", "收纳", "考研", "资料", "笔记", "电脑", "平板",
+]
+_RANK_BRANDS = ["apple", "xiaomi", "huawei", "lenovo", "sony", "dell", "logitech", None]
+_RANK_TAGS = ["数码", "书籍", "生活用品", "运动", "乐器", "服饰"]
+
+
+def bench_rank(n=100000, queries=200, k=20):
+    rnd = random.Random(42)
+    now = time.time()
+    index = SearchIndex()
+
+    start = time.perf_counter()
+    for i in range(1, n + 1):
+        index.add(i, {
+            "title": "".join(rnd.sample(_RANK_WORDS, 3)),
+            "content": "，".join(rnd.sample(_RANK_WORDS, 6)),
+            "brand": rnd.choice(_RANK_BRANDS),
+            "tag_name": rnd.choice(_RANK_TAGS),
+        }, now - rnd.random() * 180 * 86400)
+    build = time.perf_counter() - start
+
+    samples = [rnd.choice([rnd.choice(_RANK_WORDS), " ".join(rnd.sample(_RANK_WORDS, 2)), rnd.choice(_RANK_BRANDS[:-1])])
+               for _ in range(queries)]
+
+    lines = [f"rank: {n} 个帖子，{queries} 次查询，取前 {k} 个", f"  建索引 {build:8.2f} s  {index.stats()}"]
+
+    matched = 0
+    score_time = full_time = heap_time = 0.0
+    for q in samples:
+        t0 = time.perf_counter()
+        scores = index.score(q)
+        t1 = time.perf_counter()
+        full = sorted(scores, key=scores.__getitem__, reverse=True)[:k]
+        t2 = time.perf_counter()
+        top = heapq.nlargest(k, scores, key=scores.__getitem__)
+        t3 = time.perf_counter()
+
+        assert [scores[i] for i in full] == [scores[i] for i in top]
+        matched += len(scores)
+        score_time += t1 - t0
+        full_time += t2 - t1
+        heap_time += t3 - t2
+
+    lines.append(f"  平均命中 {matched // queries} 个帖子")
+    lines.append(f"  打分（BM25 × 时间衰减） {score_time / queries * 1000:8.2f} ms/次")
+    lines.append(f"  全量排序取前 {k:<3}        {full_time / queries * 1000:8.2f} ms/次")
+    lines.append(f"  堆取前 {k:<3}              {heap_time / queries * 1000:8.2f} ms/次")
+    lines.append("  两种方式前 k 个得分一致")
+    return lines
+
+
+BENCHMARKS = {
+    "rows": bench_rows,
+    "stats": bench_stats,
+    "tags": bench_tags,
+    "rank": bench_rank,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run micro benchmarks for the data access layer "
+        "(e.g. `benchmark rows --size 100000`, `benchmark stats --rtt 20`, `benchmark tags --size 5000`, `benchmark rank`)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("target", choices=sorted(BENCHMARKS))
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=None,
+            help="Number of synthetic rows (default: 100000 for rows/stats/rank, 5000 for tags)",
+        )
+        parser.add_argument(
+            "--rtt",
+            type=float,
+            default=20.0,
+            help="Simulated database round-trip latency in ms for the stats benchmark (default: 20)",
+        )
+
+    def handle(self, *args, **kwargs):
+        size = kwargs["size"]
+        if size is not None and size <= 0:
+            raise CommandError("--size must be positive")
+
+        target = kwargs["target"]
+        options = {} if size is None else {"n": size}
+        if target == "stats":
+            options["rtt"] = kwargs["rtt"]
+        lines = BENCHMARKS[target](**options)
+
+        for line in lines:
+            self.stdout.write(line)
@@ -0,0 +1,366 @@
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from common import complaint_dao, notice_dao, order_dao, posting_dao, search_dao, stats_dao, tag_dao, user_dao
+from common.instrument import capture_queries
+from common.search_index import get_search_index
+from common.tag_suggest import get_tag_suggest_index
+from common.visibility import get_visibility_index
+
+
+# ======================================================
+# 查询计划检查：在临时库中导入 schema.sql + 大量模拟数据，
+# 调用每个 DAO 读函数，收集其 SQL（common.instrument.capture_queries），
+# 逐条 EXPLAIN，记录访问类型 / 使用的索引 / 预估行数，
+# 出现超过阈值的全表扫描 / 全索引扫描 / filesort 时失败；
+# 搜索的 keyset 排序没有按对应的复合索引读取（见 _KEYSET_INDEXES）时也失败
+#
+# 用法（需要一个单独的空库，会删表重建）：
+#   TRADE_EXPLAIN_DB=trade_explain python manage.py explain_plans --load --yes
+#   TRADE_EXPLAIN_DB=trade_explain python manage.py explain_plans          # 复用已导入的数据
+# ======================================================
+
+BUILDINGS = ["1号楼", "2号楼", "3号楼", "4号楼"]
+FLOORS = 10
+ROOMS_PER_FLOOR = 10
+
+_WORDS = ["二手", "全新", "手机", "耳机", "台灯", "键盘", "鼠标", "教材", "高数", "自行车", "充电宝", "水杯", "雨伞", "吉他"]
+
+
+def _load_schema(cursor, path):
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    for stmt in content.split(";"):
+        if stmt.strip():
+            cursor.execute(stmt)
+
+
+def _insert(cursor, table, columns, rows, chunk_size=1000):
+    sql = f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    for i in range(0, len(rows), chunk_size):
+        cursor.executemany(sql, rows[i:i + chunk_size])
+
+
+def _load_data(cursor, postings):
+    """按帖子数生成其余各表的数据量，保证各表比例接近真实使用"""
+    rnd = random.Random(42)
+    now = datetime.now()
+
+    def ago(days):
+        return now - timedelta(seconds=rnd.randint(0, days * 86400))
+
+    rooms = [
+        (b, f, f"{f}{r:02d}")
+        for b in BUILDINGS for f in range(1, FLOORS + 1) for r in range(1, ROOMS_PER_FLOOR + 1)
+    ]
+    _insert(cursor, "room", ["building", "floor", "room_no"], rooms)
+    room_count = len(rooms)
+
+    users = max(postings // 10, 100)
+    _insert(cursor, "user", ["username", "password", "email", "wechat", "student_id", "user_role", "room_id"], [
+        (f"user{i}", "x", f"user{i}@example.com", f"wx{i}", f"S{i:08d}", 3 if i == 1 else 1, rnd.randint(1, room_count))
+        for i in range(1, users + 1)
+    ])
+
+    tags = 200
+    _insert(cursor, "tag", ["tag_name", "ref_count"], [(f"标签{i}", rnd.randint(0, 500)) for i in range(1, tags + 1)])
+
+    _insert(cursor, "posting", [
+        "title", "content", "price", "quantity", "brand", "condition", "tag_id", "status", "scope", "owner_id", "created_at",
+    ], [
+        (
+            "".join(rnd.sample(_WORDS, 3)), "，".join(rnd.sample(_WORDS, 6)),
+            round(rnd.uniform(1, 2000), 2), rnd.randint(1, 5), rnd.choice(["apple", "xiaomi", None]),
+            rnd.choice(["全新", "几乎全新", "轻微使用痕迹"]), rnd.randint(1, tags),
+            rnd.choice(["上架", "上架", "上架", "下架", "已约满"]), rnd.choice(["全楼", "全楼", "楼栋", "楼层", "寝室"]),
+            rnd.randint(1, users), ago(365),
+        )
+        for _ in range(postings)
+    ])
+
+    _insert(cursor, "favorite", ["user_id", "posting_id"], list({
+        (rnd.randint(1, users), rnd.randint(1, postings)) for _ in range(postings)
+    }))
+
+    orders = postings // 2
+    order_rows = []
+    for _ in range(orders):
+        buyer, seller = rnd.sample(range(1, users + 1), 2)
+        order_rows.append((rnd.randint(1, postings), buyer, seller, 1,
+                           rnd.choice(["待交接", "已交接", "完成", "取消"]), ago(365)))
+    _insert(cursor, "order", ["posting_id", "buyer_id", "seller_id", "num", "status", "created_at"], order_rows)
+
+    _insert(cursor, "notice", ["type", "content", "receiver_id", "related_order_id", "status", "created_at"], [
+        (rnd.choice(["系统", "交接提醒", "公告"]), "通知内容", rnd.randint(1, users),
+         rnd.randint(1, orders), rnd.choice(["未读", "已读"]), ago(180))
+        for _ in range(postings)
+    ])
+
+    _insert(cursor, "complaint", ["order_id", "complainant_id", "accused_id", "content", "status", "created_at"], [
+        (rnd.randint(1, orders), rnd.randint(1, users), rnd.randint(1, users), "投诉内容",
+         rnd.choice(["待处理", "已处理", "驳回", "处理中"]), ago(180))
+        for _ in range(postings // 20)
+    ])
+
+    _insert(cursor, "image", ["posting_id", "uploader_id", "path", "category"], [
+        (rnd.randint(1, postings), rnd.randint(1, users), f"postings/{i}.jpg", "cover")
+        for i in range(postings // 2)
+    ])
+
+    for table in ("room", "user", "tag", "posting", "favorite", "order", "notice", "complaint", "image"):
+        cursor.execute(f"ANALYZE TABLE `{table}`")
+        cursor.fetchall()
+
+
+# ======================================================
+# 每个 DAO 读函数的代表性调用（id 都取 1：模拟数据中一定存在）
+# ======================================================
+def _dao_calls():
+    return [
+        ("posting_dao.get_posting_list", lambda: posting_dao.get_posting_list()),
+        ("posting_dao.get_posting_list(limit)", lambda: posting_dao.get_posting_list(limit=10)),
+        ("posting_dao.get_posting_page", lambda: posting_dao.get_posting_page(
+            posting_dao.get_posting_page()[1])),
+        ("posting_dao.iter_posting_list", lambda: list(posting_dao.iter_posting_list())),
+        ("posting_dao.get_my_postings", lambda: posting_dao.get_my_postings(1)),
+        ("posting_dao.get_posting_detail", lambda: posting_dao.get_posting_detail(1)),
+        ("posting_dao.get_posting_images", lambda: posting_dao.get_posting_images(1)),
+        ("posting_dao.get_user_favorites", lambda: posting_dao.get_user_favorites(1)),
+        ("posting_dao.is_favorite", lambda: posting_dao.is_favorite(1, 1)),
+        ("posting_dao.get_favorite_ids", lambda: posting_dao.get_favorite_ids(1, range(1, 21))),
+        ("posting_dao.get_images_by_postings", lambda: posting_dao.get_images_by_postings(range(1, 21))),
+        ("posting_dao.get_posting_counters", lambda: posting_dao.get_posting_counters(range(1, 21))),
+        ("posting_dao.count_media_refs", lambda: posting_dao.count_media_refs("/media/postings/1.jpg")),
+
+        ("search_dao.search_postings", lambda: search_dao.search_postings("", None, "全部", 1)),
+        ("search_dao.search_postings(keyword)", lambda: search_dao.search_postings("手机", None, "全部", 1)),
+        ("search_dao.search_postings(tag)", lambda: search_dao.search_postings("", 1, "全部", 1)),
+        ("search_dao.search_postings(scope)", lambda: search_dao.search_postings("", None, "楼层", 1)),
+        ("search_dao.search_postings(price)", lambda: search_dao.search_postings(
+            "", None, "全部", 1, sort="price_asc", min_price=10, max_price=100)),
+        ("search_dao.search_postings(price_desc)", lambda: search_dao.search_postings("", None, "全部", 1, sort="price_desc")),
+        ("search_dao.search_postings(latest, page 2)", lambda: search_dao.search_postings(
+            "", None, "全部", 1, cursor=search_dao.search_postings("", None, "全部", 1)[1])),
+        ("search_dao.search_postings(price_asc, page 2)", lambda: search_dao.search_postings(
+            "", None, "全部", 1, sort="price_asc",
+            cursor=search_dao.search_postings("", None, "全部", 1, sort="price_asc")[1])),
+        ("search_dao.search_postings(price_desc, page 2)", lambda: search_dao.search_postings(
+            "", None, "全部", 1, sort="price_desc",
+            cursor=search_dao.search_postings("", None, "全部", 1, sort="price_desc")[1])),
+        ("search_dao.search_postings(relevance)", lambda: search_dao.search_postings("手机", None, "全部", 1, sort="relevance")),
+        ("search_dao.search_postings(facets)", lambda: search_dao.search_postings("", None, "全部", 1, facets=True)),
+        ("search_dao.search_by_tag", lambda: search_dao.search_by_tag(1, 1)),
+        ("search_dao.search_by_tag(page 2)", lambda: search_dao.search_by_tag(
+            1, 1, cursor=search_dao.search_by_tag(1, 1)[1])),
+        ("search_dao.search_tags_fuzzy_sql", lambda: search_dao.search_tags_fuzzy_sql("标签1")),
+        ("search_dao.get_all_tags", lambda: search_dao.get_all_tags()),
+        ("tag_dao.get_all_tags", lambda: tag_dao.get_all_tags()),
+
+        ("complaint_dao.get_my_complaints", lambda: complaint_dao.get_my_complaints(1)),
+        ("complaint_dao.get_complaints_by_order", lambda: complaint_dao.get_complaints_by_order(1)),
+        ("complaint_dao.get_complaint_detail", lambda: complaint_dao.get_complaint_detail(1)),
+        ("complaint_dao.admin_get_pending_complaints", lambda: complaint_dao.admin_get_pending_complaints()),
+        ("complaint_dao.admin_get_complaints", lambda: complaint_dao.admin_get_complaints()),
+        ("complaint_dao.admin_get_complaints(status)", lambda: complaint_dao.admin_get_complaints(complaint_dao.STATUS_PENDING)),
+        ("complaint_dao.admin_get_complaint_page(status)", lambda: complaint_dao.admin_get_complaint_page(
+            complaint_dao.STATUS_PENDING, cursor="1000000")),
+
+        ("notice_dao.get_user_notices", lambda: notice_dao.get_user_notices(1)),
+        ("notice_dao.get_unread_notices", lambda: notice_dao.get_unread_notices(1)),
+        ("notice_dao.get_announcements", lambda: notice_dao.get_announcements()),
+        ("notice_dao.get_announcements(limit)", lambda: notice_dao.get_announcements(limit=5)),
+        ("notice_dao.get_announcement_detail", lambda: notice_dao.get_announcement_detail(1)),
+
+        ("order_dao.get_buyer_orders", lambda: order_dao.get_buyer_orders(1)),
+        ("order_dao.get_seller_orders", lambda: order_dao.get_seller_orders(1)),
+        ("order_dao.get_order_detail", lambda: order_dao.get_order_detail(1)),
+
+        ("stats_dao.get_system_overview_stats", lambda: stats_dao.get_system_overview_stats()),
+        ("stats_dao.get_user_stats", lambda: stats_dao.get_user_stats(1)),
+        ("stats_dao.get_room_stats", lambda: stats_dao.get_room_stats(1)),
+        ("stats_dao.get_floor_stats", lambda: stats_dao.get_floor_stats(1)),
+        ("stats_dao.get_building_stats", lambda: stats_dao.get_building_stats(BUILDINGS[0])),
+        ("stats_dao.get_monthly_order_stats", lambda: stats_dao.get_monthly_order_stats()),
+
+        ("user_dao.check_user_exists", lambda: user_dao.check_user_exists("user1@example.com", "S00000001", "user1")),
+        ("user_dao.get_user_by_student_id", lambda: user_dao.get_user_by_student_id("S00000001")),
+        ("user_dao.get_user_by_id", lambda: user_dao.get_user_by_id(1)),
+        ("user_dao.get_room_list", lambda: user_dao.get_room_list()),
+        ("user_dao.admin_get_all_users", lambda: user_dao.admin_get_all_users()),
+        ("user_dao.admin_get_user_page", lambda: user_dao.admin_get_user_page(cursor="1")),
+    ]
+
+
+def _explain(cursor, sql, params):
+    cursor.execute("EXPLAIN " + sql, params or [])
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _problem(plan, max_rows):
+    """返回该 EXPLAIN 行的问题描述；没有问题返回 None"""
+    rows = plan.get("rows") or 0
+    if rows < max_rows:
+        return None
+    # Extra 形如 "Using where; Using index"；按项比较，避免 "Using index condition" 被当成覆盖索引
+    extra = {item.strip() for item in (plan.get("Extra") or "").split(";")}
+    if plan.get("type") == "ALL":
+        return "全表扫描"
+    if plan.get("type") == "index" and "Using index" not in extra:
+        return "全索引扫描"
+    if "Using filesort" in extra:
+        return "filesort"
+    return None
+
+
+# keyset 分页（search_dao._KEYSET_ORDERS）必须按复合索引顺序读取 posting，不论预估行数：
+# DAO 调用名 → posting（别名 p）应使用的索引；用错索引或出现 filesort 即失败
+_KEYSET_INDEXES = {
+    "search_dao.search_postings": "idx_status_created",
+    "search_dao.search_postings(scope)": "idx_status_created",
+    "search_dao.search_postings(latest, page 2)": "idx_status_created",
+    "search_dao.search_postings(tag)": "idx_status_tag_created",
+    "search_dao.search_postings(price)": "idx_status_price",
+    "search_dao.search_postings(price_desc)": "idx_status_price",
+    "search_dao.search_postings(price_asc, page 2)": "idx_status_price",
+    "search_dao.search_postings(price_desc, page 2)": "idx_status_price",
+    "search_dao.search_by_tag": "idx_status_tag_created",
+    "search_dao.search_by_tag(page 2)": "idx_status_tag_created",
+}
+
+
+def _keyset_problem(name, plan):
+    expected = _KEYSET_INDEXES.get(name)
+    if expected is None or plan.get("table") != "p":
+        return None
+    if plan.get("key") != expected:
+        return f"keyset 排序未使用 {expected}"
+    if "Using filesort" in (plan.get("Extra") or ""):
+        return "keyset 排序 filesort"
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Load schema.sql plus synthetic data into a scratch database, EXPLAIN the SQL issued by every DAO read "
+        "function and fail when a plan has a full scan or filesort above --max-rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="explain",
+            help="Scratch database alias (default: explain; enabled by the TRADE_EXPLAIN_DB environment variable)",
+        )
+        parser.add_argument("--load", action="store_true", help="Drop and recreate all tables, then load synthetic data")
+        parser.add_argument("--yes", action="store_true", help="Confirm that --load may drop tables in the scratch database")
+        parser.add_argument("--postings", type=int, default=50000, help="Number of synthetic postings (default: 50000)")
+        parser.add_argument("--path", default="sql", help="Directory containing schema.sql (default: sql/)")
+        parser.add_argument(
+            "--max-rows",
+            type=int,
+            default=1000,
+            help="Estimated rows above which a full scan / filesort counts as a regression (default: 1000)",
+        )
+        parser.add_argument("--report", help="Write the collected plans as JSON to this file")
+
+    def handle(self, *args, **kwargs):
+        alias = kwargs["database"]
+        if alias not in settings.DATABASES:
+            raise CommandError(f"Database alias '{alias}' is not configured (set TRADE_EXPLAIN_DB=<scratch db name>)")
+        if alias == "default" or settings.DATABASES[alias].get("NAME") == settings.DATABASES["default"].get("NAME"):
+            raise CommandError("Refusing to run against the default database; use a separate scratch database")
+
+        connection = connections[alias]
+        if connection.vendor != "mysql":
+            raise CommandError("EXPLAIN checks require a MySQL database")
+
+        if kwargs["load"]:
+            if not kwargs["yes"]:
+                raise CommandError(f"--load drops every table in '{connection.settings_dict['NAME']}'; add --yes to confirm")
+            self.stdout.write(self.style.WARNING(f"Loading schema and {kwargs['postings']} postings into '{alias}' ..."))
+            with connection.cursor() as cursor:
+                _load_schema(cursor, os.path.join(kwargs["path"], "schema.sql"))
+                _load_data(cursor, kwargs["postings"])
+
+        # 读操作全部走临时库；关闭结果缓存，保证每次调用都真正发出 SQL
+        overrides = {
+            "DB_READ_ALIAS": alias,
+            "QUERY_CACHE": dict(getattr(settings, "QUERY_CACHE", {}), ENABLED=False),
+            "SEARCH_CACHE": dict(getattr(settings, "SEARCH_CACHE", {}), ENABLED=False),
+        }
+        with override_settings(**overrides):
+            # 进程内索引的全量构建本来就是整表读取，先建好，不计入检查
+            get_search_index()
+            get_visibility_index()
+            get_tag_suggest_index()
+            report = self._check(connection, kwargs["max_rows"])
+
+        if kwargs["report"]:
+            with open(kwargs["report"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+
+        problems = [q for q in report if q["problems"] or q.get("error")]
+        self.stdout.write(f"{len(report)} queries checked, {len(problems)} with problems")
+        if problems:
+            raise CommandError(f"{len(problems)} queries regressed (see output above)")
+        self.stdout.write(self.style.SUCCESS("All query plans OK"))
+
+    def _check(self, connection, max_rows):
+        report = []
+        for name, call in _dao_calls():
+            try:
+                with capture_queries() as queries:
+                    call()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"{name}: call failed: {e}"))
+                report.append({"dao": name, "sql": None, "plans": [], "problems": [], "error": str(e)})
+                continue
+
+            for q in queries:
+                if q["kind"] != "query":
+                    continue
+                self.stdout.write(f"{name}  ({q['caller']})")
+                try:
+                    with connection.cursor() as cursor:
+                        plans = _explain(cursor, q["sql"], q["params"])
+                except Exception as e:
+                    # 一条 SQL 无法 EXPLAIN 不影响检查其余查询
+                    self.stdout.write(self.style.ERROR(f"    EXPLAIN failed: {e}"))
+                    report.append({
+                        "dao": name, "caller": q["caller"], "sql": " ".join(q["sql"].split()),
+                        "plans": [], "problems": [], "error": str(e),
+                    })
+                    continue
+
+                problems = []
+                for plan in plans:
+                    problem = _problem(plan, max_rows) or _keyset_problem(name, plan)
+                    line = (
+                        f"    {str(plan.get('table')):<14} type={str(plan.get('type')):<7} "
+                        f"key={str(plan.get('key')):<24} rows={str(plan.get('rows')):<8} {plan.get('Extra') or ''}"
+                    )
+                    if problem:
+                        problems.append(f"{plan.get('table')}: {problem} (rows={plan.get('rows')})")
+                        self.stdout.write(self.style.ERROR(f"{line}  ← {problem}"))
+                    else:
+                        self.stdout.write(line)
+
+                report.append({
+                    "dao": name,
+                    "caller": q["caller"],
+                    "sql": " ".join(q["sql"].split()),
+                    "plans": [
+                        {k: plan.get(k) for k in ("id", "select_type", "table", "type", "key", "rows", "filtered", "Extra")}
+                        for plan in plans
+                    ],
+                    "problems": problems,
+                })
+        return report
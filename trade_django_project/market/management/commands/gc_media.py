@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from common import media_store
+from common.posting_dao import get_media_refs
+
+
+# ======================================================
+# 回收不再被引用的内容寻址图片（common/media_store.py）
+# 删除图片记录时已即时回收；这里兜底保护期内未能删除的、以及其他途径遗留的文件
+#   python manage.py gc_media --dry-run
+# ======================================================
+class Command(BaseCommand):
+    help = "Delete content-addressed media files that are no longer referenced by image.path or posting.image_url."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prefix", default="postings", help="Directory under MEDIA_ROOT to scan (default: postings)")
+        parser.add_argument("--dry-run", action="store_true", help="Only list unreferenced files")
+
+    def handle(self, *args, **kwargs):
+        prefix = kwargs["prefix"]
+        refs = get_media_refs(media_store.url(prefix + "/"))
+
+        scanned = removed = kept = 0
+        for name in media_store.iter_stored(prefix):
+            scanned += 1
+            if media_store.url(name) in refs:
+                continue
+            if kwargs["dry_run"]:
+                self.stdout.write(f"unreferenced: {name}")
+            elif media_store.remove(name):
+                removed += 1
+            else:
+                kept += 1   # 保护期内
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{scanned} files scanned, {len(refs)} referenced URLs, {removed} removed, {kept} kept (grace period)"
+        ))
@@ -0,0 +1,51 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common import posting_import
+
+
+# ======================================================
+# 批量导入帖子（CSV / JSONL），字段说明见 common/posting_import.py
+#   python manage.py import_postings postings.csv --owner-id 1 --create-tags
+#   python manage.py import_postings postings.jsonl --chunk-size 500
+# 出错的行不影响其他行，结束时逐行列出错误
+# ======================================================
+class Command(BaseCommand):
+    help = "Bulk import postings (with tags and images) from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV (header row required) or JSONL file, UTF-8")
+        parser.add_argument("--format", choices=posting_import.FORMATS, help="Default: from the file extension")
+        parser.add_argument("--owner-id", type=int, help="owner_id for rows that do not specify one")
+        parser.add_argument("--create-tags", action="store_true", help="Create tags that do not exist yet")
+        parser.add_argument("--chunk-size", type=int, default=posting_import.DEFAULT_CHUNK_SIZE,
+                            help=f"Rows per transaction (default: {posting_import.DEFAULT_CHUNK_SIZE})")
+
+    def handle(self, *args, **kwargs):
+        path = kwargs["path"]
+        fmt = kwargs["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt not in posting_import.FORMATS:
+            raise CommandError("Cannot infer the format from the extension; pass --format csv|jsonl")
+        if kwargs["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as f:
+                report = posting_import.import_postings(
+                    posting_import.read_rows(f, fmt),
+                    default_owner_id=kwargs["owner_id"],
+                    create_tags=kwargs["create_tags"],
+                    chunk_size=kwargs["chunk_size"],
+                )
+        except (OSError, posting_import.FileError) as e:
+            raise CommandError(str(e))
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+
+        style = self.style.SUCCESS if not report["failed"] else self.style.WARNING
+        self.stdout.write(style(
+            f"{report['total']} rows, {report['imported']} imported, {report['failed']} failed "
+            f"in {report['seconds']}s ({report['rows_per_second'] or 0} rows/s)"
+        ))
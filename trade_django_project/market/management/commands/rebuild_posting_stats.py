@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from common.posting_dao import rebuild_posting_stats
+
+
+# ======================================================
+# 按 favorite / order 明细重算 posting_stats 中的收藏数、订单数
+# 用于：导入了未经触发器的历史 / 样例数据，或触发器安装之前已有的数据
+# ======================================================
+class Command(BaseCommand):
+    help = "Recompute posting_stats.favorite_count / order_count from the favorite and order tables."
+
+    def handle(self, *args, **kwargs):
+        rebuild_posting_stats()
+        self.stdout.write(self.style.SUCCESS("posting_stats rebuilt"))
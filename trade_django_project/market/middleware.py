@@ -0,0 +1,78 @@
+# market/middleware.py
+
+import math
+import time
+
+from django.conf import settings
+
+from common.db import primary_pinned_until, set_primary_pinned_until
+from common.instrument import start_request, finish_request
+
+
+# ======================================================
+# SQL 统计中间件：统计每个请求执行的 SQL，写入响应头
+#   X-SQL-Queries: count=6; time=35.2ms; rows=6
+#   Server-Timing: sql;dur=35.2;desc="6 queries"（浏览器开发者工具可直接查看）
+# 明细见调试接口 /debug/sql/
+# ======================================================
+class SQLInstrumentMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = start_request(f"{request.method} {request.path}")
+        try:
+            response = self.get_response(request)
+        finally:
+            stats = finish_request(token)
+
+        if stats is not None:
+            response["X-SQL-Queries"] = stats.header_value()
+            response["Server-Timing"] = f'sql;dur={stats.total_ms:.1f};desc="{stats.count} queries"'
+        return response
+
+
+# ======================================================
+# 读写分离粘滞中间件
+# 用户刚写过数据库时，之后几秒内该用户的读请求仍走主库，
+# 例如发帖后跳转到列表页时能立刻看到自己的帖子
+# 截止时间存在短期 cookie 中（有效期即粘滞秒数），不写 session：
+# 匿名请求不会因此每次写库都新建 / 保存一条 session 记录
+# ======================================================
+COOKIE_NAME = "db_primary_until"
+
+
+def _sticky_seconds():
+    return getattr(settings, "DB_STICKY_SECONDS", 5)
+
+
+class PrimaryStickyMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # 未配置只读库时读写都走主库，不需要粘滞
+        if not getattr(settings, "DB_READ_ALIAS", None):
+            return self.get_response(request)
+
+        restored = self._restore(request)
+        set_primary_pinned_until(restored)
+
+        response = self.get_response(request)
+
+        until = primary_pinned_until()
+        if until > restored:
+            response.set_cookie(
+                COOKIE_NAME, f"{until:.3f}",
+                max_age=math.ceil(until - time.time()), httponly=True, samesite="Lax",
+            )
+        return response
+
+    @staticmethod
+    def _restore(request):
+        try:
+            until = float(request.COOKIES.get(COOKIE_NAME, 0))
+        except ValueError:
+            return 0.0
+        # cookie 由客户端保存：最多粘滞 DB_STICKY_SECONDS 秒，伪造的大值不会一直占用主库
+        return min(until, time.time() + _sticky_seconds())
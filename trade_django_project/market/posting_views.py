@@ -1,21 +1,26 @@
 # market/posting_views.py
+import hashlib
+import io
 import os
-import uuid
-from django.conf import settings
-from django.core.files.storage import FileSystemStorage
 
 
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.contrib import messages
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from common import image_variants, media_store, posting_import, view_counter
+from market.uploads import StoredImage, use_image_upload
 from common.tag_dao import get_all_tags
 from common.posting_dao import is_favorite
+from common.search_dao import DEFAULT_PAGE_SIZE
 
 # DAO 接口（后续在 posting_dao.py 中实现）
 from common.posting_dao import (
     get_my_postings,
     get_posting_list,
+    get_posting_page,
     get_posting_detail,
     create_posting,
     update_posting,
@@ -25,7 +30,8 @@ from common.posting_dao import (
     change_scope,
     add_favorite,
     remove_favorite,
-    get_user_favorites
+    get_user_favorites,
+    annotate_postings,
 )
 
 # =========================================================
@@ -33,32 +39,75 @@ from common.posting_dao import (
 # =========================================================
 def posting_list(request):
     """
-    展示所有上架的帖子（按时间倒序）
-    可后续增加分页、范围过滤
+    展示所有上架的帖子（按时间倒序），游标分页
+    可后续增加范围过滤
     """
-    postings = get_posting_list()   # DAO 接口
-    return render(request, "market/posting_list.html", {"postings": postings})
+    postings, next_cursor = get_posting_page(
+        request.GET.get("cursor"), request.GET.get("page_size", DEFAULT_PAGE_SIZE)
+    )
+    # 收藏状态 / 图片：整页批量各查一次
+    postings = annotate_postings(postings, request.session.get("user_id"))
+
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query["cursor"] = next_cursor
+        next_url = f"{request.path}?{query.urlencode()}"
+
+    return render(request, "market/posting_list.html", {"postings": postings, "next_url": next_url})
 
 # =========================================================
 # 2. 帖子详情（包含图片、标签、库存等）
 # =========================================================
+# 帖子内容来自共享的详情缓存，是否收藏按用户单独查询后叠加；
+# ETag 由 posting.updated_at + 收藏 / 订单 / 浏览计数 + 当前用户 + 是否收藏 得出，重复访问返回 304
+# 计数由触发器 / 浏览数批量写入维护，不改 updated_at，所以单独计入 ETag；
+# 浏览数按已写库的值计入（每次批量写入后变化），否则每次访问都会让 ETag 变化
+# 记浏览数在外层视图 posting_detail 中做（每个请求一次），ETag 计算只读
+def _detail_state(request, posting_id):
+    """(帖子, 当前用户, 是否收藏)；ETag 与视图共用，同一请求只查一次"""
+    state = getattr(request, "_posting_detail_state", None)
+    if state is None:
+        posting = get_posting_detail(posting_id)
+        user_id = request.session.get("user_id")
+        favorited = bool(posting and user_id and is_favorite(user_id, posting_id))
+        state = request._posting_detail_state = (posting, user_id, favorited)
+    return state
+
+
+def _detail_etag(request, posting_id):
+    posting, user_id, favorited = _detail_state(request, posting_id)
+    if not posting or len(messages.get_messages(request)):
+        # 帖子不存在 / 有待显示的提示消息：不走 304
+        return None
+    counters = f"{posting['favorite_count']}:{posting['order_count']}:{posting['view_count']}"
+    raw = f"{posting_id}:{posting['updated_at'].isoformat()}:{counters}:{user_id}:{int(favorited)}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
 def posting_detail(request, posting_id):
-    posting = get_posting_detail(posting_id)
+    """记一次浏览（返回 304 也算），再按 ETag 决定返回 304 还是渲染详情页"""
+    posting = _detail_state(request, posting_id)[0]
+    if posting:
+        # 浏览数在内存中累计、定期批量写库
+        view_counter.record_view(posting_id)
+    return _posting_detail(request, posting_id)
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_detail_etag)       # 不给 Last-Modified：计数变化不反映在 updated_at 上
+def _posting_detail(request, posting_id):
+    posting, user_id, favorited = _detail_state(request, posting_id)
 
     if not posting:
         messages.error(request, "帖子不存在")
         return redirect("market:posting_list")
 
-    user_id = request.session.get("user_id")
-
-    # ⭐ 是否已收藏
-    favorited = False
-    if user_id:
-        favorited = is_favorite(user_id, posting_id)
-
     return render(request, "market/posting_detail.html", {
         "posting": posting,
-        "favorited": favorited
+        "favorited": favorited,
+        # 详情来自共享缓存：浏览数加上本进程尚未写库的部分
+        "view_count": posting["view_count"] + view_counter.pending_views(posting_id),
     })
 
 # =========================================================
@@ -71,6 +120,9 @@ def create_posting_view(request):
         if not owner_id:
             return redirect("accounts:login")
 
+        # 封面图边读边校验、直接写入媒体目录（须在访问 request.POST 之前设置）
+        use_image_upload(request)
+
         title = request.POST.get("title")
         content = request.POST.get("content")
         price = request.POST.get("price")
@@ -85,10 +137,14 @@ def create_posting_view(request):
 
         image_file = request.FILES.get("image")
         image_url_input = (request.POST.get("image_url") or "").strip()
+        if request.upload_errors:
+            # 图片过大 / 格式不对：请求体没有读完，其余字段也不可信
+            messages.error(request, next(iter(request.upload_errors.values())))
+            return redirect("market:create_posting")
 
         try:
             if image_file:
-                image_url = _save_cover_image_to_media(image_file)
+                image_url = _save_image_to_media(image_file)
             elif image_url_input:
                 # 例如：/static/images/demo.jpg 或 /media/postings/xxx.jpg
                 image_url = image_url_input
@@ -160,9 +216,11 @@ def upload_posting_image(request, posting_id):
         if not owner_id:
             return redirect("accounts:login")
 
-        # 假设文件上传后路径为 file_url
-        image_file = request.FILES["image"]
-        file_url = "/media/uploads/" + image_file.name  # 你后面可以改成真实路径
+        use_image_upload(request)
+        image_file = request.FILES.get("image")
+        if request.upload_errors or image_file is None:
+            return JsonResponse({"status": "fail", "msg": request.upload_errors.get("image", "请选择图片")})
+        file_url = _save_image_to_media(image_file)
 
         add_posting_image(posting_id, owner_id, file_url, "物品照片")
         return JsonResponse({"status": "success", "path": file_url})
@@ -224,7 +282,7 @@ def remove_favorite_view(request, posting_id):
 # =========================================================
 def favorite_list_view(request):
     user_id = request.session.get("user_id")
-    favorites = get_user_favorites(user_id)
+    favorites = annotate_postings(get_user_favorites(user_id), user_id)
     return render(request, "market/favorite_list.html", {"favorites": favorites})
 
 # =========================================================
@@ -241,20 +299,62 @@ def my_postings_view(request):
     })
 
 
-def _save_cover_image_to_media(image_file):
-    ext = os.path.splitext(image_file.name)[1].lower()
-    allowed = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
-    if ext not in allowed:
-        raise ValueError("仅支持 jpg/jpeg/png/gif/webp 格式图片")
+# =========================================================
+# 13. 管理员批量导入帖子（CSV / JSONL，见 common/posting_import.py）
+# =========================================================
+def admin_import_postings_view(request):
+    if request.session.get("user_role") != 3:
+        messages.error(request, "无权限")
+        return redirect("market:posting_list")
+
+    context = {"formats": posting_import.FORMATS}
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if not upload:
+            messages.error(request, "请选择要导入的文件")
+            return render(request, "market/admin_import_postings.html", context)
+
+        fmt = request.POST.get("format") or os.path.splitext(upload.name)[1].lstrip(".").lower()
+        if fmt not in posting_import.FORMATS:
+            messages.error(request, "仅支持 CSV / JSONL 文件")
+            return render(request, "market/admin_import_postings.html", context)
+
+        # 上传文件按行流式解码，不整体读入内存
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            report = posting_import.import_postings(
+                posting_import.read_rows(lines, fmt),
+                default_owner_id=request.POST.get("owner_id") or request.session.get("user_id"),
+                create_tags=bool(request.POST.get("create_tags")),
+            )
+        except posting_import.FileError as e:
+            messages.error(request, str(e))
+            return render(request, "market/admin_import_postings.html", context)
+        context["report"] = report
+        if report["imported"]:
+            messages.success(request, f"成功导入 {report['imported']} 条，失败 {report['failed']} 条")
+        else:
+            messages.error(request, f"没有导入任何帖子，失败 {report['failed']} 条")
 
-    upload_dir = os.path.join(settings.MEDIA_ROOT, "postings")
-    os.makedirs(upload_dir, exist_ok=True)
+    return render(request, "market/admin_import_postings.html", context)
 
-    fs = FileSystemStorage(
-        location=upload_dir,
-        base_url=settings.MEDIA_URL + "postings/",
-    )
-    filename = f"{uuid.uuid4().hex}{ext}"
-    saved_name = fs.save(filename, image_file)
-    return fs.url(saved_name)  # /media/postings/xxxx.jpg
 
+def _save_image_to_media(image_file):
+    """
+    返回图片 URL
+    ImageUploadHandler 处理过的上传已按内容存入媒体目录；其他来源的文件在这里保存
+    """
+    if isinstance(image_file, StoredImage):
+        name, created = image_file.media_name, image_file.created
+    else:
+        ext = os.path.splitext(image_file.name)[1].lower()
+        allowed = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+        if ext not in allowed:
+            raise ValueError("仅支持 jpg/jpeg/png/gif/webp 格式图片")
+        # 按内容 sha256 存放：同一张图只存一份，文件名不变可永久缓存
+        name, created = media_store.save(image_file, "postings", ext)
+
+    if created:
+        # 缩略图 / 中图在后台线程池生成，不阻塞本次请求
+        image_variants.submit(name)
+    return media_store.url(name)  # /media/postings/ab/cd/abcd….jpg
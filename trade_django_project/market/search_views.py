@@ -3,7 +3,10 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 
+from common.posting_dao import annotate_postings
 from common.search_dao import (
+    DEFAULT_PAGE_SIZE,
+    SORTS,
     search_postings,
     search_by_tag,
     search_tags_fuzzy,
@@ -18,18 +21,73 @@ def search(request):
     keyword = request.GET.get("keyword", "")
     tag_id = request.GET.get("tag_id")
     scope = request.GET.get("scope", "全楼")
+    cursor = request.GET.get("cursor")
+    page_size = request.GET.get("page_size", DEFAULT_PAGE_SIZE)
+    sort = request.GET.get("sort", "latest")   # 见 SORTS；relevance 需要关键字
+    min_price = request.GET.get("min_price")
+    max_price = request.GET.get("max_price")
 
     user_id = request.session.get("user_id")
     
-    results = search_postings(keyword, tag_id, scope, user_id)
+    results, next_cursor, facets = search_postings(
+        keyword, tag_id, scope, user_id, cursor=cursor, page_size=page_size, facets=True,
+        sort=sort, min_price=min_price, max_price=max_price,
+    )
 
     return render(
         request,
         "market/search_results.html",
-        {"results": results, "keyword": keyword}
+        {
+            "results": annotate_postings(results, user_id),
+            "keyword": keyword,
+            "next_cursor": next_cursor,
+            "next_url": _next_page_url(request, next_cursor),
+            "facets": facets,
+            "tag_facets": [
+                dict(f, url=_filter_url(request, tag_id=f["tag_id"]), active=str(f["tag_id"]) == str(tag_id))
+                for f in facets["tags"] if f["tag_id"] is not None
+            ],
+            "clear_tag_url": _filter_url(request, tag_id=None) if tag_id else None,
+            "sort": sort if sort in SORTS else "latest",
+            "sort_options": [
+                {"name": name, "label": label, "url": _filter_url(request, sort=name)}
+                for name, label in SORTS.items() if keyword or name != "relevance"
+            ],
+            "price_facets": [
+                # 区间为 [min, max)，价格精确到分
+                dict(f, url=_filter_url(
+                    request, min_price=f["min"], max_price=None if f["max"] is None else f"{f['max'] - 0.01:.2f}"
+                ))
+                for f in facets["prices"]
+            ],
+            "min_price": min_price or "",
+            "max_price": max_price or "",
+            "clear_price_url": _filter_url(request, min_price=None, max_price=None) if min_price or max_price else None,
+        }
     )
 
 
+def _filter_url(request, **params):
+    """修改筛选条件：替换给定参数（None 表示去掉），并回到第一页"""
+    query = request.GET.copy()
+    query.pop("cursor", None)
+    for name, value in params.items():
+        if value is None:
+            query.pop(name, None)
+        else:
+            query[name] = value
+    return f"{request.path}?{query.urlencode()}"
+
+
+def _next_page_url(request, next_cursor):
+    """保留当前查询参数，只替换 cursor"""
+    if not next_cursor:
+        return None
+    query = request.GET.copy()
+    query["cursor"] = next_cursor
+    return f"{request.path}?{query.urlencode()}"
+
+
 # ======================================================
 # 2. 标签列表
 # ======================================================
@@ -43,8 +101,15 @@ def tag_list(request):
 # ======================================================
 def search_by_tag_view(request, tag_id):
     user_id = request.session.get("user_id")
-    results = search_by_tag(tag_id, user_id)
-    return render(request, "market/search_results.html", {"results": results})
+    cursor = request.GET.get("cursor")
+    page_size = request.GET.get("page_size", DEFAULT_PAGE_SIZE)
+
+    results, next_cursor = search_by_tag(tag_id, user_id, cursor=cursor, page_size=page_size)
+    return render(request, "market/search_results.html", {
+        "results": annotate_postings(results, user_id),
+        "next_cursor": next_cursor,
+        "next_url": _next_page_url(request, next_cursor),
+    })
 
 
 # ======================================================
@@ -0,0 +1,11 @@
+from django import template
+
+from common.image_variants import variant_url
+
+register = template.Library()
+
+
+# {{ p.image_url|variant:"thumb" }}：缩略图 / 中图，尚未生成时为原图
+@register.filter
+def variant(url, name="thumb"):
+    return variant_url(url, name)
@@ -0,0 +1,125 @@
+# market/uploads.py
+# ======================================================
+# 图片上传处理器：边读请求体边校验、边写入媒体目录
+# - 整个请求体超过上限（Content-Length）时一个字节都不读
+# - 前几个字节校验图片格式（不看扩展名），按实际格式决定扩展名
+# - 读取过程中累计大小，超过上限立即停止读取
+# - 数据块直接写入 common.media_store.Writer（按内容 sha256 存放），不在内存 / 系统临时目录缓存整个文件
+# 出错时不抛异常给视图：request.upload_errors[字段名] = 错误信息，request.FILES 中没有该文件
+#
+# 用法（视图需 csrf_exempt，在访问 request.POST / FILES 之前设置）：
+#   use_image_upload(request)
+# ======================================================
+
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+from common import media_store
+
+
+# 文件头 → 扩展名
+_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+]
+_HEADER_SIZE = 12
+
+
+def detect_image_type(header):
+    """根据文件头返回扩展名；不是支持的图片格式返回 None"""
+    for signature, ext in _SIGNATURES:
+        if header.startswith(signature):
+            return ext
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+class StoredImage(UploadedFile):
+    """已存入媒体目录的上传图片：media_name 为 MEDIA_ROOT 下相对路径，created 表示是否新写入"""
+
+    def __init__(self, media_name, created, name, content_type, size):
+        super().__init__(None, name, content_type, size)
+        self.media_name = media_name
+        self.created = created
+
+    def open(self, mode="rb"):
+        raise ValueError("图片已保存，请使用 media_name")
+
+    def close(self):
+        pass
+
+
+class ImageUploadHandler(FileUploadHandler):
+    prefix = "postings"
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = media_store.max_image_size()
+        self.too_large = False
+        self.writer = None
+        self.header = b""
+        self.ext = None
+
+    def _reject(self, message):
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
+        self.request.upload_errors[self.field_name] = message
+        # 不再读取剩余请求体
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # 请求体整体过大（留出表单其他字段的余量）：第一个文件开始时拒绝，不读取文件内容
+        self.too_large = content_length > self.max_size + 64 * 1024
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if self.too_large or (content_length and content_length > self.max_size):
+            self._reject(f"图片不能超过 {self.max_size / (1024 * 1024):g}MB")
+        self.writer = media_store.Writer(self.prefix)
+        self.header = b""
+        self.ext = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.ext is None:
+            self.header += raw_data[:_HEADER_SIZE - len(self.header)]
+            if len(self.header) >= _HEADER_SIZE:
+                self.ext = detect_image_type(self.header)
+                if self.ext is None:
+                    self._reject("仅支持 jpg/jpeg/png/gif/webp 格式图片")
+        if self.writer.size + len(raw_data) > self.max_size:
+            self._reject(f"图片不能超过 {self.max_size / (1024 * 1024):g}MB")
+        self.writer.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        writer, self.writer = self.writer, None
+        if writer is None:
+            return None
+        if file_size == 0:
+            # 没有选择文件的空字段
+            writer.abort()
+            return None
+        if self.ext is None:
+            # 整个文件都不足文件头长度
+            self.ext = detect_image_type(self.header)
+            if self.ext is None:
+                writer.abort()
+                self.request.upload_errors[self.field_name] = "仅支持 jpg/jpeg/png/gif/webp 格式图片"
+                return None
+        media_name, created = writer.finish(self.ext)
+        return StoredImage(media_name, created, self.file_name, self.content_type, file_size)
+
+    def upload_interrupted(self):
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
+
+
+def use_image_upload(request):
+    """本次请求的上传文件改用 ImageUploadHandler 处理"""
+    request.upload_handlers = [ImageUploadHandler(request)]
+    request.upload_errors = {}
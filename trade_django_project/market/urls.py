@@ -13,6 +13,7 @@ from .posting_views import (
     add_favorite_view,
     remove_favorite_view,
     favorite_list_view,
+    admin_import_postings_view,
 )
 
 from .order_views import (
@@ -47,9 +48,12 @@ from .complaint_views import (
     submit_complaint_view,
     my_complaints_view,
     admin_complaint_list_view,
+    admin_export_complaints_view,
     admin_handle_complaint_view,
 )
 
+from .debug_views import debug_sql_view
+
 from .stats_views import (
     stats_overview_view,
     stats_user_view,
@@ -71,6 +75,7 @@ urlpatterns = [
     path("posting/create/", create_posting_view, name="create_posting"),
     path("posting/<int:posting_id>/edit/", edit_posting, name="edit_posting"),
     path("posting/<int:posting_id>/delete/", delete_posting, name="delete_posting"),
+    path("postings/import/", admin_import_postings_view, name="admin_import_postings"),
 
     # 收藏
     path("favorite/<int:posting_id>/add/", add_favorite_view, name="add_favorite"),
@@ -105,6 +110,7 @@ urlpatterns = [
     path("complaint/submit/<int:order_id>/", submit_complaint_view, name="submit_complaint"),
     path("complaints/my/", my_complaints_view, name="my_complaints"),
     path("complaints/admin/", admin_complaint_list_view, name="admin_complaint_list"),
+    path("complaints/admin/export/", admin_export_complaints_view, name="admin_export_complaints"),
     path("complaint/<int:complaint_id>/handle/", admin_handle_complaint_view, name="admin_handle_complaint"),
     path("complaint/<int:complaint_id>/", complaint_detail_view, name="complaint_detail"),
 
@@ -112,4 +118,7 @@ urlpatterns = [
     path("stats/", stats_overview_view, name="stats_overview"),
     path("stats/me/", stats_user_view, name="stats_user"),
     path("stats/monthly-orders/", stats_monthly_orders_view, name="stats_monthly_orders"),
+
+    # ===== 调试 Debug =====
+    path("debug/sql/", debug_sql_view, name="debug_sql"),
 ]
\ No newline at end of file
@@ -22,8 +22,8 @@ def index(request):
     - 公告
     - 登录状态
     """
-    postings = get_posting_list()[:10]          # 最新 10 条出物
-    announcements = get_announcements()[:5]    # 最新 5 条公告
+    postings = get_posting_list(limit=10)          # 最新 10 条出物
+    announcements = get_announcements(limit=5)    # 最新 5 条公告
 
     context = {
         "postings": postings,
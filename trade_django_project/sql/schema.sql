@@ -8,6 +8,7 @@ DROP TABLE IF EXISTS notice;
 DROP TABLE IF EXISTS `order`;
 DROP TABLE IF EXISTS favorite;
 DROP TABLE IF EXISTS image;
+DROP TABLE IF EXISTS posting_stats;
 DROP TABLE IF EXISTS posting;
 DROP TABLE IF EXISTS tag;
 DROP TABLE IF EXISTS user;
@@ -55,7 +56,8 @@ CREATE TABLE user (
     FOREIGN KEY (room_id) REFERENCES room(room_id),
     INDEX idx_wechat (wechat),
     INDEX idx_room (room_id),
-    INDEX idx_status (status)
+    INDEX idx_status (status),
+    INDEX idx_updated (updated_at)
 );
 
 -- ================================
@@ -97,7 +99,13 @@ CREATE TABLE posting (
 
     INDEX idx_owner (owner_id),
     INDEX idx_tag (tag_id),
-    INDEX idx_status_scope (status, scope)
+    INDEX idx_status_scope (status, scope),
+    -- 搜索的筛选 + 排序（keyset 分页，二级索引末尾自带 posting_id）
+    INDEX idx_status_created (status, created_at),
+    INDEX idx_status_tag_created (status, tag_id, created_at),
+    INDEX idx_status_price (status, price),
+    INDEX idx_updated (updated_at),  -- 进程内检索索引 / 可见集合按 updated_at 追赶
+    INDEX idx_image_url (image_url)  -- 图片文件引用计数（common/media_store.py）
 );
 
 
@@ -161,7 +169,8 @@ CREATE TABLE notice (
     FOREIGN KEY (related_order_id) REFERENCES `order`(order_id),
 
     INDEX idx_receiver (receiver_id),
-    INDEX idx_related_order (related_order_id)
+    INDEX idx_related_order (related_order_id),
+    INDEX idx_type_created (type, created_at)    -- 公告列表 / 首页最新公告
 );
 
 -- ================================
@@ -201,5 +210,23 @@ CREATE TABLE image (
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
 
     FOREIGN KEY (posting_id) REFERENCES posting(posting_id),
-    FOREIGN KEY (uploader_id) REFERENCES user(user_id)
+    FOREIGN KEY (uploader_id) REFERENCES user(user_id),
+
+    INDEX idx_path (path)            -- 图片文件引用计数
+);
+
+-- ================================
+-- 10. PostingStats 帖子计数（冗余）
+-- favorite_count / order_count 由 triggers.sql 中的触发器随 favorite / order 增删维护，
+-- view_count 由应用进程内累计后批量写入（common/view_counter.py）；
+-- 缺行等同于全 0，历史数据可用 manage.py rebuild_posting_stats 重算
+-- ================================
+CREATE TABLE posting_stats (
+    posting_id INT PRIMARY KEY,
+    favorite_count INT NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    view_count BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (posting_id) REFERENCES posting(posting_id)
 );
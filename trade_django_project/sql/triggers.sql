@@ -41,4 +41,38 @@ BEGIN
     END IF;
 END $$
 
+
+-- ================================
+-- posting_stats 计数维护（收藏 / 订单）
+-- 收藏是 INSERT ... ON DUPLICATE KEY UPDATE：重复收藏走 UPDATE，不会重复计数
+-- ================================
+CREATE TRIGGER trg_favorite_count_add
+AFTER INSERT ON favorite
+FOR EACH ROW
+BEGIN
+    INSERT INTO posting_stats(posting_id, favorite_count)
+    VALUES (NEW.posting_id, 1)
+    ON DUPLICATE KEY UPDATE favorite_count = favorite_count + 1;
+END $$
+
+
+CREATE TRIGGER trg_favorite_count_remove
+AFTER DELETE ON favorite
+FOR EACH ROW
+BEGIN
+    UPDATE posting_stats
+    SET favorite_count = GREATEST(favorite_count - 1, 0)
+    WHERE posting_id = OLD.posting_id;
+END $$
+
+
+CREATE TRIGGER trg_order_count
+AFTER INSERT ON `order`
+FOR EACH ROW
+BEGIN
+    INSERT INTO posting_stats(posting_id, order_count)
+    VALUES (NEW.posting_id, 1)
+    ON DUPLICATE KEY UPDATE order_count = order_count + 1;
+END $$
+
 DELIMITER ;
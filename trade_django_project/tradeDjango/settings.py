@@ -1,4 +1,5 @@
 from pathlib import Path
+import os
 import sys
 
 # =========================================================
@@ -39,8 +40,10 @@ INSTALLED_APPS = [
 # =========================================================
 
 MIDDLEWARE = [
+    "market.middleware.SQLInstrumentMiddleware",   # SQL 统计（放最外层，覆盖整个请求）
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "market.middleware.PrimaryStickyMiddleware",   # 读写分离：写后读粘主库
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -102,6 +105,139 @@ DATABASES = {
     }
 }
 
+# =========================================================
+# 读写分离（common/db.py）
+# query_one / query_all / query_iter 走 DB_READ_ALIAS，
+# execute / call_proc / transaction 走 default；
+# 写过之后 DB_STICKY_SECONDS 秒内，同一浏览器的读也走 default（短期 cookie 记录）
+# 使用只读库时在 DATABASES 中加入对应别名（如 "replica"）并设置 DB_READ_ALIAS
+# =========================================================
+
+DB_READ_ALIAS = None
+DB_STICKY_SECONDS = 5
+
+# 本地调试读写分离：TRADE_DB_LOCAL=1 时用两个 SQLite 文件代替主库 / 只读库
+if os.environ.get("TRADE_DB_LOCAL"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "local_primary.sqlite3",
+        },
+        "replica": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "local_replica.sqlite3",
+        },
+    }
+    DB_READ_ALIAS = "replica"
+
+# 查询计划检查（manage.py explain_plans）：TRADE_EXPLAIN_DB=<空库名> 时加入 "explain" 别名，
+# 与主库同一实例，但会被删表重建，切勿指向正式库
+if os.environ.get("TRADE_EXPLAIN_DB"):
+    DATABASES["explain"] = dict(DATABASES["default"], NAME=os.environ["TRADE_EXPLAIN_DB"])
+
+# =========================================================
+# 数据库连接池（common/pool.py）
+# common.db 的查询从连接池借连接，复用 TLS 长连接
+# =========================================================
+
+DB_POOL = {
+    "MIN_SIZE": 1,          # 常驻空闲连接数
+    "MAX_SIZE": 10,         # 单进程最多连接数
+    "IDLE_TIMEOUT": 300,    # 空闲回收（秒）
+    "MAX_LIFETIME": 3600,   # 连接最长存活（秒）
+    "PING_AFTER": 5,        # 空闲超过该秒数，复用前先 ping
+    "TIMEOUT": 10,          # 池满时等待连接的超时（秒）
+}
+
+# =========================================================
+# 查询结果缓存（common/query_cache.py）
+# DAO 通过 query_all(..., cache_ttl=秒) 启用；写表时按表名自动失效
+# =========================================================
+
+QUERY_CACHE = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 2000,
+    "MAX_BYTES": 32 * 1024 * 1024,
+}
+
+# =========================================================
+# 搜索结果缓存（common/search_dao.py，存放在上面的查询缓存中）
+# 按“查询条件 + 查看者寝室/楼层/楼栋”缓存，同寝室的人共享；写帖子时失效
+# =========================================================
+
+SEARCH_CACHE = {
+    "ENABLED": True,
+    "TTL": 10,      # 秒
+}
+
+# =========================================================
+# 帖子详情缓存（common/posting_dao.py，存放在上面的查询缓存中）
+# 按帖子缓存、所有查看者共享；只在该帖被修改 / 下架 / 改范围 / 确认交接时失效
+# 详情页另带 ETag（posting.updated_at + 收藏 / 订单 / 浏览计数 + 当前用户），重复访问返回 304；
+# 不发 Last-Modified：计数变化不改 updated_at，按时间判断会把过期的计数当成未修改
+# =========================================================
+
+POSTING_DETAIL_CACHE = {
+    "ENABLED": True,
+    "TTL": 30,      # 秒；兜底其他进程的写入
+}
+
+# =========================================================
+# 帖子浏览数（common/view_counter.py）
+# 进程内累计，后台线程定期合并成批量 UPSERT 写入 posting_stats；收藏数 / 订单数由触发器维护
+# =========================================================
+
+VIEW_COUNTER = {
+    "ENABLED": True,
+    "FLUSH_INTERVAL": 10,   # 写库间隔（秒）
+    "BATCH_SIZE": 500,      # 每条 INSERT 最多写多少个帖子
+}
+
+# =========================================================
+# 帖子全文检索索引（common/search_index.py）
+# 每个 worker 进程内一份；其他进程的写入按 posting.updated_at 追赶
+# =========================================================
+
+SEARCH_INDEX = {
+    "ENABLED": True,
+    "SYNC_INTERVAL": 5,        # 追赶间隔（秒）
+    "SYNC_OVERLAP": 300,       # 追赶时回看同步点之前多少秒（晚提交的事务）
+    "MAX_CANDIDATES": 1000,    # 相关度排序最多排出前多少条
+}
+
+# =========================================================
+# 帖子可见性索引（common/visibility.py）
+# 按位置分组的 posting_id 集合求交得出可见帖子；有关键字候选或选了范围（结果有界）时
+# 用主键过滤，否则可见性仍在 SQL 中判断
+# =========================================================
+
+VISIBILITY = {
+    "ENABLED": True,
+    "SYNC_INTERVAL": 5,        # 追赶其他进程写入的间隔（秒）
+    "SYNC_OVERLAP": 300,       # 追赶时回看同步点之前多少秒（晚提交的事务）
+}
+
+# =========================================================
+# 标签联想（common/tag_suggest.py）
+# /tag/suggest/ 走进程内后缀 trie，不再每次按键都 LIKE '%q%' 查库
+# =========================================================
+
+TAG_SUGGEST = {
+    "ENABLED": True,
+    "TOP_K": 10,               # 每个节点缓存的前 K 个标签
+    "REFRESH_INTERVAL": 30,    # 按 tag.updated_at 增量刷新的间隔（秒）
+}
+
+# =========================================================
+# SQL 埋点（common/instrument.py）
+# 每个响应带 X-SQL-Queries 头；明细见 /debug/sql/
+# =========================================================
+
+SQL_INSTRUMENT = {
+    "ENABLED": True,
+    "SLOW_QUERY_MS": 200,   # 慢查询阈值（毫秒），超过会记录 warning 及调用的 DAO 函数
+}
+
 # =========================================================
 # 国际化
 # =========================================================
@@ -118,6 +254,32 @@ USE_TZ = True
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# 上传图片按内容 sha256 存放（common/media_store.py）：postings/ab/cd/<sha256>.jpg
+# 同图只存一份；引用数归零（image / posting 不再引用）时删除，gc_media 命令兜底
+# 文件名不会变，部署时可让 nginx 永久缓存：
+#   location /media/ {
+#       alias <MEDIA_ROOT>/;
+#       location ~ "^/media/postings/[0-9a-f]{2}/[0-9a-f]{2}/" {
+#           add_header Cache-Control "public, max-age=31536000, immutable";
+#       }
+#   }
+MEDIA_STORE = {
+    "GRACE_SECONDS": 3600,      # 新写入 / 刚复用的文件至少保留这么久，避免与正在插入的引用记录竞争
+    "MAX_IMAGE_SIZE": 10 * 1024 * 1024,     # 单张图片上限（字节）：上传时边读边检查，超过立即停止读取
+}
+
+# 封面图版本（common/image_variants.py）：上传后在后台生成 WebP 缩略图 / 中图，
+# 列表页用缩略图、详情页用中图；需要 Pillow（requirements.txt），未安装时一律使用原图，非 DEBUG 下启动时记警告
+IMAGE_VARIANTS = {
+    "ENABLED": True,
+    "WORKERS": 2,
+    "FORMAT": "WEBP",
+    "QUALITY": 80,
+    "SIZES": {"thumb": 320, "medium": 1024},    # 最长边（像素）
+    "READY_CACHE_SIZE": 10000,                  # 版本是否存在的 LRU 缓存条数
+    "MISS_RECHECK": 30,                         # 尚未生成的版本隔多少秒再查磁盘
+}
+
 # =========================================================
 # 其他
 # =========================================================
@@ -1,11 +1,28 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from django.views.static import serve
+
+from common import media_store
 
 urlpatterns = [
     path("", include(("market.urls", "market"), namespace="market")),
     path("accounts/", include(("accounts.urls", "accounts"), namespace="accounts")),
 ]
 
+
+def serve_media(request, path, document_root=None):
+    """开发环境的 /media/：内容寻址文件名不会变，允许永久缓存"""
+    response = serve(request, path, document_root=document_root)
+    if media_store.is_stored(path):
+        response["Cache-Control"] = media_store.CACHE_CONTROL
+    return response
+
+
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += [
+        re_path(
+            r"^%s(?P<path>.*)$" % settings.MEDIA_URL.lstrip("/"),
+            serve_media,
+            {"document_root": settings.MEDIA_ROOT},
+        ),
+    ]